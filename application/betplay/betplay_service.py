@@ -1,5 +1,7 @@
 import logging
 
+import pandas as pd
+
 from infrastructure.betplay.betplay_api_client import BetplayAPIClient
 from infrastructure.persistence.postgres_repository import PostgresRepository
 
@@ -12,11 +14,15 @@ class BetplayService:
         self.api_client = BetplayAPIClient()
         self.repository = PostgresRepository(league_db=league_db)
 
-    def save_league_odds(self):
-        """Obtiene y persiste las cuotas en el historial acumulado."""
-        logger.info("Fetching odds — path: %s", self.betplay_path)
+    def save_league_odds(self, df_betplay: pd.DataFrame | None = None):
+        """Obtiene y persiste las cuotas en el historial acumulado.
 
-        df_betplay = self.api_client.get_full_data(self.betplay_path)
+        Si se pasa df_betplay (ya recolectado, p. ej. por get_full_data_many)
+        no se vuelve a consultar la API.
+        """
+        if df_betplay is None:
+            logger.info("Fetching odds — path: %s", self.betplay_path)
+            df_betplay = self.api_client.get_full_data(self.betplay_path)
         if df_betplay.empty:
             logger.warning("No se encontraron partidos para path: %s", self.betplay_path)
             return
@@ -24,7 +30,7 @@ class BetplayService:
         logger.info("Partidos obtenidos: %d", len(df_betplay))
 
         self.repository.save_dataframe_to_collection(
-            collection_name='betplay_odds_history',
+            collection_name='betplay_odds_ticks',
             df=df_betplay,
             clear_collection=False
         )
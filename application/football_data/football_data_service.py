@@ -1,6 +1,7 @@
 import logging
 
-from infrastructure.football_data.football_data_client import FootballDataClient, SEASONS
+from infrastructure.football_data.football_data_client import LEAGUE_CODE, FootballDataClient, SEASONS
+from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
 from infrastructure.persistence.postgres_repository import PostgresRepository
 
 logger = logging.getLogger(__name__)
@@ -12,8 +13,9 @@ CURRENT_SEASON = SEASONS[-1]
 class FootballDataService:
     """Descarga y persiste datos históricos de partidos desde football-data.co.uk"""
 
-    def __init__(self, db_name: str):
-        self.client = FootballDataClient()
+    def __init__(self, db_name: str, league_code: str | None = None):
+        league_code = league_code or LeaguesConfigRepository().get_fd_league_code(db_name) or LEAGUE_CODE
+        self.client = FootballDataClient(league_code, target=db_name)
         self.repo = PostgresRepository(db_name)
 
     def sync(self, seasons: list[str] = SEASONS):
@@ -25,19 +27,39 @@ class FootballDataService:
             logger.error("No se obtuvieron datos históricos")
             return
 
-        self.repo.save_dataframe_to_collection(COLLECTION, df, clear_collection=True)
+        ok, _ = self.repo.save_dataframe_to_collection(COLLECTION, df, clear_collection=True)
+        if not ok:
+            # Sin commit_cache: la próxima actualización vuelve a escribir la temporada
+            logger.error("No se pudieron guardar los partidos históricos en '%s'", COLLECTION)
+            return
+
+        for season in seasons:
+            self.client.commit_cache(season)
         logger.info("%d partidos históricos guardados en '%s'", len(df), COLLECTION)
 
-    def update_current_season(self, season: str = CURRENT_SEASON):
-        """Actualiza solo la temporada actual en PostgreSQL."""
+    def update_current_season(self, season: str = CURRENT_SEASON) -> int:
+        """Actualiza solo la temporada actual en PostgreSQL.
+
+        Upsert incremental: solo se escriben partidos nuevos o modificados. La
+        temporada se marca con commit_cache solo si el upsert terminó, así un
+        fallo se reintenta en la próxima corrida aunque el CSV siga igual.
+        Retorna cuántas filas cambiaron: 0 solo si el upsert no escribió nada o
+        este mismo CSV ya se había persistido en la liga. Lanza ValueError si el
+        CSV llega vacío.
+        """
         logger.info("Actualizando temporada %s...", season)
-        df = self.client.fetch_season(season)
+        df, changed = self.client.fetch_season_with_status(season)
+
+        if not changed:
+            logger.info("Temporada %s sin cambios desde el último upsert en esta liga — se omite", season)
+            return 0
 
         if df.empty:
-            logger.error("No se obtuvieron datos para la temporada %s", season)
-            return
+            # No es "sin novedades": el llamador no debe tratarlo como un 0 del upsert
+            raise ValueError(f"No se obtuvieron datos para la temporada {season}")
 
-        deleted = self.repo.delete_historical_season(season)
-        logger.debug("Temporada %s: %d filas eliminadas antes de reinsertar", season, deleted)
-        self.repo.save_dataframe_to_collection(COLLECTION, df, clear_collection=False)
-        logger.info("Temporada %s actualizada: %d partidos insertados", season, len(df))
+        count = self.repo.upsert_historical_matches(df)
+        self.client.commit_cache(season)
+        logger.info("Temporada %s actualizada: %d partidos nuevos o modificados (%d en el CSV)",
+                    season, count, len(df))
+        return count
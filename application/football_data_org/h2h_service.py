@@ -1,9 +1,11 @@
 import logging
+import threading
 from contextlib import contextmanager
 from datetime import datetime
 
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
 
+from application.football_data_org.team_id_resolver import TeamIdResolver
 from infrastructure.football_data_org.football_data_org_client import FootballDataOrgClient
 from infrastructure.persistence.postgres_config import PostgresConfig
 
@@ -20,11 +22,33 @@ class H2HService:
     3. Si existe → retorna el documento cacheado (sin llamada a la API).
     4. Si no existe → consulta football-data.org, construye el documento,
        lo persiste en PostgreSQL y lo retorna.
+
+    get_h2h_many hace lo mismo para una jornada completa: una sola consulta
+    de caché y una descarga de partidos por equipo, compartida entre todos los
+    fixtures en los que aparece. Los IDs de equipo salen de TeamIdResolver
+    (tabla persistente), no de /teams?name=.
     """
 
+    # Un lock por liga: el warm-up en segundo plano y el predictor no descargan
+    # dos veces el mismo H2H. Con wait=False (predictor) no se espera al lock:
+    # si el warm-up está descargando se usa lo que ya esté en caché.
+    _league_locks: dict[int, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
     def __init__(self, db_name: str):
         self.client = FootballDataOrgClient()
+        self._db_name = db_name
         self._league_id = PostgresConfig.get_league_id(db_name)
+        self._resolver: TeamIdResolver | None = None
+
+    def _resolve_team(self, name: str) -> int | None:
+        if self._resolver is None:
+            self._resolver = TeamIdResolver.for_league(self._db_name, self.client)
+        return self._resolver.resolve(name)
+
+    def _league_lock(self) -> threading.Lock:
+        with self._locks_guard:
+            return self._league_locks.setdefault(self._league_id, threading.Lock())
 
     @contextmanager
     def _cursor(self):
@@ -46,21 +70,104 @@ class H2HService:
         away_team: str,
         limit: int = 10,
     ) -> dict | None:
-        # 1. Verificar caché
-        cached = self._find_cached(betplay_event_id)
-        if cached:
-            logger.debug("H2H cache hit — %s vs %s", home_team, away_team)
-            return cached
-
-        # 2. Consultar API
-        logger.info("H2H API fetch — %s vs %s", home_team, away_team)
+        return self.get_h2h_many([(betplay_event_id, home_team, away_team)], limit=limit)[betplay_event_id]
+
+    def get_h2h_many(
+        self,
+        fixtures: list[tuple[int, str, str]],
+        limit: int = 10,
+        wait: bool = True,
+    ) -> dict[int, dict | None]:
+        """H2H de varios fixtures [(betplay_event_id, home_team, away_team)].
+
+        Retorna {betplay_event_id: documento}; None si no se pudo obtener. Con
+        wait=False, si otro hilo de la liga está descargando no se espera: los
+        fixtures sin caché quedan en None.
+        """
+        # 1. Verificar caché (una sola consulta)
+        docs = self._find_cached_many([f[0] for f in fixtures])
+        missing = [f for f in fixtures if f[0] not in docs]
+        logger.debug("H2H cache — %d hits, %d misses", len(docs), len(missing))
+        if not missing:
+            return {f[0]: docs[f[0]] for f in fixtures}
+
+        lock = self._league_lock()
+        if not lock.acquire(blocking=wait):
+            logger.info("H2H (%s): descarga en curso en otro hilo — %d fixtures sin H2H en esta corrida",
+                        self._db_name, len(missing))
+            return {f[0]: docs.get(f[0]) for f in fixtures}
         try:
-            raw_matches = self.client.get_h2h_matches(home_team, away_team, limit=limit)
-        except Exception as e:
-            logger.error("Error obteniendo H2H (%s vs %s): %s", home_team, away_team, e)
-            return None
+            # Otro hilo pudo completar parte de los fallos mientras se esperaba el lock
+            docs.update(self._find_cached_many([f[0] for f in missing]))
+            missing = [f for f in missing if f[0] not in docs]
+            if missing:
+                fetched = self._fetch_many(missing, limit)
+                if fetched:
+                    self._insert_many(list(fetched.values()))
+                docs.update(fetched)
+        finally:
+            lock.release()
+
+        return {f[0]: docs.get(f[0]) for f in fixtures}
+
+    def warm_up(self, fixtures: list[tuple[int, str, str]]) -> int:
+        """Precarga en caché los H2H de los fixtures; retorna cuántos quedaron disponibles."""
+        docs = self.get_h2h_many(fixtures)
+        available = sum(1 for d in docs.values() if d)
+        logger.info("H2H warm-up (%s): %d/%d fixtures en caché", self._db_name, available, len(fixtures))
+        return available
+
+    def warm_up_in_background(self, fixtures: list[tuple[int, str, str]]) -> threading.Thread:
+        """Lanza warm_up en un hilo daemon y retorna el hilo."""
+        def _run():
+            try:
+                self.warm_up(fixtures)
+            except Exception as e:
+                logger.error("H2H warm-up falló (%s): %s", self._db_name, e, exc_info=True)
 
-        # 3. Parsear partidos
+        thread = threading.Thread(target=_run, name=f"h2h-warmup-{self._db_name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _fetch_many(self, fixtures: list[tuple[int, str, str]], limit: int) -> dict[int, dict]:
+        """Consulta la API para los fixtures sin caché, reutilizando IDs y partidos por equipo."""
+        team_ids: dict[str, int | None] = {}
+        for _, home, away in fixtures:
+            for team in (home, away):
+                if team not in team_ids:
+                    team_ids[team] = self._resolve_team(team)
+
+        team_matches: dict[int, list[dict]] = {}
+        docs = {}
+        for event_id, home, away in fixtures:
+            home_id, away_id = team_ids[home], team_ids[away]
+            if home_id is None or away_id is None:
+                missing = home if home_id is None else away
+                logger.error("Error obteniendo H2H (%s vs %s): equipo no encontrado en football-data.org: '%s'",
+                             home, away, missing)
+                continue
+
+            # Sirve la lista de cualquiera de los dos equipos; solo se descarga si ninguno está
+            if home_id in team_matches:
+                team_id, rival_id = home_id, away_id
+            elif away_id in team_matches:
+                team_id, rival_id = away_id, home_id
+            else:
+                team_id, rival_id = home_id, away_id
+                logger.info("H2H API fetch — partidos de %s", home)
+                try:
+                    team_matches[team_id] = self.client.get_team_matches(team_id, limit=50)
+                except Exception as e:
+                    logger.error("Error obteniendo H2H (%s vs %s): %s", home, away, e)
+                    continue
+
+            raw_matches = self.client.filter_h2h(team_matches[team_id], rival_id, limit=limit)
+            docs[event_id] = self._build_doc(event_id, home, away, raw_matches)
+        return docs
+
+    @staticmethod
+    def _build_doc(betplay_event_id: int, home_team: str, away_team: str, raw_matches: list[dict]) -> dict:
+        # Parsear partidos
         matches = []
         for m in raw_matches:
             matches.append({
@@ -72,7 +179,7 @@ class H2HService:
                 "winner": m["score"]["winner"],
             })
 
-        # 4. Calcular resumen
+        # Calcular resumen
         home_wins = sum(
             1 for m in matches
             if (m["winner"] == "HOME_TEAM" and m["home_team"] == home_team)
@@ -85,7 +192,11 @@ class H2HService:
         )
         draws = sum(1 for m in matches if m["winner"] == "DRAW")
 
-        doc = {
+        logger.info(
+            "H2H obtenido — %s vs %s: %d partidos (W%d D%d L%d)",
+            home_team, away_team, len(matches), home_wins, draws, away_wins,
+        )
+        return {
             "betplay_event_id": betplay_event_id,
             "home_team": home_team,
             "away_team": away_team,
@@ -99,19 +210,13 @@ class H2HService:
             },
         }
 
-        # 5. Persistir en PostgreSQL
-        self._insert(doc)
-        logger.info(
-            "H2H guardado — %s vs %s: %d partidos (W%d D%d L%d)",
-            home_team, away_team, len(matches), home_wins, draws, away_wins,
-        )
-        return doc
-
     # ------------------------------------------------------------------ #
     #  Acceso a datos                                                      #
     # ------------------------------------------------------------------ #
 
-    def _find_cached(self, betplay_event_id: int) -> dict | None:
+    def _find_cached_many(self, betplay_event_ids: list[int]) -> dict[int, dict]:
+        if not betplay_event_ids:
+            return {}
         conn = PostgresConfig.get_connection()
         try:
             with conn.cursor() as cur:
@@ -120,29 +225,32 @@ class H2HService:
                     SELECT betplay_event_id, home_team, away_team,
                            fetched_at, matches, summary
                     FROM h2h_results
-                    WHERE league_id = %s AND betplay_event_id = %s
+                    WHERE league_id = %s AND betplay_event_id = ANY(%s)
                     """,
-                    (self._league_id, betplay_event_id),
+                    (self._league_id, list(betplay_event_ids)),
                 )
-                row = cur.fetchone()
-                if row is None:
-                    return None
                 cols = [d[0] for d in cur.description]
-                doc = dict(zip(cols, row))
-                if isinstance(doc.get("fetched_at"), datetime):
-                    doc["fetched_at"] = doc["fetched_at"].isoformat()
-                return doc
+                rows = cur.fetchall()
         finally:
             PostgresConfig.put_connection(conn)
 
-    def _insert(self, doc: dict) -> None:
+        docs = {}
+        for row in rows:
+            doc = dict(zip(cols, row))
+            if isinstance(doc.get("fetched_at"), datetime):
+                doc["fetched_at"] = doc["fetched_at"].isoformat()
+            docs[doc["betplay_event_id"]] = doc
+        return docs
+
+    def _insert_many(self, docs: list[dict]) -> None:
         with self._cursor() as cur:
-            cur.execute(
+            execute_values(
+                cur,
                 """
                 INSERT INTO h2h_results
                     (league_id, betplay_event_id, home_team, away_team,
                      fetched_at, matches, summary)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                VALUES %s
                 ON CONFLICT (league_id, betplay_event_id) DO UPDATE
                     SET home_team  = EXCLUDED.home_team,
                         away_team  = EXCLUDED.away_team,
@@ -150,13 +258,16 @@ class H2HService:
                         matches    = EXCLUDED.matches,
                         summary    = EXCLUDED.summary
                 """,
-                (
-                    self._league_id,
-                    doc["betplay_event_id"],
-                    doc["home_team"],
-                    doc["away_team"],
-                    doc["fetched_at"],
-                    Json(doc["matches"]),
-                    Json(doc["summary"]),
-                ),
+                [
+                    (
+                        self._league_id,
+                        doc["betplay_event_id"],
+                        doc["home_team"],
+                        doc["away_team"],
+                        doc["fetched_at"],
+                        Json(doc["matches"]),
+                        Json(doc["summary"]),
+                    )
+                    for doc in docs
+                ],
             )
@@ -0,0 +1,180 @@
+import difflib
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+
+from unidecode import unidecode
+
+from infrastructure.football_data_org.football_data_org_client import FootballDataOrgClient
+from infrastructure.persistence.team_id_repository import TeamIdRepository
+from models.xgboost.data_loader import FOOTBALL_DATA_TEAM_MAP, TEAM_NAME_MAP
+
+logger = logging.getLogger(__name__)
+
+# Competición por defecto si la liga no tiene leagues.fdo_competition
+DEFAULT_COMPETITIONS = {"premier_league": "PL"}
+
+# Similitud mínima (difflib) para aceptar un nombre aproximado
+FUZZY_CUTOFF = 0.85
+
+# Un nombre que /teams?name= no encontró no se vuelve a buscar durante este tiempo
+MISS_TTL = timedelta(days=7)
+
+_STOPWORDS = {"fc", "afc", "cf", "sc"}
+
+
+def name_key(name: str) -> str:
+    """Clave de comparación: sin tildes, minúsculas, sin puntuación ni sufijos FC/AFC."""
+    text = re.sub(r"[^a-z0-9 ]", " ", unidecode(name).lower())
+    return " ".join(t for t in text.split() if t not in _STOPWORDS)
+
+
+def _aliases(name: str) -> list[str]:
+    """El nombre más sus variantes conocidas en los mapas de data_loader (Betplay,
+    football-data.co.uk y FBRef apuntan al mismo equipo)."""
+    names = [name, TEAM_NAME_MAP.get(name), FOOTBALL_DATA_TEAM_MAP.get(name)]
+    for alias_map in (TEAM_NAME_MAP, FOOTBALL_DATA_TEAM_MAP):
+        names += [alias for alias, canonical in alias_map.items() if canonical == name]
+    keys = []
+    for n in names:
+        if n and name_key(n) not in keys:
+            keys.append(name_key(n))
+    return keys
+
+
+class TeamIdResolver:
+    """
+    Resuelve nombres de equipo a IDs de football-data.org sin gastar llamadas.
+
+    Orden de búsqueda:
+    1. Tabla fdo_team_ids (nombre y alias de data_loader, coincidencia exacta).
+    2. Si la competición aún no está cargada: un único GET del listado de
+       equipos de la competición, que llena la tabla en bloque.
+    3. Coincidencia aproximada (difflib) contra los nombres de la competición;
+       el alias encontrado se guarda para la próxima vez.
+    4. Último recurso: /teams?name= (una llamada) y se guarda el resultado;
+       si no lo encuentra se guarda como fallo y no se repite en MISS_TTL.
+
+    El mapeo se mantiene en memoria para todo el proceso. Un error de la base
+    de datos o de la API deja el equipo sin resolver, nunca se propaga.
+    """
+
+    _mapping: dict[str, tuple[int, str, str | None]] | None = None
+    _listed: set[str] | None = None
+    _misses: dict[str, datetime] | None = None
+    _lock = threading.Lock()
+
+    def __init__(self, competition: str | None, client: FootballDataOrgClient | None = None):
+        self.competition = competition
+        self.client = client or FootballDataOrgClient()
+        self.repo = TeamIdRepository()
+
+    @classmethod
+    def for_league(cls, league_db: str, client: FootballDataOrgClient | None = None) -> "TeamIdResolver":
+        from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
+
+        competition = LeaguesConfigRepository().get_fdo_competition(league_db)
+        return cls(competition or DEFAULT_COMPETITIONS.get(league_db), client)
+
+    def resolve(self, name: str) -> int | None:
+        keys = _aliases(name)
+        try:
+            with self._lock:
+                self._ensure_loaded()
+                team_id = self._exact(keys)
+                if team_id is None and self.competition and self.competition not in self._listed:
+                    self._load_competition()
+                    team_id = self._exact(keys)
+                if team_id is None:
+                    team_id = self._fuzzy(name, keys)
+                if team_id is None and self._recent_miss(keys[0]):
+                    logger.debug("Equipo '%s' no encontrado en una búsqueda reciente — se omite", name)
+                    return None
+            if team_id is None:
+                team_id = self._search(name, keys[0])
+        except Exception as e:
+            logger.error("No se pudo resolver '%s' en football-data.org: %s", name, e, exc_info=True)
+            return None
+        return team_id
+
+    def _ensure_loaded(self) -> None:
+        if TeamIdResolver._mapping is None:
+            mapping = self.repo.load()
+            TeamIdResolver._listed = self.repo.listed_competitions()
+            TeamIdResolver._misses = self.repo.load_misses(MISS_TTL)
+            # El mapeo se asigna al final: si algo falla, el próximo resolve vuelve a cargar
+            TeamIdResolver._mapping = mapping
+
+    def _recent_miss(self, key: str) -> bool:
+        missed = self._misses.get(key)
+        return missed is not None and datetime.now() - missed < MISS_TTL
+
+    def _exact(self, keys: list[str]) -> int | None:
+        for key in keys:
+            if key in self._mapping:
+                return self._mapping[key][0]
+        return None
+
+    def _remember(self, rows: list[tuple[str, int, str, str | None]], source: str) -> None:
+        try:
+            self.repo.upsert_many(rows, source)
+        except Exception as e:
+            # El mapeo en memoria sigue sirviendo en este proceso
+            logger.warning("No se pudieron guardar %d IDs de equipo (%s): %s", len(rows), source, e)
+        for key, team_id, team_name, competition in rows:
+            self._mapping[key] = (team_id, team_name, competition)
+
+    def _load_competition(self) -> None:
+        try:
+            teams = self.client.get_competition_teams(self.competition)
+        except Exception as e:
+            logger.warning("No se pudo cargar el listado de equipos de %s: %s", self.competition, e)
+            self._listed.add(self.competition)  # no reintentar en este proceso
+            return
+        rows = {}
+        for team in teams:
+            for label in (team.get("name"), team.get("shortName")):
+                if label:
+                    rows[name_key(label)] = (name_key(label), team["id"], team["name"], self.competition)
+        self._remember(list(rows.values()), "listing")
+        self._listed.add(self.competition)
+        logger.info("IDs de football-data.org: %d equipos de %s cargados", len(teams), self.competition)
+
+    def _fuzzy(self, name: str, keys: list[str]) -> int | None:
+        candidates = [
+            k for k, (_, _, comp) in self._mapping.items()
+            if self.competition is None or comp == self.competition
+        ]
+        for key in keys:
+            close = difflib.get_close_matches(key, candidates, n=1, cutoff=FUZZY_CUTOFF)
+            if close:
+                team_id, team_name, comp = self._mapping[close[0]]
+                logger.info("Equipo '%s' resuelto por similitud como '%s' (id=%d)", name, team_name, team_id)
+                self._remember([(keys[0], team_id, team_name, comp)], "fuzzy")
+                return team_id
+        return None
+
+    def _search(self, name: str, key: str) -> int | None:
+        try:
+            teams = self.client.find_teams(name)
+        except Exception as e:
+            # Fallo de la API: no se registra como "no encontrado", se reintenta en la próxima corrida
+            logger.warning("No se pudo buscar '%s' en football-data.org: %s", name, e)
+            return None
+
+        if not teams:
+            logger.info("Equipo '%s' no encontrado en football-data.org — no se busca de nuevo en %s",
+                        name, MISS_TTL)
+            with self._lock:
+                self._misses[key] = datetime.now()
+            try:
+                self.repo.save_miss(key, self.competition)
+            except Exception as e:
+                logger.warning("No se pudo guardar la búsqueda fallida de '%s': %s", name, e)
+            return None
+
+        team_id = teams[0]["id"]
+        with self._lock:
+            self._remember([(key, team_id, name, self.competition)], "search")
+        return team_id
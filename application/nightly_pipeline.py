@@ -0,0 +1,143 @@
+"""
+Pipeline nightly por liga.
+
+Etapas:
+  update    descarga la temporada actual y hace upsert (I/O → pool de hilos)
+  snapshot  recalcula el snapshot de forma                (I/O → pool de hilos)
+  train     features + fit + publicación en el registro   (CPU → pool de procesos)
+
+Cada liga avanza de forma independiente: en cuanto su upsert termina pasa a
+snapshot y se encola para entrenar, sin esperar a las demás. El entrenamiento
+corre en procesos aparte (spawn: no heredan el pool de conexiones del padre),
+así una liga larga no bloquea al resto y el cálculo de features no compite por
+el GIL con el scheduler.
+
+El progreso se publica en el dict `progress` ({league_db: estado}), que el
+scheduler expone en /status.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import train_xgboost
+from application.football_data.football_data_service import FootballDataService
+from infrastructure.logging_config import setup_logging
+from models.xgboost import form_snapshot, registry
+
+logger = logging.getLogger(__name__)
+
+# Descargas/upserts simultáneos
+IO_WORKERS = int(os.getenv("NIGHTLY_IO_WORKERS", "4"))
+# Entrenamientos simultáneos (cada uno ya usa varios hilos de xgboost)
+CPU_WORKERS = int(os.getenv("NIGHTLY_CPU_WORKERS", "2"))
+
+_progress_lock = threading.Lock()
+
+
+def _set(progress: dict, league_db: str, **fields) -> None:
+    # Se reemplaza el dict de la liga completo: /status puede serializar
+    # `progress` desde otro hilo mientras el pipeline avanza
+    with _progress_lock:
+        progress[league_db] = {**progress[league_db], **fields}
+
+
+def _stage_done(progress: dict, league_db: str, step: str, elapsed: float, **fields) -> None:
+    with _progress_lock:
+        state = progress[league_db]
+        progress[league_db] = {
+            **state, **fields,
+            "timings": {**state["timings"], step: round(elapsed, 2)},
+        }
+
+
+def _needs_training(db_name: str) -> bool:
+    """True si la liga no tiene un modelo vigente: sin versión en el registro
+    (usa el modelo legado) o con el último reentrenamiento fallido."""
+    return registry.latest_version(db_name) is None or registry.last_training_failed(db_name)
+
+
+def _update_league(league: dict, progress: dict) -> bool:
+    """Etapas de I/O de una liga. Retorna True si hay que reentrenar.
+
+    Se omite solo si el upsert no escribió filas en la base de la liga (no
+    importa si el CSV vino de la caché HTTP) y la liga ya tiene un modelo
+    publicado cuyo último reentrenamiento terminó bien. Un fallo del upsert se
+    propaga como error de la liga en vez de marcarla como sin cambios.
+    """
+    db_name = league["league_db"]
+
+    _set(progress, db_name, stage="update", started_at=datetime.now().isoformat())
+    t0 = time.perf_counter()
+    upserted = FootballDataService(db_name=db_name).update_current_season()
+    _stage_done(progress, db_name, "update", time.perf_counter() - t0, changed_rows=upserted)
+    if upserted == 0 and not _needs_training(db_name):
+        return False
+
+    _set(progress, db_name, stage="snapshot")
+    t0 = time.perf_counter()
+    form_snapshot.refresh(db_name)
+    _stage_done(progress, db_name, "snapshot", time.perf_counter() - t0)
+    return True
+
+
+def _train_league(db_name: str) -> float:
+    """Corre en el pool de procesos: entrena y publica el modelo de la liga."""
+    t0 = time.perf_counter()
+    train_xgboost.run(db_name)
+    return time.perf_counter() - t0
+
+
+def new_progress(leagues: list[dict]) -> dict[str, dict]:
+    """Estado inicial por liga. Se crea completo antes de publicarlo para que el
+    dict no cambie de tamaño mientras /status lo lee."""
+    return {lg["league_db"]: {"stage": "queued", "status": None, "timings": {}} for lg in leagues}
+
+
+def run(leagues: list[dict], progress: dict) -> dict[str, dict]:
+    """Ejecuta el pipeline para todas las ligas y retorna el estado final por liga.
+
+    `progress` debe venir de new_progress(leagues); se actualiza en el sitio.
+    """
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as io_pool, \
+            ProcessPoolExecutor(max_workers=CPU_WORKERS,
+                                mp_context=multiprocessing.get_context("spawn"),
+                                initializer=setup_logging) as cpu_pool:
+        io_futures = {io_pool.submit(_update_league, lg, progress): lg for lg in leagues}
+        train_futures = {}
+
+        for future in as_completed(io_futures):
+            db_name = io_futures[future]["league_db"]
+            try:
+                changed = future.result()
+            except Exception as e:
+                logger.error("Nightly — %s falló en %s: %s", db_name, progress[db_name]["stage"], e, exc_info=True)
+                _set(progress, db_name, status=f"error: {e}")
+                continue
+            if not changed:
+                logger.info("Nightly — %s sin partidos nuevos y con modelo vigente: "
+                            "se omiten snapshot y reentrenamiento", db_name)
+                _set(progress, db_name, stage="done", status="skipped")
+                continue
+            _set(progress, db_name, stage="train")
+            train_futures[cpu_pool.submit(_train_league, db_name)] = db_name
+
+        for future in as_completed(train_futures):
+            db_name = train_futures[future]
+            try:
+                elapsed = future.result()
+            except Exception as e:
+                logger.error("Nightly — %s falló al entrenar: %s", db_name, e, exc_info=True)
+                registry.mark_failed(db_name, str(e))
+                _set(progress, db_name, status=f"error: {e}")
+                continue
+            _stage_done(progress, db_name, "train", elapsed, stage="done", status="ok")
+
+    for db_name, state in progress.items():
+        logger.info("Nightly — %-20s %-8s %s", db_name, state["status"], state["timings"])
+    logger.info("Pipeline nightly: %d ligas en %.1fs", len(leagues), time.perf_counter() - t_start)
+    return dict(progress)
@@ -4,17 +4,19 @@ from datetime import datetime
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
-import train_xgboost
+from application import nightly_pipeline
 from application.betplay.betplay_service import BetplayService
-from application.football_data.football_data_service import FootballDataService
+from application.football_data_org.h2h_service import H2HService
+from infrastructure.betplay.betplay_api_client import BetplayAPIClient
 from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
 from models.xgboost import predictor as xgboost_predictor
+from models.xgboost.data_loader import h2h_fixtures
 
 logger = logging.getLogger(__name__)
 
 last_run: dict = {
     "betplay": {"time": None, "status": None},
-    "nightly": {"time": None, "status": None},
+    "nightly": {"time": None, "status": None, "leagues": {}},
 }
 
 
@@ -25,12 +27,31 @@ def run_betplay() -> None:
     try:
         leagues = LeaguesConfigRepository().find_active()
         logger.info("Ligas activas: %d", len(leagues))
+
+        # Cuotas de todas las ligas en paralelo (asyncio, tope global de concurrencia)
+        t_fetch = time.perf_counter()
+        odds = BetplayAPIClient().get_full_data_many([lg["betplay_path"] for lg in leagues])
+        logger.info("Cuotas de %d ligas obtenidas en %.1fs", len(leagues), time.perf_counter() - t_fetch)
+
+        # Guardar cuotas y lanzar en segundo plano la precarga de H2H de cada liga.
+        # El predictor no espera a esa precarga: usa los H2H ya cacheados y los
+        # que falten entran en el siguiente ciclo
+        ready = []
         for league in leagues:
             logger.info("Procesando liga: %s", league["name"])
+            df_odds = odds.get(league["betplay_path"])
+            if df_odds is None:
+                logger.error("Sin cuotas para %s — liga omitida en este ciclo", league["name"])
+                continue
             BetplayService(
                 league_db=league["league_db"],
                 betplay_path=league["betplay_path"],
-            ).save_league_odds()
+            ).save_league_odds(df_odds)
+            if not df_odds.empty:
+                H2HService(league["league_db"]).warm_up_in_background(h2h_fixtures(df_odds))
+            ready.append(league)
+
+        for league in ready:
             xgboost_predictor.run(league["league_db"])
         last_run["betplay"]["status"] = "ok"
         logger.info("=== Job betplay completado en %.1fs ===", time.perf_counter() - t0)
@@ -40,17 +61,21 @@ def run_betplay() -> None:
 
 
 def run_nightly() -> None:
-    """Sincroniza la temporada actual y reentrena el modelo XGBoost por liga."""
+    """Sincroniza la temporada actual, recalcula el snapshot de forma y reentrena por liga.
+
+    Las ligas avanzan en paralelo (ver nightly_pipeline); el progreso por liga
+    y etapa queda en last_run["nightly"]["leagues"].
+    """
     last_run["nightly"]["time"] = datetime.now().isoformat()
     logger.info("=== Iniciando job nightly ===")
     t0 = time.perf_counter()
     try:
         leagues = LeaguesConfigRepository().find_active()
-        for league in leagues:
-            logger.info("Nightly — %s", league["name"])
-            FootballDataService(db_name=league["league_db"]).update_current_season()
-            train_xgboost.run(league["league_db"])
-        last_run["nightly"]["status"] = "ok"
+        progress = nightly_pipeline.new_progress(leagues)
+        last_run["nightly"]["leagues"] = progress
+        results = nightly_pipeline.run(leagues, progress)
+        failed = [db for db, state in results.items() if (state["status"] or "").startswith("error")]
+        last_run["nightly"]["status"] = f"error: {', '.join(failed)}" if failed else "ok"
         logger.info("=== Job nightly completado en %.1fs ===", time.perf_counter() - t0)
     except Exception as e:
         last_run["nightly"]["status"] = f"error: {e}"
@@ -0,0 +1,214 @@
+"""
+Backtesting walk-forward del modelo XGBoost 1X2.
+
+Por cada liga y cada temporada de test T (a partir de la MIN_TRAIN_SEASONS-ésima)
+se entrena con todas las temporadas anteriores a T —mismo esquema que
+train_xgboost: decaimiento por temporada y el último tramo como conjunto de
+calibración— y se predice T completa. Las features se calculan una sola vez
+por liga (o se leen de feature_cache) y cada fold solo toma cortes de esa matriz.
+
+Sobre las predicciones de test se aplica la misma regla de value bet que
+predictor.run (is_value_bet: VALUE_THRESHOLD sobre la probabilidad justa y
+cuota > MIN_ODD) con las cuotas B365 del histórico, apostando 1 unidad por pick.
+
+Los folds de todas las ligas se entrenan en paralelo en un pool de procesos.
+
+Uso:
+  python backtest_xgboost.py                          # todas las ligas activas
+  python backtest_xgboost.py premier_league la_liga   # ligas concretas
+  python backtest_xgboost.py --workers=4
+"""
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from models.xgboost import feature_cache
+from models.xgboost.data_loader import load_historical_matches
+from models.xgboost.model import XGBoostResult
+from models.xgboost.odds_utils import devig, is_value_bet
+from train_xgboost import CAL_RATIO, SEASON_DECAY, TRAIN_RATIO
+
+logger = logging.getLogger(__name__)
+
+RESULT_KEYS = ["home_win", "draw", "away_win"]
+
+# Temporadas mínimas de entrenamiento antes del primer fold de test
+MIN_TRAIN_SEASONS = 3
+# Bins de la curva de fiabilidad (probabilidad predicha vs frecuencia observada)
+RELIABILITY_BINS = 10
+
+
+def walk_forward_folds(seasons: pd.Series, min_train: int = MIN_TRAIN_SEASONS) -> list[tuple[str, np.ndarray, np.ndarray]]:
+    """[(temporada_test, índices_train, índices_test)] en orden cronológico."""
+    ordered = sorted(seasons.unique())
+    values = seasons.to_numpy()
+    folds = []
+    for i in range(min_train, len(ordered)):
+        test_season = ordered[i]
+        train_idx = np.flatnonzero(np.isin(values, ordered[:i]))
+        test_idx = np.flatnonzero(values == test_season)
+        folds.append((test_season, train_idx, test_idx))
+    return folds
+
+
+def _fold_weights(train_seasons: pd.Series) -> np.ndarray:
+    """Decaimiento SEASON_DECAY relativo a la última temporada de entrenamiento del fold."""
+    order = {s: i for i, s in enumerate(sorted(train_seasons.unique()))}
+    last = len(order) - 1
+    return train_seasons.map(lambda s: SEASON_DECAY ** (last - order[s])).to_numpy()
+
+
+def _run_fold(league_db: str, season: str, X_train: pd.DataFrame, y_train: pd.Series,
+              w_train: np.ndarray, X_test: pd.DataFrame) -> tuple[str, str, list[dict]]:
+    """Entrena un fold y retorna las predicciones (mismo redondeo que el predictor)."""
+    # Un hilo por modelo: el paralelismo lo da el pool de procesos
+    n_fit = int(len(X_train) * TRAIN_RATIO / (TRAIN_RATIO + CAL_RATIO))
+    model = XGBoostResult()
+    model.clf.set_params(n_jobs=1)
+    model.fit(
+        X_train.iloc[:n_fit], y_train.iloc[:n_fit], sample_weight=w_train[:n_fit],
+        X_cal=X_train.iloc[n_fit:], y_cal=y_train.iloc[n_fit:],
+    )
+    return league_db, season, model.predict_batch(X_test)
+
+
+def _reliability_curve(proba: np.ndarray, y_onehot: np.ndarray, bins: int = RELIABILITY_BINS) -> list[dict]:
+    """Curva de fiabilidad sobre las tres clases agrupadas."""
+    p, o = proba.ravel(), y_onehot.ravel()
+    idx = np.minimum((p * bins).astype(int), bins - 1)
+    curve = []
+    for b in range(bins):
+        mask = idx == b
+        if not mask.any():
+            continue
+        curve.append({
+            "bin":       f"{b / bins:.1f}-{(b + 1) / bins:.1f}",
+            "mean_pred": round(float(p[mask].mean()), 4),
+            "observed":  round(float(o[mask].mean()), 4),
+            "count":     int(mask.sum()),
+        })
+    return curve
+
+
+def _bets(preds: list[dict], X_test: pd.DataFrame, y_test: pd.Series) -> list[tuple[float, bool]]:
+    """Value bets del fold: [(cuota, acertada)]."""
+    bets = []
+    odds_rows = X_test[["odd_h", "odd_d", "odd_a"]].to_numpy()
+    for pred, (odd_h, odd_d, odd_a), result in zip(preds, odds_rows, y_test.to_numpy()):
+        fair = devig(odd_h, odd_d, odd_a)
+        for k, key in enumerate(RESULT_KEYS):
+            odd = (odd_h, odd_d, odd_a)[k]
+            if is_value_bet(pred[key], fair[k], odd):
+                bets.append((float(odd), result == k))
+    return bets
+
+
+def evaluate_predictions(preds: list[dict], X_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    """Accuracy, log-loss, Brier, ROI/hit rate de los value bets y curva de fiabilidad."""
+    proba = np.array([[p[k] for k in RESULT_KEYS] for p in preds], dtype=float)
+    y = y_test.to_numpy()
+    y_onehot = np.eye(3)[y]
+
+    bets = _bets(preds, X_test, y_test)
+    hits = sum(1 for _, won in bets if won)
+    profit = sum(odd - 1 if won else -1.0 for odd, won in bets)
+
+    return {
+        "matches":     int(len(y)),
+        "accuracy":    round(float((proba.argmax(axis=1) == y).mean()), 4),
+        "log_loss":    round(float(-np.log(np.clip(proba[np.arange(len(y)), y], 1e-15, 1)).mean()), 4),
+        "brier":       round(float(((proba - y_onehot) ** 2).sum(axis=1).mean()), 4),
+        "bets":        len(bets),
+        "hits":        hits,
+        "hit_rate":    round(hits / len(bets), 4) if bets else None,
+        "profit":      round(profit, 2),
+        "roi":         round(profit / len(bets), 4) if bets else None,
+        "reliability": _reliability_curve(proba, y_onehot),
+    }
+
+
+def run(db_names: list[str], workers: int | None = None) -> dict[str, dict]:
+    """Backtest walk-forward de varias ligas. Retorna {league_db: reporte}."""
+    t0 = time.perf_counter()
+    data, tasks = {}, []
+    for db_name in db_names:
+        logger.info("Construyendo features (%s)...", db_name)
+        X, y, seasons = feature_cache.load_or_build(db_name, load_historical_matches(db_name))
+        data[db_name] = (X, y, seasons)
+        for season, train_idx, test_idx in walk_forward_folds(seasons):
+            tasks.append((db_name, season, train_idx, test_idx))
+            logger.info("  Fold %s — train: %d  test: %d", season, len(train_idx), len(test_idx))
+
+    workers = workers or os.cpu_count() or 1
+    logger.info("Entrenando %d folds en %d procesos...", len(tasks), workers)
+    fold_preds: dict[tuple[str, str], list[dict]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for db_name, season, train_idx, test_idx in tasks:
+            X, y, seasons = data[db_name]
+            futures.append(executor.submit(
+                _run_fold, db_name, season,
+                X.iloc[train_idx], y.iloc[train_idx], _fold_weights(seasons.iloc[train_idx]),
+                X.iloc[test_idx],
+            ))
+        for future in futures:
+            db_name, season, preds = future.result()
+            fold_preds[(db_name, season)] = preds
+
+    reports = {}
+    for db_name in db_names:
+        X, y, _ = data[db_name]
+        league_tasks = [t for t in tasks if t[0] == db_name]
+        if not league_tasks:
+            logger.warning("%s: menos de %d temporadas, sin folds de test", db_name, MIN_TRAIN_SEASONS + 1)
+            continue
+        folds = {}
+        all_preds, all_idx = [], []
+        for _, season, _, test_idx in league_tasks:
+            preds = fold_preds[(db_name, season)]
+            folds[season] = {k: v for k, v in evaluate_predictions(preds, X.iloc[test_idx], y.iloc[test_idx]).items()
+                             if k != "reliability"}
+            all_preds += preds
+            all_idx.append(test_idx)
+        idx = np.concatenate(all_idx)
+        reports[db_name] = {**evaluate_predictions(all_preds, X.iloc[idx], y.iloc[idx]), "folds": folds}
+
+    logger.info("Backtest completado en %.1fs", time.perf_counter() - t0)
+    return reports
+
+
+def print_report(db_name: str, report: dict) -> None:
+    def pct(v):
+        return f"{v * 100:.1f}%" if v is not None else "—"
+
+    print(f"\n🏆 {db_name}")
+    print(f"  {'Temporada':<10} {'Partidos':>8} {'Acc':>7} {'LogLoss':>8} {'Brier':>7} "
+          f"{'Apuestas':>9} {'Acierto':>8} {'ROI':>8}")
+    for season, m in {**report["folds"], "TOTAL": report}.items():
+        print(f"  {season:<10} {m['matches']:>8} {pct(m['accuracy']):>7} {m['log_loss']:>8.4f} "
+              f"{m['brier']:>7.4f} {m['bets']:>9} {pct(m['hit_rate']):>8} {pct(m['roi']):>8}")
+
+    print("  📐 Fiabilidad (predicho → observado)")
+    for b in report["reliability"]:
+        print(f"     {b['bin']}  {b['mean_pred']:.3f} → {b['observed']:.3f}  (n={b['count']})")
+
+
+def main():
+    args = sys.argv[1:]
+    workers = next((int(a.split("=", 1)[1]) for a in args if a.startswith("--workers=")), None)
+    db_names = [a for a in args if not a.startswith("--")]
+    if not db_names:
+        from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
+        db_names = [lg["league_db"] for lg in LeaguesConfigRepository().find_active()]
+
+    for db_name, report in run(db_names, workers=workers).items():
+        print_report(db_name, report)
+
+
+if __name__ == "__main__":
+    main()
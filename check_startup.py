@@ -0,0 +1,73 @@
+"""
+Benchmark del tiempo de import de main.py y del predictor.
+
+Cada medición corre en un intérprete nuevo (sin módulos en caché) y se toma la
+mediana de varias corridas. Falla (exit 1) si se supera el presupuesto o si el
+camino de arranque/inferencia carga alguno de los plugins pesados.
+
+Uso:
+  python check_startup.py               # presupuesto por defecto
+  STARTUP_BUDGET_S=0.8 python check_startup.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Presupuesto de arranque de main.py (segundos, mediana)
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "1.5"))
+RUNS = 5
+
+# Módulos que solo deben cargarse al notificar o entrenar, nunca al importar
+HEAVY_MODULES = ("matplotlib", "groq", "sklearn", "xgboost", "PIL")
+
+TARGETS = ["main", "models.xgboost.predictor"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module: str, runs: int = RUNS) -> tuple[float, list[str]]:
+    """Mediana del tiempo de `import module` y módulos pesados que arrastra."""
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    timings, heavy = [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(result["elapsed"])
+        heavy.update(result["heavy"])
+    return statistics.median(timings), sorted(heavy)
+
+
+def main() -> int:
+    failed = False
+    timings = {}
+    for module in TARGETS:
+        timings[module], heavy = measure(module)
+        print(f"  {module:<28} {timings[module]:6.3f}s")
+        if heavy:
+            print(f"  ❌ {module} importa módulos pesados: {', '.join(heavy)}")
+            failed = True
+
+    startup = timings["main"]
+    if startup > STARTUP_BUDGET_S:
+        print(f"❌ Arranque de main.py: {startup:.3f}s > presupuesto {STARTUP_BUDGET_S:.2f}s")
+        failed = True
+    else:
+        print(f"✅ Arranque de main.py: {startup:.3f}s (presupuesto {STARTUP_BUDGET_S:.2f}s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
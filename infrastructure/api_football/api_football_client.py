@@ -2,6 +2,8 @@ import os
 
 import requests
 
+from infrastructure.rate_limiter import get_limiter
+
 
 class APIFootballClient:
     """Cliente para API-Football v3 (RapidAPI).
@@ -23,6 +25,10 @@ class APIFootballClient:
     def _get(self, endpoint: str, params: dict) -> list:
         if not self.enabled:
             return []
+        # Cuota diaria: sin saldo no se espera, se omite la llamada
+        if not get_limiter("api_football").acquire(block=False):
+            print(f"⚠️  API-Football [{endpoint}]: cuota diaria agotada, se omite la llamada")
+            return []
         try:
             r = requests.get(
                 f"{self.BASE_URL}/{endpoint}",
@@ -1,31 +1,149 @@
+import asyncio
 import logging
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import httpx
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from unidecode import unidecode
+from urllib3.util.retry import Retry
 
 from infrastructure.betplay.config import Config
 
 logger = logging.getLogger(__name__)
 
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+_metrics: dict[str, dict] = {}
+_metrics_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """Session HTTP compartida (pool keep-alive + reintentos) para todo el proceso."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=Config.MAX_RETRIES,
+                    backoff_factor=Config.BACKOFF_FACTOR,
+                    status_forcelist=Config.RETRY_STATUS,
+                    allowed_methods=frozenset({"GET"}),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=Config.POOL_SIZE,
+                    pool_maxsize=Config.POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.headers.update(Config.HEADERS)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _record(endpoint: str, elapsed: float, ok: bool) -> None:
+    with _metrics_lock:
+        m = _metrics.setdefault(endpoint, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        m["count"] += 1
+        m["errors"] += 0 if ok else 1
+        m["total_ms"] += elapsed * 1000
+        m["max_ms"] = max(m["max_ms"], elapsed * 1000)
+
+
+def latency_metrics() -> dict[str, dict]:
+    """Latencia acumulada por endpoint: {endpoint: {count, errors, avg_ms, max_ms}}."""
+    with _metrics_lock:
+        return {
+            endpoint: {
+                "count":  m["count"],
+                "errors": m["errors"],
+                "avg_ms": round(m["total_ms"] / m["count"], 1),
+                "max_ms": round(m["max_ms"], 1),
+            }
+            for endpoint, m in _metrics.items()
+        }
+
+
+def _get_json(endpoint: str, url: str, params: dict | None = None) -> dict:
+    """GET con la session compartida, timeout y registro de latencia por endpoint."""
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        response = _get_session().get(url, params=params, timeout=Config.TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        ok = True
+        return data
+    finally:
+        elapsed = time.perf_counter() - t0
+        _record(endpoint, elapsed, ok)
+        logger.debug("GET %s — %.0f ms", endpoint, elapsed * 1000)
+
+
+async def _get_json_async(
+    client: httpx.AsyncClient, sem: asyncio.Semaphore, endpoint: str, url: str,
+) -> dict:
+    """Versión asíncrona de _get_json: mismo timeout, reintentos con backoff y métricas."""
+    for attempt in range(Config.MAX_RETRIES + 1):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            async with sem:
+                response = await client.get(url)
+            if response.status_code in Config.RETRY_STATUS and attempt < Config.MAX_RETRIES:
+                raise httpx.HTTPStatusError(
+                    f"HTTP {response.status_code}", request=response.request, response=response,
+                )
+            response.raise_for_status()
+            data = response.json()
+            ok = True
+            return data
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            retryable = (
+                not isinstance(e, httpx.HTTPStatusError)
+                or e.response.status_code in Config.RETRY_STATUS
+            )
+            if not retryable or attempt == Config.MAX_RETRIES:
+                raise
+        finally:
+            _record(endpoint, time.perf_counter() - t0, ok)
+        await asyncio.sleep(Config.BACKOFF_FACTOR * 2 ** attempt)
+
+
+def _base_url(path: str) -> str:
+    return (Config.API_URL + "/listView" + path
+            + ".json?lang=es_ES&market=CO&client_id=2&channel_id=1&ncid=1641434042006&useCombined=true")
+
+
+def _category_url(path: str, category: str) -> str:
+    endpoint = (f".json?lang=es_ES&market=CO&client_id=2&channel_id=1"
+                f"&ncid=1641434366938&category={category}&useCombined=true")
+    return Config.API_URL + "/listView" + path + endpoint
+
+
+def _empty_category() -> pd.DataFrame:
+    return pd.DataFrame({"id": pd.Series(dtype="int64")})
+
 
 class BetplayAPIClient:
 
+    def __init__(self):
+        # Columna de cuota → (mercado, resultado); se cumple columna == f"{mercado} {resultado}"
+        self._selections: dict[str, tuple[str, str]] = {}
+
     @staticmethod
     def fetch_leagues():
         url = Config.API_URL + "/group/highlight.json"
         logger.debug("GET %s", url)
         try:
-            response = requests.get(
-                url,
-                params=Config.DEFAULT_PARAMS,
-                headers=Config.HEADERS,
-                timeout=10
-            )
-            response.raise_for_status()
-            groups = response.json().get('groups', [])
+            groups = _get_json("group/highlight", url, params=Config.DEFAULT_PARAMS).get('groups', [])
             logger.info("Ligas obtenidas: %d", len(groups))
             return groups
 
@@ -38,12 +156,87 @@ class BetplayAPIClient:
         return df_partidos
 
     def get_datos_partidos(self, path):
-        url = (Config.API_URL + "/listView" + path
-               + ".json?lang=es_ES&market=CO&client_id=2&channel_id=1&ncid=1641434042006&useCombined=true")
         logger.debug("GET partidos base — path: %s", path)
+        df_partidos = self._parse_base(_get_json("listView", _base_url(path)))
+
+        logger.debug("Fetching %d categorías en paralelo", len(Config.CATEGORY_IDS))
+        with ThreadPoolExecutor(max_workers=len(Config.CATEGORY_IDS)) as executor:
+            futures = {cat: executor.submit(self.get_data_event_by_category, path, cat)
+                       for cat in Config.CATEGORY_IDS}
+            category_dfs = {cat: future.result() for cat, future in futures.items()}
+
+        return self._merge_categories(df_partidos, category_dfs)
+
+    def get_data_event_by_category(self, path, category):
+        try:
+            data_api_json = _get_json(f"listView/category={category}", _category_url(path, category))
+        except requests.exceptions.RequestException as e:
+            # Una categoría caída no invalida el resto: se fusiona sin sus columnas
+            logger.warning("Categoría %s no disponible (%s): %s", category, path, e)
+            return _empty_category()
+        df_partidos = self._parse_category(data_api_json)
+        logger.debug("Categoría %s: %d eventos", category, len(df_partidos))
+        return df_partidos
+
+    def get_full_data_many(self, paths: list[str]) -> dict[str, pd.DataFrame | None]:
+        """Cuotas de varias ligas a la vez: base y categorías de todas en paralelo.
+
+        Todas las peticiones comparten un AsyncClient y un semáforo global
+        (Config.MAX_CONCURRENCY), así el ciclo dura lo que la liga más lenta y
+        no la suma de todas. Retorna {path: DataFrame}; None si falló el listView
+        base de esa liga.
+        """
+        return asyncio.run(self._gather_leagues(paths))
+
+    async def _gather_leagues(self, paths: list[str]) -> dict[str, pd.DataFrame | None]:
+        sem = asyncio.Semaphore(Config.MAX_CONCURRENCY)
+        limits = httpx.Limits(max_connections=Config.POOL_SIZE, max_keepalive_connections=Config.POOL_SIZE)
+        timeout = httpx.Timeout(Config.TIMEOUT[1], connect=Config.TIMEOUT[0])
+        async with httpx.AsyncClient(headers=Config.HEADERS, limits=limits, timeout=timeout) as client:
+            results = await asyncio.gather(
+                *(self._fetch_league(client, sem, p) for p in paths), return_exceptions=True,
+            )
+        leagues = {}
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                logger.error("Error obteniendo cuotas (%s): %s", path, result)
+                result = None
+            leagues[path] = result
+        return leagues
+
+    async def _fetch_league(
+        self, client: httpx.AsyncClient, sem: asyncio.Semaphore, path: str,
+    ) -> pd.DataFrame | None:
+        base_task = _get_json_async(client, sem, "listView", _base_url(path))
+        category_tasks = [
+            _get_json_async(client, sem, f"listView/category={cat}", _category_url(path, cat))
+            for cat in Config.CATEGORY_IDS
+        ]
+        base, *categories = await asyncio.gather(base_task, *category_tasks, return_exceptions=True)
+
+        if isinstance(base, Exception):
+            logger.error("Error obteniendo partidos base (%s): %s", path, base)
+            return None
+
+        category_dfs = {}
+        for cat, data in zip(Config.CATEGORY_IDS, categories):
+            if not isinstance(data, Exception):
+                try:
+                    category_dfs[cat] = self._parse_category(data)
+                    continue
+                except Exception as e:
+                    data = e
+            logger.warning("Categoría %s no disponible (%s): %s", cat, path, data)
+            category_dfs[cat] = _empty_category()
 
-        response = requests.get(url, headers=Config.HEADERS)
-        data_api_partido = response.json()
+        # Un payload malformado invalida solo esta liga, no el ciclo completo
+        try:
+            return self._merge_categories(self._parse_base(base), category_dfs)
+        except Exception as e:
+            logger.error("Respuesta inválida de partidos base (%s): %s", path, e, exc_info=True)
+            return None
+
+    def _parse_base(self, data_api_partido: dict) -> pd.DataFrame:
         partidos = data_api_partido["events"]
         logger.debug("Eventos base recibidos: %d", len(partidos))
 
@@ -63,33 +256,11 @@ class BetplayAPIClient:
             dicc_partido.update(dicc_offers)
             lista_partidos.append(dicc_partido)
 
-        df_partidos = pd.DataFrame(lista_partidos)
-
-        category_ids = ['11942', '12220', '11927', '11929', '12319', '11930', '11931', '19260']
-        logger.debug("Fetching %d categorías en paralelo", len(category_ids))
-        with ThreadPoolExecutor(max_workers=len(category_ids)) as executor:
-            futures = {cat: executor.submit(self.get_data_event_by_category, path, cat)
-                       for cat in category_ids}
-            category_dfs = {cat: future.result() for cat, future in futures.items()}
-
-        df_resultado = df_partidos
-        for cat in category_ids:
-            df_cat = category_dfs[cat].drop(columns=["partido"], errors="ignore")
-            df_resultado = df_resultado.merge(df_cat, on="id", how="left")
-
-        logger.info("DataFrame final: %d partidos, %d columnas", len(df_resultado), len(df_resultado.columns))
-        return df_resultado
-
-    def get_data_event_by_category(self, path, category):
-        endpoint = (f".json?lang=es_ES&market=CO&client_id=2&channel_id=1"
-                    f"&ncid=1641434366938&category={category}&useCombined=true")
-        url = Config.API_URL + "/listView" + path + endpoint
-        response = requests.get(url, headers=Config.HEADERS)
-        data_api_json = response.json()
-        events = data_api_json["events"]
+        return pd.DataFrame(lista_partidos)
 
+    def _parse_category(self, data_api_json: dict) -> pd.DataFrame:
         lista_partidos = []
-        for e in events:
+        for e in data_api_json["events"]:
             event = e["event"]
             bet_offers = e["betOffers"]
             dicc_partido = {
@@ -100,9 +271,22 @@ class BetplayAPIClient:
             dicc_partido.update(dicc_offers)
             lista_partidos.append(dicc_partido)
 
-        df_partidos = pd.DataFrame(lista_partidos)
-        logger.debug("Categoría %s: %d eventos", category, len(df_partidos))
-        return df_partidos
+        if not lista_partidos:
+            return _empty_category()
+        return pd.DataFrame(lista_partidos)
+
+    def _merge_categories(self, df_partidos: pd.DataFrame, category_dfs: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        if df_partidos.empty:
+            return df_partidos
+
+        df_resultado = df_partidos
+        for cat in Config.CATEGORY_IDS:
+            df_cat = category_dfs[cat].drop(columns=["partido"], errors="ignore")
+            df_resultado = df_resultado.merge(df_cat, on="id", how="left")
+
+        df_resultado.attrs["selections"] = dict(self._selections)
+        logger.info("DataFrame final: %d partidos, %d columnas", len(df_resultado), len(df_resultado.columns))
+        return df_resultado
 
     def get_offers_event(self, bet_offers):
         dicc_offers = {}
@@ -112,9 +296,13 @@ class BetplayAPIClient:
                 title = offer["criterion"].get("label")
             for outcome in offer["outcomes"]:
                 if outcome.get("line") is not None:
-                    title_aux = unidecode(title + " " + outcome["label"] + " " + str(outcome["line"] / 1000))
+                    market = unidecode(title)
+                    selection = unidecode(outcome["label"] + " " + str(outcome["line"] / 1000))
                 else:
-                    title_aux = title + " " + outcome["label"]
+                    market = title
+                    selection = outcome["label"]
+                title_aux = market + " " + selection
                 if outcome.get('odds') is not None:
                     dicc_offers[title_aux] = outcome["odds"] / 1000
+                    self._selections[title_aux] = (market, selection)
         return dicc_offers
@@ -9,5 +9,18 @@ class Config:
     }
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/json'
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
     }
+    # (connect, read) en segundos: una categoría colgada no puede bloquear el job
+    TIMEOUT = (3.05, 10)
+    # Reintentos acotados con backoff exponencial (0.5 s, 1 s, 2 s) ante errores transitorios
+    MAX_RETRIES = 3
+    BACKOFF_FACTOR = 0.5
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    # Conexiones keep-alive al CDN compartidas por todas las ligas
+    POOL_SIZE = 16
+    # Tope global de peticiones simultáneas en la recolección asíncrona de todas las ligas
+    MAX_CONCURRENCY = 16
+    # Categorías de mercados adicionales que se piden por liga además del listView base
+    CATEGORY_IDS = ['11942', '12220', '11927', '11929', '12319', '11930', '11931', '19260']
@@ -1,6 +1,16 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
 import pandas as pd
 import requests
-from io import StringIO
+
+logger = logging.getLogger(__name__)
 
 BASE_URL = "https://www.football-data.co.uk/mmz4281"
 LEAGUE_CODE = "E0"  # Premier League
@@ -10,27 +20,195 @@ SEASONS = ["1617", "1718", "1819", "1920", "2021", "2122", "2223", "2324", "2425
 
 COLS = ["Date", "HomeTeam", "AwayTeam", "FTHG", "FTAG", "FTR", "HC", "AC", "B365H", "B365D", "B365A"]
 
+# Caché HTTP en disco: CSV crudo + ETag/Last-Modified + DataFrame ya parseado
+CACHE_DIR = os.getenv("FOOTBALL_DATA_CACHE_DIR", "data/cache/football_data")
+
+# Descargas simultáneas en fetch_all
+MAX_WORKERS = 4
+
+
+# Un lock por entrada de caché (código de liga, temporada): ligas que comparten
+# código en el nightly no descargan ni reescriben los mismos archivos a la vez
+_entry_locks: dict[tuple[str, str], threading.Lock] = {}
+_entry_locks_guard = threading.Lock()
+
+
+def _entry_lock(league_code: str, season: str) -> threading.Lock:
+    with _entry_locks_guard:
+        return _entry_locks.setdefault((league_code, season), threading.Lock())
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # Temporal único en el mismo directorio: os.replace es atómico y dos
+    # escritores no se pisan el archivo a medio escribir
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
 
 class FootballDataClient:
-    """Cliente para descargar datos históricos de football-data.co.uk"""
+    """Cliente para descargar datos históricos de football-data.co.uk
+
+    Cada CSV se cachea en disco por (código de liga, temporada). Las temporadas
+    cerradas se sirven siempre desde la caché sin tocar la red; la temporada
+    actual se pide con If-None-Match / If-Modified-Since y solo se vuelve a
+    parsear cuando el contenido cambió.
+
+    La caché HTTP solo evita descargas y parseos. Qué contenido ya está en la
+    base de datos se sigue aparte por `target` (league_db): el llamador marca
+    la temporada con commit_cache() después de persistirla con éxito.
+    """
+
+    def __init__(self, league_code: str = LEAGUE_CODE, cache_dir: str = CACHE_DIR, target: str | None = None):
+        self.league_code = league_code
+        self.cache_dir = cache_dir
+        self.target = target
+        # sha256 devuelto por el último fetch de cada temporada, pendiente de commit_cache
+        self._pending: dict[str, str] = {}
 
     def fetch_season(self, season: str) -> pd.DataFrame:
-        url = f"{BASE_URL}/{season}/{LEAGUE_CODE}.csv"
-        response = requests.get(url, timeout=30)
+        return self.fetch_season_with_status(season)[0]
+
+    def fetch_season_with_status(self, season: str) -> tuple[pd.DataFrame, bool]:
+        """Retorna (df, changed).
+
+        changed=False solo si este mismo contenido ya se marcó con commit_cache
+        para `target`; sin target siempre es True.
+        """
+        with _entry_lock(self.league_code, season):
+            df, digest = self._fetch(season)
+        self._pending[season] = digest
+        return df, digest != self._read_committed(season)
+
+    def commit_cache(self, season: str) -> None:
+        """Registra que el último fetch de la temporada quedó persistido en `target`."""
+        digest = self._pending.pop(season, None)
+        if self.target is None or digest is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_atomic(self._committed_path(season), digest.encode())
+        except OSError as e:
+            logger.warning("No se pudo registrar %s/%s como persistida en %s: %s",
+                           self.league_code, season, self.target, e)
+
+    def _fetch(self, season: str) -> tuple[pd.DataFrame, str]:
+        """Retorna (df, sha256 del CSV) usando la caché HTTP en disco."""
+        meta = self._read_meta(season)
+        cached = self._read_frame(season, meta) if meta else None
+        is_closed = season != SEASONS[-1]
+
+        if cached is not None and is_closed:
+            logger.debug("Temporada %s (%s): temporada cerrada servida desde caché", season, self.league_code)
+            return cached, meta.get("sha256")
+
+        headers = {}
+        if cached is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        url = f"{BASE_URL}/{season}/{self.league_code}.csv"
+        response = requests.get(url, headers=headers, timeout=30)
+        if response.status_code == 304 and cached is not None:
+            logger.debug("Temporada %s (%s): 304 Not Modified", season, self.league_code)
+            return cached, meta.get("sha256")
         response.raise_for_status()
 
-        df = pd.read_csv(StringIO(response.text), usecols=lambda c: c in COLS)
-        df["season"] = season
-        return df.dropna(subset=["HomeTeam", "AwayTeam", "FTHG", "FTAG"])
+        raw = response.content
+        digest = hashlib.sha256(raw).hexdigest()
+        if cached is not None and digest == meta.get("sha256"):
+            # El servidor no respetó la petición condicional pero el contenido es idéntico
+            self._write_meta(season, response, digest)
+            return cached, digest
+
+        # Misma decodificación que response.text (ISO-8859-1 si el servidor no indica charset)
+        df = self._parse(raw, season, response.encoding or "ISO-8859-1")
+        self._write_cache(season, raw, df, response, digest)
+        return df, digest
 
     def fetch_all(self, seasons: list[str] = SEASONS) -> pd.DataFrame:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [(season, executor.submit(self.fetch_season, season)) for season in seasons]
+
         frames = []
-        for season in seasons:
+        for season, future in futures:
             try:
-                df = self.fetch_season(season)
+                df = future.result()
                 frames.append(df)
                 print(f"  ✅ Temporada {season}: {len(df)} partidos")
             except Exception as e:
                 print(f"  ❌ Error en temporada {season}: {e}")
 
         return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    # ------------------------------------------------------------------ #
+    #  Caché en disco                                                      #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _parse(raw: bytes, season: str, encoding: str) -> pd.DataFrame:
+        df = pd.read_csv(BytesIO(raw), usecols=lambda c: c in COLS, encoding=encoding)
+        df["season"] = season
+        return df.dropna(subset=["HomeTeam", "AwayTeam", "FTHG", "FTAG"])
+
+    def _path(self, season: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.league_code}_{season}.{ext}")
+
+    def _committed_path(self, season: str) -> str:
+        return self._path(season, f"{self.target}.committed")
+
+    def _read_committed(self, season: str) -> str | None:
+        if self.target is None:
+            return None
+        try:
+            with open(self._committed_path(season)) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _read_meta(self, season: str) -> dict | None:
+        try:
+            with open(self._path(season, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_frame(self, season: str, meta: dict) -> pd.DataFrame | None:
+        try:
+            return pd.read_pickle(self._path(season, "pkl"))
+        except Exception:
+            # Caché incompleta o corrupta: reparsear desde los bytes crudos si existen
+            try:
+                with open(self._path(season, "csv"), "rb") as f:
+                    return self._parse(f.read(), season, meta.get("encoding") or "ISO-8859-1")
+            except OSError:
+                return None
+
+    def _write_meta(self, season: str, response: requests.Response, digest: str) -> None:
+        meta = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": digest,
+            "encoding": response.encoding,
+        }
+        _write_atomic(self._path(season, "json"), json.dumps(meta).encode())
+
+    def _write_cache(
+        self, season: str, raw: bytes, df: pd.DataFrame, response: requests.Response, digest: str,
+    ) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_atomic(self._path(season, "csv"), raw)
+            buf = BytesIO()
+            df.to_pickle(buf)
+            _write_atomic(self._path(season, "pkl"), buf.getvalue())
+            # Los metadatos se escriben al final: solo marcan válida una caché completa
+            self._write_meta(season, response, digest)
+        except OSError as e:
+            logger.warning("No se pudo escribir la caché de %s/%s: %s", self.league_code, season, e)
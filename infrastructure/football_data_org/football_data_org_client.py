@@ -1,22 +1,17 @@
 import os
-import time
 import requests
 
+from infrastructure.rate_limiter import get_limiter
+
 BASE_URL = "https://api.football-data.org/v4"
 
-# Plan gratuito: 10 requests/minuto → 1 request cada 6 s (7 s para margen)
-_REQUEST_INTERVAL = 7.0
-_last_request_at: float = 0.0
+# Plan gratuito: 10 requests/minuto (ver LIMITS en rate_limiter)
+_limiter = get_limiter("football_data_org")
 
 
 def _throttle():
-    """Espera lo necesario para respetar el rate limit del plan gratuito."""
-    global _last_request_at
-    elapsed = time.monotonic() - _last_request_at
-    wait = _REQUEST_INTERVAL - elapsed
-    if wait > 0:
-        time.sleep(wait)
-    _last_request_at = time.monotonic()
+    """Espera turno en el token bucket compartido de football-data.org."""
+    _limiter.acquire()
 
 
 class FootballDataOrgClient:
@@ -28,21 +23,40 @@ class FootballDataOrgClient:
     def search_team(self, name: str) -> int | None:
         """Busca un equipo por nombre y retorna su ID, o None si no se encuentra."""
         try:
-            _throttle()
-            response = requests.get(
-                f"{BASE_URL}/teams",
-                params={"name": name},
-                headers=self.headers,
-                timeout=10,
-            )
-            if response.status_code != 200:
-                print(f"⚠️ No se pudo buscar equipo '{name}': HTTP {response.status_code}")
-                return None
-            teams = response.json().get("teams", [])
-            return teams[0]["id"] if teams else None
+            teams = self.find_teams(name)
+        except requests.HTTPError as e:
+            print(f"⚠️ No se pudo buscar equipo '{name}': HTTP {e.response.status_code}")
+            return None
         except requests.RequestException as e:
             print(f"❌ Error buscando equipo '{name}': {e}")
             return None
+        return teams[0]["id"] if teams else None
+
+    def find_teams(self, name: str) -> list[dict]:
+        """Equipos que coinciden con `name` ([] si ninguno). A diferencia de
+        search_team, un error HTTP o de red se propaga: así se distingue
+        "no existe" de "no se pudo consultar"."""
+        _throttle()
+        response = requests.get(
+            f"{BASE_URL}/teams",
+            params={"name": name},
+            headers=self.headers,
+            timeout=10,
+        )
+        response.raise_for_status()
+        return response.json().get("teams", [])
+
+    def get_competition_teams(self, competition: str) -> list[dict]:
+        """Equipos de una competición (código PL, PD, SA...) en una sola llamada:
+        [{id, name, shortName, tla, ...}]."""
+        _throttle()
+        response = requests.get(
+            f"{BASE_URL}/competitions/{competition}/teams",
+            headers=self.headers,
+            timeout=10,
+        )
+        response.raise_for_status()
+        return response.json().get("teams", [])
 
     def get_team_matches(self, team_id: int, limit: int = 50) -> list[dict]:
         """Retorna los últimos partidos finalizados de un equipo."""
@@ -71,9 +85,13 @@ class FootballDataOrgClient:
             raise ValueError(f"Equipo no encontrado en football-data.org: '{away_team}'")
 
         matches = self.get_team_matches(home_id, limit=50)
+        return self.filter_h2h(matches, away_id, limit=limit)
 
+    @staticmethod
+    def filter_h2h(team_matches: list[dict], rival_id: int, limit: int = 10) -> list[dict]:
+        """De los partidos de un equipo, los `limit` primeros contra rival_id."""
         h2h = [
-            m for m in matches
-            if m["homeTeam"]["id"] == away_id or m["awayTeam"]["id"] == away_id
+            m for m in team_matches
+            if m["homeTeam"]["id"] == rival_id or m["awayTeam"]["id"] == rival_id
         ]
         return h2h[:limit]
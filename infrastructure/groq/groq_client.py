@@ -1,15 +1,42 @@
+import hashlib
+import json
 import os
-import time
+from datetime import timedelta
+
 from dotenv import load_dotenv
 from groq import Groq
 
+from infrastructure.persistence.explanation_cache_repository import ExplanationCacheRepository
+from infrastructure.rate_limiter import get_limiter
+
 load_dotenv()
 
 _client: Groq | None = None
 
-# Free tier Groq: 30 req/min → usamos 3 s de margen entre llamadas
-_REQUEST_INTERVAL = 3.0
-_last_request_at: float = 0.0
+# Free tier Groq: 30 req/min (ver LIMITS en rate_limiter)
+_limiter = get_limiter("groq")
+
+MODEL = "llama-3.3-70b-versatile"
+# Cambiar al modificar los prompts: invalida la caché de explicaciones
+PROMPT_VERSION = 1
+CACHE_TTL = timedelta(days=14)
+# Partidos por petición en modo lote
+BATCH_SIZE = 8
+
+_STAT_KEYS = [
+    "home_role_pts5", "home_role_gf5", "home_role_ga5",
+    "away_role_pts5", "away_role_gf5", "away_role_ga5",
+    "home_pts5", "home_gf5", "home_ga5",
+    "away_pts5", "away_gf5", "away_ga5",
+]
+
+_SYSTEM = "Eres un analista de fútbol experto que explica predicciones de forma concisa y con datos específicos."
+_STYLE = (
+    "OBLIGATORIO: menciona los valores numéricos más relevantes (pts/partido, goles marcados/recibidos) "
+    "para que el lector entienda por qué el modelo favorece ese resultado. "
+    "El tono debe ser directo, como un analista que habla con un apostador. "
+    "No uses markdown, asteriscos, guiones como viñetas ni emojis. "
+)
 
 
 def _get_client() -> Groq | None:
@@ -23,38 +50,18 @@ def _get_client() -> Groq | None:
 
 
 def _throttle() -> None:
-    global _last_request_at
-    elapsed = time.monotonic() - _last_request_at
-    wait = _REQUEST_INTERVAL - elapsed
-    if wait > 0:
-        time.sleep(wait)
-    _last_request_at = time.monotonic()
-
-
-def generate_match_explanation(
-    home: str,
-    away: str,
-    winner_key: str,
-    stats: dict,
-    h2h_summary: dict | None = None,
-) -> str:
-    """
-    Usa Groq (Llama 3.3 70B) para generar una explicación de la predicción
-    en lenguaje natural incluyendo los datos estadísticos específicos.
+    _limiter.acquire()
 
-    Returns:
-        Explicación en texto plano. Si falla, retorna cadena vacía para usar fallback.
-    """
-    client = _get_client()
-    if not client:
-        return ""
 
-    winner_label = {
+def _winner_label(home: str, away: str, winner_key: str) -> str:
+    return {
         "home_win": f"victoria de {home}",
         "away_win": f"victoria de {away}",
         "draw":     "empate",
     }.get(winner_key, "el resultado predicho")
 
+
+def _stats_block(home: str, away: str, stats: dict, h2h_summary: dict | None) -> str:
     stats_lines = [
         f"- {home} (local): {stats['home_role_pts5']:.2f} pts/partido como local, "
         f"{stats['home_role_gf5']:.2f} goles marcados/partido, {stats['home_role_ga5']:.2f} goles recibidos/partido.",
@@ -76,32 +83,152 @@ def generate_match_explanation(
             f"empates {draws}, {away} ganó {a_wins}."
         )
 
-    stats_block = "\n".join(stats_lines)
+    return "\n".join(stats_lines)
+
 
+def cache_key(home: str, away: str, winner_key: str, stats: dict, h2h_summary: dict | None = None) -> str:
+    """Hash de los datos del prompt. Las stats se redondean a 1 decimal: si solo
+    cambian en centésimas, se reutiliza la explicación ya generada."""
+    h2h = None
+    if h2h_summary and h2h_summary.get("total", 0) >= 3:
+        h2h = [h2h_summary.get(k, 0) for k in ("total", "home_team_wins", "draws", "away_team_wins")]
+    payload = {
+        "v": PROMPT_VERSION,
+        "model": MODEL,
+        "home": home,
+        "away": away,
+        "winner": winner_key,
+        "stats": [round(float(stats[k]), 1) for k in _STAT_KEYS],
+        "h2h": h2h,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _complete_one(client: Groq, match: dict) -> str:
+    home, away = match["home"], match["away"]
     prompt = (
-        f"El modelo predictivo señala como resultado más probable: {winner_label}.\n\n"
-        f"Estadísticas del partido:\n{stats_block}\n\n"
+        f"El modelo predictivo señala como resultado más probable: "
+        f"{_winner_label(home, away, match['winner_key'])}.\n\n"
+        f"Estadísticas del partido:\n{_stats_block(home, away, match['stats'], match.get('h2h_summary'))}\n\n"
         "Con base en estos datos, redacta en español una explicación de 2 o 3 frases que justifique el pronóstico. "
-        "OBLIGATORIO: menciona los valores numéricos más relevantes (pts/partido, goles marcados/recibidos) "
-        "para que el lector entienda por qué el modelo favorece ese resultado. "
-        "El tono debe ser directo, como un analista que habla con un apostador. "
-        "No uses markdown, asteriscos, guiones como viñetas ni emojis. "
+        + _STYLE +
         "Solo devuelve el texto, sin encabezados ni explicaciones adicionales."
     )
+    _throttle()
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": _SYSTEM},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.5,
+        max_tokens=200,
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+def _complete_batch(client: Groq, matches: list[dict]) -> list[str]:
+    """Una sola petición (JSON mode) con las explicaciones de varios partidos."""
+    blocks = []
+    for i, m in enumerate(matches, 1):
+        home, away = m["home"], m["away"]
+        blocks.append(
+            f"Partido {i}: {home} vs {away}. Resultado más probable según el modelo: "
+            f"{_winner_label(home, away, m['winner_key'])}.\n"
+            f"{_stats_block(home, away, m['stats'], m.get('h2h_summary'))}"
+        )
+    prompt = (
+        "\n\n".join(blocks) + "\n\n"
+        "Para cada partido, redacta en español una explicación de 2 o 3 frases que justifique el pronóstico. "
+        + _STYLE +
+        'Responde únicamente con un objeto JSON de la forma '
+        '{"explicaciones": [{"partido": <número>, "texto": "<explicación>"}]}.'
+    )
+    _throttle()
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": _SYSTEM},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.5,
+        max_tokens=220 * len(matches),
+        response_format={"type": "json_object"},
+    )
+    data = json.loads(response.choices[0].message.content or "{}")
+    texts = {
+        int(item["partido"]): str(item.get("texto", "")).strip()
+        for item in data.get("explicaciones", [])
+        if str(item.get("partido", "")).isdigit()
+    }
+    return [texts.get(i, "") for i in range(1, len(matches) + 1)]
 
+
+def generate_match_explanations(matches: list[dict]) -> list[str]:
+    """
+    Explicaciones de varios picks [{home, away, winner_key, stats, h2h_summary}].
+
+    Primero se consulta la caché (llm_explanations); los que falten se piden
+    a Groq de a BATCH_SIZE partidos por petición y se guardan en la caché.
+
+    Returns:
+        Una explicación por pick, en el mismo orden; cadena vacía donde falló
+        (el llamador usa su fallback).
+    """
+    keys = [
+        cache_key(m["home"], m["away"], m["winner_key"], m["stats"], m.get("h2h_summary"))
+        for m in matches
+    ]
+    repo = ExplanationCacheRepository()
     try:
-        _throttle()
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "Eres un analista de fútbol experto que explica predicciones de forma concisa y con datos específicos."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.5,
-            max_tokens=200,
-        )
-        text = response.choices[0].message.content.strip()
-        return text if text else ""
+        found = repo.get_many(keys, CACHE_TTL)
     except Exception as e:
-        print(f"⚠️  Groq error: {e}")
-        return ""
+        print(f"⚠️  Caché de explicaciones no disponible: {e}")
+        found = {}
+
+    # Un pick repetido en la misma ronda se pide una sola vez
+    missing = {k: m for k, m in zip(keys, matches) if k not in found}
+    client = _get_client() if missing else None
+    if client:
+        generated = {}
+        pending = list(missing.items())
+        for start in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[start:start + BATCH_SIZE]
+            try:
+                if len(chunk) == 1:
+                    texts = [_complete_one(client, chunk[0][1])]
+                else:
+                    texts = _complete_batch(client, [m for _, m in chunk])
+            except Exception as e:
+                print(f"⚠️  Groq error: {e}")
+                continue
+            generated.update({k: t for (k, _), t in zip(chunk, texts) if t})
+        if generated:
+            try:
+                repo.save_many(list(generated.items()), MODEL)
+            except Exception as e:
+                print(f"⚠️  No se pudo guardar en la caché de explicaciones: {e}")
+        found.update(generated)
+
+    return [found.get(k, "") for k in keys]
+
+
+def generate_match_explanation(
+    home: str,
+    away: str,
+    winner_key: str,
+    stats: dict,
+    h2h_summary: dict | None = None,
+) -> str:
+    """
+    Usa Groq (Llama 3.3 70B) para generar una explicación de la predicción
+    en lenguaje natural incluyendo los datos estadísticos específicos.
+    Pasa por la caché de explicaciones (ver generate_match_explanations).
+
+    Returns:
+        Explicación en texto plano. Si falla, retorna cadena vacía para usar fallback.
+    """
+    return generate_match_explanations([{
+        "home": home, "away": away, "winner_key": winner_key,
+        "stats": stats, "h2h_summary": h2h_summary,
+    }])[0]
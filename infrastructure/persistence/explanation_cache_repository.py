@@ -0,0 +1,58 @@
+import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from infrastructure.persistence.postgres_config import PostgresConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ExplanationCacheRepository:
+    """Tabla llm_explanations: explicaciones generadas, por hash de los datos del prompt."""
+
+    def get_many(self, keys: list[str], max_age: timedelta) -> dict[str, str]:
+        """Retorna {cache_key: explicación} de las claves guardadas hace menos de max_age."""
+        if not keys:
+            return {}
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT cache_key, explanation FROM llm_explanations
+                    WHERE cache_key = ANY(%s) AND created_at >= %s
+                    """,
+                    (list(keys), datetime.now() - max_age),
+                )
+                return dict(cur.fetchall())
+        finally:
+            PostgresConfig.put_connection(conn)
+
+    def save_many(self, rows: list[tuple[str, str]], model: str) -> None:
+        """Inserta o actualiza [(cache_key, explicación)]."""
+        if not rows:
+            return
+        now = datetime.now()
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO llm_explanations (cache_key, model, explanation, created_at)
+                    VALUES %s
+                    ON CONFLICT (cache_key) DO UPDATE
+                        SET model       = EXCLUDED.model,
+                            explanation = EXCLUDED.explanation,
+                            created_at  = EXCLUDED.created_at
+                    """,
+                    [(key, model, text, now) for key, text in rows],
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+        logger.debug("llm_explanations: %d explicaciones guardadas", len(rows))
@@ -74,6 +74,16 @@ class LeaguesConfigRepository:
             (url, league_db),
         )
 
+    def get_fdo_competition(self, league_db: str) -> str | None:
+        """Código de competición en football-data.org de la liga, o None si no está configurado."""
+        rows = self._query_params("SELECT fdo_competition FROM leagues WHERE league_db = %s", (league_db,))
+        return rows[0]["fdo_competition"] if rows else None
+
+    def get_fd_league_code(self, league_db: str) -> str | None:
+        """Código de la liga en football-data.co.uk, o None si no está configurado."""
+        rows = self._query_params("SELECT fd_league_code FROM leagues WHERE league_db = %s", (league_db,))
+        return rows[0]["fd_league_code"] if rows else None
+
     def find_active(self) -> list[dict]:
         """Retorna solo las ligas con active=True."""
         return self._query("SELECT * FROM leagues WHERE active = TRUE")
@@ -83,10 +93,13 @@ class LeaguesConfigRepository:
         return self._query("SELECT * FROM leagues")
 
     def _query(self, sql: str) -> list[dict]:
+        return self._query_params(sql, None)
+
+    def _query_params(self, sql: str, params: tuple | None) -> list[dict]:
         conn = PostgresConfig.get_connection()
         try:
             with conn.cursor() as cur:
-                cur.execute(sql)
+                cur.execute(sql, params)
                 cols = [d[0] for d in cur.description]
                 return [dict(zip(cols, row)) for row in cur.fetchall()]
         finally:
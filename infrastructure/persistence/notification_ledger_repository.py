@@ -0,0 +1,139 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+from infrastructure.persistence.postgres_config import PostgresConfig
+
+logger = logging.getLogger(__name__)
+
+LedgerKey = tuple[int, str, str]   # (event_id, market, pick)
+
+
+class NotificationLedgerRepository:
+    """Tabla notification_ledger: picks notificados y hasta cuándo cuentan como enviados."""
+
+    def claim_many(self, keys: list[LedgerKey], ttl: timedelta) -> dict[LedgerKey, datetime]:
+        """Registra los picks que no estén vigentes en el ledger.
+
+        Es atómico entre procesos: una fila nueva o vencida se reclama con
+        INSERT ... ON CONFLICT DO UPDATE WHERE vencida, así solo un worker la
+        obtiene. Retorna {key: expires_at} de las reclamadas.
+        """
+        if not keys:
+            return {}
+        now = datetime.now(timezone.utc)
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                rows = execute_values(
+                    cur,
+                    """
+                    INSERT INTO notification_ledger (event_id, market, pick, notified_at, expires_at)
+                    VALUES %s
+                    ON CONFLICT (event_id, market, pick) DO UPDATE
+                        SET notified_at = EXCLUDED.notified_at,
+                            expires_at  = EXCLUDED.expires_at
+                        WHERE notification_ledger.expires_at <= EXCLUDED.notified_at
+                    RETURNING event_id, market, pick, expires_at
+                    """,
+                    [(event_id, market, pick, now, now + ttl) for event_id, market, pick in keys],
+                    fetch=True,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+        return {(event_id, market, pick): expires for event_id, market, pick, expires in rows}
+
+    def expiries(self, keys: list[LedgerKey]) -> dict[LedgerKey, datetime]:
+        """expires_at vigente de los picks que ya están en el ledger."""
+        if not keys:
+            return {}
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                rows = execute_values(
+                    cur,
+                    """
+                    SELECT l.event_id, l.market, l.pick, l.expires_at
+                    FROM notification_ledger l
+                    JOIN (VALUES %s) AS k (event_id, market, pick)
+                      ON l.event_id = k.event_id AND l.market = k.market AND l.pick = k.pick
+                    """,
+                    keys,
+                    template="(%s::BIGINT, %s, %s)",
+                    fetch=True,
+                )
+        finally:
+            PostgresConfig.put_connection(conn)
+        return {(event_id, market, pick): expires for event_id, market, pick, expires in rows}
+
+    def confirm_many(self, claims: dict[LedgerKey, datetime | None], ttl: timedelta) -> int:
+        """Extiende a `ttl` los picks entregados.
+
+        Solo toca las filas cuyo expires_at sigue siendo el de `claims`: si la
+        reserva venció y otro worker la reclamó, la fila ya no es nuestra. Una
+        clave sin expires_at conocido (None) se actualiza solo por clave.
+        """
+        now = datetime.now(timezone.utc)
+        return self._execute_owned(
+            """
+            UPDATE notification_ledger l
+            SET notified_at = k.notified_at, expires_at = k.new_expires_at
+            FROM (VALUES %s) AS k (event_id, market, pick, expires_at, notified_at, new_expires_at)
+            WHERE l.event_id = k.event_id AND l.market = k.market AND l.pick = k.pick
+              AND (k.expires_at IS NULL OR l.expires_at = k.expires_at)
+            """,
+            [(*key, expires, now, now + ttl) for key, expires in claims.items()],
+            "(%s::BIGINT, %s, %s, %s::TIMESTAMPTZ, %s::TIMESTAMPTZ, %s::TIMESTAMPTZ)",
+        )
+
+    def release_many(self, claims: dict[LedgerKey, datetime | None]) -> int:
+        """Borra las reservas de picks que no se pudieron entregar (mismo criterio de propiedad)."""
+        return self._execute_owned(
+            """
+            DELETE FROM notification_ledger l
+            USING (VALUES %s) AS k (event_id, market, pick, expires_at)
+            WHERE l.event_id = k.event_id AND l.market = k.market AND l.pick = k.pick
+              AND (k.expires_at IS NULL OR l.expires_at = k.expires_at)
+            """,
+            [(*key, expires) for key, expires in claims.items()],
+            "(%s::BIGINT, %s, %s, %s::TIMESTAMPTZ)",
+        )
+
+    def _execute_owned(self, sql: str, rows: list[tuple], template: str) -> int:
+        if not rows:
+            return 0
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                # Una sola página: rowcount cubre todas las filas
+                execute_values(cur, sql, rows, template=template, page_size=len(rows))
+                affected = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+        return affected
+
+    def purge_expired(self) -> int:
+        """Borra las filas vencidas (usa idx_notification_ledger_expires)."""
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM notification_ledger WHERE expires_at <= now()")
+                deleted = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+        if deleted:
+            logger.debug("notification_ledger: %d filas vencidas borradas", deleted)
+        return deleted
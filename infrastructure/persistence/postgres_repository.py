@@ -1,9 +1,9 @@
+import io
 import logging
 from contextlib import contextmanager
 from typing import List, Tuple
 
 import pandas as pd
-from psycopg2.extras import Json
 
 from infrastructure.persistence.postgres_config import PostgresConfig
 
@@ -30,18 +30,37 @@ _HISTORICAL_COL_MAP = {
     "season": "season",
 }
 
+# Clave natural de historical_matches (índice único idx_historical_match_key)
+_HISTORICAL_KEY = ("league_id", "date", "home_team", "away_team")
 
-def _clean(val):
-    """Convierte NaN/None a None para compatibilidad con SQL."""
-    if val is None:
-        return None
-    try:
-        import math
-        if math.isnan(float(val)):
-            return None
-    except (TypeError, ValueError):
-        pass
-    return val
+# Columnas enteras de historical_matches: se pasan a Int64 para que COPY no reciba "2.0"
+_HISTORICAL_INT_COLS = ["fthg", "ftag", "hc", "ac"]
+
+# Marcador NULL de COPY (formato CSV)
+_COPY_NULL = "\\N"
+
+
+def _copy_frame(cur, table: str, df: pd.DataFrame) -> int:
+    """Vuelca un DataFrame a `table` con COPY FROM STDIN (un solo round-trip).
+
+    Los NaN/None se escriben como el marcador NULL de COPY de forma vectorizada
+    (to_csv con na_rep), sin conversión valor a valor en Python.
+    """
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep=_COPY_NULL)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(df.columns)}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')",
+        buf,
+    )
+    return len(df)
+
+
+def _split_selection(column: str) -> tuple[str, str]:
+    """(mercado, resultado) de una columna de cuota cuando el cliente no aportó el desglose."""
+    market, _, outcome = column.rpartition(" ")
+    return market, outcome
 
 
 class PostgresRepository:
@@ -79,7 +98,7 @@ class PostgresRepository:
                 logger.warning("DataFrame vacío recibido para '%s'", collection_name)
                 return True, 0
 
-            if collection_name == "betplay_odds_history":
+            if collection_name == "betplay_odds_ticks":
                 count = self._save_betplay(df, clear_collection)
             elif collection_name == "historical_matches":
                 count = self._save_historical_matches(df, clear_collection)
@@ -107,50 +126,160 @@ class PostgresRepository:
         logger.debug("Temporada %s: %d filas eliminadas de historical_matches", season, deleted)
         return deleted
 
+    def upsert_historical_matches(self, df: pd.DataFrame) -> int:
+        """Inserta partidos nuevos y actualiza los que cambiaron; los idénticos no se tocan.
+
+        Clave: (league_id, date, home_team, away_team). Retorna cuántas filas
+        eran nuevas o tenían algún valor distinto.
+        """
+        if df.empty:
+            return 0
+        df = self._historical_frame(df)
+        values = [c for c in df.columns if c not in _HISTORICAL_KEY]
+
+        with self._cursor() as cur:
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE historical_matches_stage ON COMMIT DROP AS
+                SELECT {', '.join(df.columns)} FROM historical_matches WITH NO DATA
+                """
+            )
+            _copy_frame(cur, "historical_matches_stage", df)
+            cur.execute(
+                f"""
+                INSERT INTO historical_matches ({', '.join(df.columns)})
+                SELECT {', '.join(df.columns)} FROM historical_matches_stage
+                ON CONFLICT (league_id, date, home_team, away_team) DO UPDATE
+                    SET {', '.join(f"{c} = EXCLUDED.{c}" for c in values)}
+                    WHERE ({', '.join(f"historical_matches.{c}" for c in values)})
+                          IS DISTINCT FROM ({', '.join(f"EXCLUDED.{c}" for c in values)})
+                """
+            )
+            changed = cur.rowcount
+        logger.debug("historical_matches: %d filas nuevas o modificadas", changed)
+        return changed
+
     # ------------------------------------------------------------------ #
     #  Handlers por tabla                                                  #
     # ------------------------------------------------------------------ #
 
     def _save_betplay(self, df: pd.DataFrame, clear: bool) -> int:
-        rows = df.to_dict("records")
+        """Upsert de metadatos en betplay_events + ticks de cuota en betplay_odds_ticks.
+
+        Solo se añade un tick cuando el precio difiere del último conocido para
+        ese (evento, mercado, resultado), así la tabla crece con el movimiento
+        de línea y no con cada sondeo. Retorna el número de ticks insertados.
+        """
+        selections = df.attrs.get("selections", {})
+        # Una fila por evento: si llega repetido gana la última, como en el upsert fila a fila
+        df = df.drop_duplicates(subset="id", keep="last")
+
+        events = pd.DataFrame({
+            "event_id":      df["id"].values,
+            "league_id":     self._league_id,
+            "registered_at": df["fecha_registro"].values,
+            "event_at":      df["fecha_evento"].values,
+            "league_name":   df["liga"].values,
+            "match_name":    df["partido"].values,
+        })
+
+        odds_cols = [c for c in df.columns if c not in _BETPLAY_BASE]
+        ticks = (
+            df[["id", "fecha_registro", *odds_cols]]
+            .melt(id_vars=["id", "fecha_registro"], var_name="selection", value_name="price")
+            .dropna(subset=["price"])
+        )
+        split = {c: selections.get(c) or _split_selection(c) for c in odds_cols}
+        ticks = pd.DataFrame({
+            "event_id":    ticks["id"].values,
+            "market":      ticks["selection"].map(lambda c: split[c][0]).values,
+            "outcome":     ticks["selection"].map(lambda c: split[c][1]).values,
+            "price":       ticks["price"].astype(float).round(3).values,
+            "captured_at": ticks["fecha_registro"].values,
+        })
+
         with self._cursor() as cur:
-            count = 0
-            for row in rows:
-                base = {k: _clean(row.get(k)) for k in _BETPLAY_BASE}
-                odds = {
-                    k: _clean(v)
-                    for k, v in row.items()
-                    if k not in _BETPLAY_BASE
-                }
-                cur.execute(
-                    """
-                    INSERT INTO betplay_odds_history
-                        (event_id, league_id, registered_at, event_at, league_name, match_name, odds)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (event_id) DO UPDATE
-                        SET league_id     = EXCLUDED.league_id,
-                            registered_at = EXCLUDED.registered_at,
-                            event_at      = EXCLUDED.event_at,
-                            league_name   = EXCLUDED.league_name,
-                            match_name    = EXCLUDED.match_name,
-                            odds          = EXCLUDED.odds
-                    """,
-                    (
-                        base["id"],
-                        self._league_id,
-                        base["fecha_registro"],
-                        base["fecha_evento"],
-                        base["liga"],
-                        base["partido"],
-                        Json(odds),
-                    ),
-                )
-                count += 1
+            cur.execute(
+                """
+                CREATE TEMP TABLE betplay_events_stage
+                    (LIKE betplay_events INCLUDING DEFAULTS) ON COMMIT DROP;
+                CREATE TEMP TABLE betplay_ticks_stage
+                    (LIKE betplay_odds_ticks INCLUDING DEFAULTS) ON COMMIT DROP;
+                """
+            )
+            _copy_frame(cur, "betplay_events_stage", events)
+            cur.execute(
+                """
+                INSERT INTO betplay_events
+                    (event_id, league_id, registered_at, event_at, league_name, match_name)
+                SELECT event_id, league_id, registered_at, event_at, league_name, match_name
+                FROM betplay_events_stage
+                ON CONFLICT (event_id) DO UPDATE
+                    SET league_id     = EXCLUDED.league_id,
+                        registered_at = EXCLUDED.registered_at,
+                        event_at      = EXCLUDED.event_at,
+                        league_name   = EXCLUDED.league_name,
+                        match_name    = EXCLUDED.match_name
+                """
+            )
+
+            if ticks.empty:
+                return 0
+            for month in pd.to_datetime(ticks["captured_at"]).dt.to_period("M").unique():
+                self._ensure_tick_partition(cur, month)
+            _copy_frame(cur, "betplay_ticks_stage", ticks)
+            cur.execute(
+                """
+                INSERT INTO betplay_odds_ticks (event_id, market, outcome, price, captured_at)
+                SELECT s.event_id, s.market, s.outcome, s.price, s.captured_at
+                FROM betplay_ticks_stage s
+                LEFT JOIN LATERAL (
+                    SELECT t.price
+                    FROM betplay_odds_ticks t
+                    WHERE t.event_id = s.event_id
+                      AND t.market   = s.market
+                      AND t.outcome  = s.outcome
+                    ORDER BY t.captured_at DESC
+                    LIMIT 1
+                ) last ON TRUE
+                WHERE last.price IS DISTINCT FROM s.price
+                ON CONFLICT DO NOTHING
+                """
+            )
+            count = cur.rowcount
         return count
 
-    def _save_historical_matches(self, df: pd.DataFrame, clear: bool) -> int:
+    @staticmethod
+    def _ensure_tick_partition(cur, month: pd.Period) -> None:
+        """Crea (si no existe) la partición mensual de betplay_odds_ticks."""
+        start = month.start_time.date()
+        end = (month + 1).start_time.date()
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS betplay_odds_ticks_{month.strftime("y%Ym%m")}
+                PARTITION OF betplay_odds_ticks
+                FOR VALUES FROM ('{start}') TO ('{end}')
+            """
+        )
+
+    def _historical_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """DataFrame de football-data.co.uk → columnas y tipos de historical_matches."""
         df = df.rename(columns=_HISTORICAL_COL_MAP)
-        rows = df.to_dict("records")
+        df = df.reindex(columns=list(_HISTORICAL_COL_MAP.values()))
+        for col in _HISTORICAL_INT_COLS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        # date es VARCHAR y forma parte de la clave: un mismo partido en dd/mm/yy
+        # y dd/mm/yyyy no debe entrar dos veces
+        dates = pd.to_datetime(df["date"], format="mixed", dayfirst=True, errors="coerce")
+        df["date"] = dates.dt.strftime("%d/%m/%Y").where(dates.notna(), df["date"])
+        df.insert(0, "league_id", self._league_id)
+        # Filas repetidas en el CSV: gana la última, igual que en el upsert
+        return df.drop_duplicates(subset=["date", "home_team", "away_team"], keep="last")
+
+    def _save_historical_matches(self, df: pd.DataFrame, clear: bool) -> int:
+        """Carga completa vía staging: un partido que ya exista (clave natural)
+        se omite con ON CONFLICT DO NOTHING en vez de abortar todo el COPY."""
+        df = self._historical_frame(df)
 
         with self._cursor() as cur:
             if clear:
@@ -158,31 +287,19 @@ class PostgresRepository:
                     "DELETE FROM historical_matches WHERE league_id = %s",
                     (self._league_id,),
                 )
-
-            count = 0
-            for row in rows:
-                cur.execute(
-                    """
-                    INSERT INTO historical_matches
-                        (league_id, date, home_team, away_team,
-                         fthg, ftag, ftr, hc, ac, b365h, b365d, b365a, season)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        self._league_id,
-                        _clean(row.get("date")),
-                        _clean(row.get("home_team")),
-                        _clean(row.get("away_team")),
-                        _clean(row.get("fthg")),
-                        _clean(row.get("ftag")),
-                        _clean(row.get("ftr")),
-                        _clean(row.get("hc")),
-                        _clean(row.get("ac")),
-                        _clean(row.get("b365h")),
-                        _clean(row.get("b365d")),
-                        _clean(row.get("b365a")),
-                        _clean(row.get("season")),
-                    ),
-                )
-                count += 1
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE historical_matches_stage ON COMMIT DROP AS
+                SELECT {', '.join(df.columns)} FROM historical_matches WITH NO DATA
+                """
+            )
+            _copy_frame(cur, "historical_matches_stage", df)
+            cur.execute(
+                f"""
+                INSERT INTO historical_matches ({', '.join(df.columns)})
+                SELECT {', '.join(df.columns)} FROM historical_matches_stage
+                ON CONFLICT (league_id, date, home_team, away_team) DO NOTHING
+                """
+            )
+            count = cur.rowcount
         return count
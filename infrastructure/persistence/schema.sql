@@ -13,8 +13,13 @@ CREATE TABLE IF NOT EXISTS leagues (
     api_football_id INTEGER,
     logo_url        VARCHAR(500)
 );
+-- Código de la competición en football-data.org (PL, PD, SA...) para resolver IDs de equipos
+ALTER TABLE leagues ADD COLUMN IF NOT EXISTS fdo_competition VARCHAR(10);
+-- Código de la liga en football-data.co.uk (E0, SP1, I1...) para los CSV históricos
+ALTER TABLE leagues ADD COLUMN IF NOT EXISTS fd_league_code VARCHAR(10);
 
--- Cuotas Betplay (una fila por evento, se actualiza en cada ejecución)
+-- Cuotas Betplay (legado: una fila por evento con las cuotas en JSONB).
+-- Ya no se escribe; las cuotas viven en betplay_events + betplay_odds_ticks.
 CREATE TABLE IF NOT EXISTS betplay_odds_history (
     event_id        BIGINT PRIMARY KEY,
     league_id       INTEGER NOT NULL REFERENCES leagues(id),
@@ -27,6 +32,38 @@ CREATE TABLE IF NOT EXISTS betplay_odds_history (
 CREATE INDEX IF NOT EXISTS idx_betplay_event
     ON betplay_odds_history (event_id);
 
+-- Eventos Betplay (metadatos, una fila por evento; registered_at = último sondeo)
+CREATE TABLE IF NOT EXISTS betplay_events (
+    event_id        BIGINT PRIMARY KEY,
+    league_id       INTEGER NOT NULL REFERENCES leagues(id),
+    registered_at   TIMESTAMP,
+    event_at        TIMESTAMP,
+    league_name     VARCHAR(200),
+    match_name      VARCHAR(300)
+);
+CREATE INDEX IF NOT EXISTS idx_betplay_events_league
+    ON betplay_events (league_id);
+
+-- Serie temporal de cuotas: append-only, solo se inserta un tick cuando el precio
+-- cambia respecto al último conocido. Particionada por mes (las particiones las
+-- crea PostgresRepository antes de cada escritura).
+CREATE TABLE IF NOT EXISTS betplay_odds_ticks (
+    event_id        BIGINT NOT NULL,
+    market          VARCHAR(200) NOT NULL,
+    outcome         VARCHAR(200) NOT NULL,
+    price           NUMERIC(8, 3) NOT NULL,
+    captured_at     TIMESTAMP NOT NULL,
+    PRIMARY KEY (event_id, market, outcome, captured_at)
+) PARTITION BY RANGE (captured_at);
+
+-- Último precio conocido por (evento, mercado, resultado)
+CREATE OR REPLACE VIEW betplay_odds_latest AS
+SELECT DISTINCT ON (e.league_id, t.event_id, t.market, t.outcome)
+       e.league_id, t.event_id, t.market, t.outcome, t.price, t.captured_at
+FROM betplay_odds_ticks t
+JOIN betplay_events e USING (event_id)
+ORDER BY e.league_id, t.event_id, t.market, t.outcome, t.captured_at DESC;
+
 -- Partidos históricos de football-data.co.uk
 CREATE TABLE IF NOT EXISTS historical_matches (
     id          BIGSERIAL PRIMARY KEY,
@@ -48,6 +85,29 @@ CREATE INDEX IF NOT EXISTS idx_historical_league
     ON historical_matches (league_id);
 CREATE INDEX IF NOT EXISTS idx_historical_season
     ON historical_matches (league_id, season);
+-- Clave natural de un partido: permite el upsert incremental de la temporada actual.
+-- Al crearla en una base existente primero se normalizan las fechas dd/mm/yy a
+-- dd/mm/yyyy (como las escribe el repositorio) y se borran los duplicados,
+-- conservando la fila de menor id
+DO $$
+BEGIN
+    IF to_regclass('idx_historical_match_key') IS NULL THEN
+        UPDATE historical_matches
+        SET date = to_char(to_date(date, 'DD/MM/YY'), 'DD/MM/YYYY')
+        WHERE date ~ '^\d{2}/\d{2}/\d{2}$';
+
+        DELETE FROM historical_matches a
+        USING historical_matches b
+        WHERE a.league_id = b.league_id
+          AND a.date      = b.date
+          AND a.home_team = b.home_team
+          AND a.away_team = b.away_team
+          AND a.id > b.id;
+
+        CREATE UNIQUE INDEX idx_historical_match_key
+            ON historical_matches (league_id, date, home_team, away_team);
+    END IF;
+END $$;
 
 -- Caché de enfrentamientos directos (H2H)
 CREATE TABLE IF NOT EXISTS h2h_results (
@@ -63,3 +123,72 @@ CREATE TABLE IF NOT EXISTS h2h_results (
 CREATE UNIQUE INDEX IF NOT EXISTS idx_h2h_event_league
     ON h2h_results (league_id, betplay_event_id);
 
+-- IDs de equipos en football-data.org por nombre normalizado (los IDs no cambian).
+-- source: listing (listado de la competición) | fuzzy (alias aprendido) | search (/teams?name=)
+CREATE TABLE IF NOT EXISTS fdo_team_ids (
+    name_key        VARCHAR(200) PRIMARY KEY,
+    team_id         INTEGER NOT NULL,
+    team_name       VARCHAR(200),
+    competition     VARCHAR(10),
+    source          VARCHAR(20),
+    updated_at      TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_fdo_team_ids_competition
+    ON fdo_team_ids (competition);
+
+-- Nombres que /teams?name= no encontró: no se vuelven a buscar hasta que venza la entrada
+CREATE TABLE IF NOT EXISTS fdo_team_misses (
+    name_key        VARCHAR(200) PRIMARY KEY,
+    competition     VARCHAR(10),
+    missed_at       TIMESTAMP NOT NULL
+);
+
+
+-- Snapshot de forma reciente por equipo (se recalcula tras el sync nocturno)
+CREATE TABLE IF NOT EXISTS team_form_snapshot (
+    league_id       INTEGER NOT NULL REFERENCES leagues(id),
+    team            VARCHAR(200) NOT NULL,
+    gf5             DOUBLE PRECISION,
+    ga5             DOUBLE PRECISION,
+    pts5            DOUBLE PRECISION,
+    home_gf5        DOUBLE PRECISION,
+    home_ga5        DOUBLE PRECISION,
+    away_gf5        DOUBLE PRECISION,
+    away_ga5        DOUBLE PRECISION,
+    home_role_gf5   DOUBLE PRECISION,
+    home_role_ga5   DOUBLE PRECISION,
+    home_role_pts5  DOUBLE PRECISION,
+    away_role_gf5   DOUBLE PRECISION,
+    away_role_ga5   DOUBLE PRECISION,
+    away_role_pts5  DOUBLE PRECISION,
+    computed_at     TIMESTAMP,
+    PRIMARY KEY (league_id, team)
+);
+
+-- Estado compartido de los rate limiters (RATE_LIMIT_BACKEND=postgres)
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    name            VARCHAR(100) PRIMARY KEY,
+    tokens          DOUBLE PRECISION NOT NULL,
+    updated_at      TIMESTAMPTZ NOT NULL
+);
+
+-- Registro de notificaciones enviadas (dedup entre reinicios y workers).
+-- Una fila por pick notificado; vence en expires_at (purga por índice)
+CREATE TABLE IF NOT EXISTS notification_ledger (
+    event_id        BIGINT NOT NULL,
+    market          VARCHAR(50) NOT NULL,
+    pick            VARCHAR(20) NOT NULL,
+    notified_at     TIMESTAMPTZ NOT NULL,
+    expires_at      TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (event_id, market, pick)
+);
+CREATE INDEX IF NOT EXISTS idx_notification_ledger_expires
+    ON notification_ledger (expires_at);
+
+-- Caché de explicaciones del LLM, por hash de los datos del prompt
+CREATE TABLE IF NOT EXISTS llm_explanations (
+    cache_key       CHAR(64) PRIMARY KEY,
+    model           VARCHAR(100) NOT NULL,
+    explanation     TEXT NOT NULL,
+    created_at      TIMESTAMP NOT NULL
+);
@@ -0,0 +1,77 @@
+import logging
+import math
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from infrastructure.persistence.postgres_config import PostgresConfig
+
+logger = logging.getLogger(__name__)
+
+# Columnas numéricas de team_form_snapshot (mismo orden que en schema.sql)
+_FORM_COLS = [
+    "gf5", "ga5", "pts5",
+    "home_gf5", "home_ga5", "away_gf5", "away_ga5",
+    "home_role_gf5", "home_role_ga5", "home_role_pts5",
+    "away_role_gf5", "away_role_ga5", "away_role_pts5",
+]
+
+
+def _to_sql(val):
+    if val is None:
+        return None
+    val = float(val)
+    return None if math.isnan(val) else val
+
+
+class TeamFormRepository:
+    """Snapshot de forma reciente por equipo (últimos 5 partidos) para una liga."""
+
+    def __init__(self, league_db: str):
+        self.league_db = league_db
+        self._league_id = PostgresConfig.get_league_id(league_db)
+
+    def replace(self, snapshot: dict[str, dict]) -> int:
+        """Reemplaza el snapshot completo de la liga en una sola transacción."""
+        now = datetime.now()
+        rows = [
+            (self._league_id, team, *(_to_sql(stats.get(c)) for c in _FORM_COLS), now)
+            for team, stats in snapshot.items()
+        ]
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM team_form_snapshot WHERE league_id = %s",
+                    (self._league_id,),
+                )
+                if rows:
+                    execute_values(
+                        cur,
+                        f"INSERT INTO team_form_snapshot "
+                        f"(league_id, team, {', '.join(_FORM_COLS)}, computed_at) VALUES %s",
+                        rows,
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+        logger.info("Snapshot de forma guardado (%s): %d equipos", self.league_db, len(rows))
+        return len(rows)
+
+    def load(self) -> dict[str, dict]:
+        """Retorna {equipo: {col: valor}}; dict vacío si aún no se ha calculado."""
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT team, {', '.join(_FORM_COLS)} "
+                    f"FROM team_form_snapshot WHERE league_id = %s",
+                    (self._league_id,),
+                )
+                rows = cur.fetchall()
+        finally:
+            PostgresConfig.put_connection(conn)
+        return {row[0]: dict(zip(_FORM_COLS, row[1:])) for row in rows}
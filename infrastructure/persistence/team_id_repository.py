@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from infrastructure.persistence.postgres_config import PostgresConfig
+
+logger = logging.getLogger(__name__)
+
+
+class TeamIdRepository:
+    """Mapeo persistente nombre normalizado → ID de equipo en football-data.org,
+    más los nombres que la búsqueda no encontró (fdo_team_misses)."""
+
+    def load(self) -> dict[str, tuple[int, str, str | None]]:
+        """Retorna {name_key: (team_id, team_name, competition)}."""
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT name_key, team_id, team_name, competition FROM fdo_team_ids")
+                rows = cur.fetchall()
+        finally:
+            PostgresConfig.put_connection(conn)
+        return {key: (team_id, name, comp) for key, team_id, name, comp in rows}
+
+    def listed_competitions(self) -> set[str]:
+        """Competiciones cuyo listado de equipos ya se cargó."""
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT DISTINCT competition FROM fdo_team_ids WHERE source = 'listing'")
+                return {row[0] for row in cur.fetchall()}
+        finally:
+            PostgresConfig.put_connection(conn)
+
+    def upsert_many(self, rows: list[tuple[str, int, str, str | None]], source: str) -> int:
+        """Inserta o actualiza [(name_key, team_id, team_name, competition)]."""
+        if not rows:
+            return 0
+        now = datetime.now()
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO fdo_team_ids
+                        (name_key, team_id, team_name, competition, source, updated_at)
+                    VALUES %s
+                    ON CONFLICT (name_key) DO UPDATE
+                        SET team_id     = EXCLUDED.team_id,
+                            team_name   = EXCLUDED.team_name,
+                            competition = COALESCE(EXCLUDED.competition, fdo_team_ids.competition),
+                            source      = EXCLUDED.source,
+                            updated_at  = EXCLUDED.updated_at
+                    """,
+                    [(key, team_id, name, comp, source, now) for key, team_id, name, comp in rows],
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+        logger.debug("fdo_team_ids: %d filas (%s)", len(rows), source)
+        return len(rows)
+
+    def load_misses(self, ttl: timedelta) -> dict[str, datetime]:
+        """Retorna {name_key: missed_at} de las búsquedas fallidas aún vigentes."""
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT name_key, missed_at FROM fdo_team_misses WHERE missed_at > %s",
+                    (datetime.now() - ttl,),
+                )
+                rows = cur.fetchall()
+        finally:
+            PostgresConfig.put_connection(conn)
+        return dict(rows)
+
+    def save_miss(self, key: str, competition: str | None) -> None:
+        """Registra (o renueva) un nombre que /teams?name= no encontró."""
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO fdo_team_misses (name_key, competition, missed_at)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (name_key) DO UPDATE
+                        SET competition = EXCLUDED.competition,
+                            missed_at   = EXCLUDED.missed_at
+                    """,
+                    (key, competition, datetime.now()),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
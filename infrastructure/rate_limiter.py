@@ -0,0 +1,147 @@
+"""
+Rate limiting por token bucket para las APIs externas.
+
+Cada API tiene un bucket con capacidad (ráfaga) y tasa de recarga. Pedir un
+token "reserva" su turno: si no hay saldo el bucket queda en negativo y el
+llamador duerme lo que falta, así los hilos se atienden en orden de llegada
+sin reintentos. Con block=False no se reserva: se retorna False si no hay
+saldo (útil para cuotas diarias, donde esperar no tiene sentido).
+
+Backends:
+  memory    estado en el proceso (por defecto)
+  postgres  estado en la tabla rate_limit_buckets, compartido entre hilos,
+            procesos y contenedores (RATE_LIMIT_BACKEND=postgres). El saldo se
+            actualiza con SELECT ... FOR UPDATE usando el reloj de la BD.
+
+Las cuotas largas (QUOTA_BUCKETS, p. ej. 100/día) usan siempre postgres: en
+memoria el saldo se rellena con cada reinicio o despliegue y la cuota no se
+respetaría. Si la BD no responde se degrada a memoria como el resto.
+
+Un bucket puede ser por clave (get_limiter("telegram", key=chat_id)): cada
+clave tiene su propio saldo con los límites de LIMITS[name].
+
+Para no exceder un límite L por ventana T, capacidad + tasa·T <= L.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+# nombre → (tasa en tokens/s, capacidad)
+LIMITS = {
+    # Plan gratuito: 10 req/min → ráfaga de 4 + 1 cada 10 s
+    "football_data_org": (6 / 60, 4),
+    # Free tier: 30 req/min → ráfaga de 5 + 25/min
+    "groq":              (25 / 60, 5),
+    # Tier gratuito: 100 req/día → ráfaga de 10 + 90/día
+    "api_football":      (90 / 86400, 10),
+    # Telegram: ~1 mensaje/s por chat con ráfagas cortas
+    "telegram":          (1.0, 3),
+}
+
+# Cuotas que deben sobrevivir a reinicios: backend postgres aunque BACKEND=memory
+QUOTA_BUCKETS = {"api_football"}
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, capacity: float, backend: str = "memory"):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.backend = backend
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, available: float, tokens: float, reserve: bool) -> tuple[float, float | None]:
+        """(saldo nuevo, espera en s); espera None = denegado sin reservar."""
+        if available >= tokens:
+            return available - tokens, 0.0
+        if not reserve:
+            return available, None
+        return available - tokens, (tokens - available) / self.rate
+
+    def _consume_memory(self, tokens: float, reserve: bool) -> float | None:
+        with self._lock:
+            now = time.monotonic()
+            available = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._tokens, wait = self._take(available, tokens, reserve)
+            self._updated = now
+            return wait
+
+    def _consume_postgres(self, tokens: float, reserve: bool) -> float | None:
+        from infrastructure.persistence.postgres_config import PostgresConfig
+
+        conn = PostgresConfig.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO rate_limit_buckets (name, tokens, updated_at)
+                    VALUES (%s, %s, clock_timestamp())
+                    ON CONFLICT (name) DO NOTHING
+                    """,
+                    (self.name, float(self.capacity)),
+                )
+                cur.execute(
+                    """
+                    SELECT tokens, EXTRACT(EPOCH FROM clock_timestamp() - updated_at)
+                    FROM rate_limit_buckets WHERE name = %s FOR UPDATE
+                    """,
+                    (self.name,),
+                )
+                saved, elapsed = cur.fetchone()
+                available = min(self.capacity, saved + max(float(elapsed), 0.0) * self.rate)
+                new_tokens, wait = self._take(available, tokens, reserve)
+                cur.execute(
+                    "UPDATE rate_limit_buckets SET tokens = %s, updated_at = clock_timestamp() WHERE name = %s",
+                    (new_tokens, self.name),
+                )
+            conn.commit()
+            return wait
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            PostgresConfig.put_connection(conn)
+
+    def _consume(self, tokens: float, reserve: bool) -> float | None:
+        if self.backend == "postgres":
+            try:
+                return self._consume_postgres(tokens, reserve)
+            except Exception as e:
+                logger.warning("Rate limiter '%s': estado compartido no disponible, usando memoria: %s",
+                               self.name, e)
+        return self._consume_memory(tokens, reserve)
+
+    def acquire(self, tokens: float = 1, block: bool = True) -> bool:
+        """Toma `tokens`; si block, espera su turno. Retorna False solo si block=False y no hay saldo."""
+        wait = self._consume(tokens, reserve=block)
+        if wait is None:
+            return False
+        if wait > 0:
+            logger.debug("Rate limiter '%s': esperando %.1fs", self.name, wait)
+            time.sleep(wait)
+        return True
+
+
+_limiters: dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, key: str | None = None) -> TokenBucket:
+    """Bucket compartido (por proceso) de la API `name`, configurado según LIMITS.
+
+    Con `key` retorna un bucket independiente por clave (p. ej. por chat).
+    """
+    bucket = f"{name}:{key}" if key is not None else name
+    with _limiters_lock:
+        if bucket not in _limiters:
+            rate, capacity = LIMITS[name]
+            backend = "postgres" if name in QUOTA_BUCKETS else BACKEND
+            _limiters[bucket] = TokenBucket(bucket, rate, capacity, backend=backend)
+        return _limiters[bucket]
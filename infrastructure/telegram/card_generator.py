@@ -1,13 +1,36 @@
+"""
+Generación de la card PNG de cada partido.
+
+El layout estático (fondo, bordes, paneles de sección, rótulos, pistas vacías
+de las barras, footer) solo depende del alto de la card, así que se rasteriza
+una vez por tamaño y queda en memoria junto con su recorte. Cada card nueva
+parte de una copia de ese raster: las barras con degradado se pintan
+directamente sobre los píxeles (recortadas a la forma redondeada de su pista) y
+los textos del partido se dibujan en una capa transparente que se mezcla encima
+(alpha_composite de Pillow). No hay imshow por barra. El recorte final se
+calcula con la plantilla y la capa dinámica juntas, así un nombre largo nunca
+queda cortado.
+
+Se usa la API orientada a objetos (Figure + FigureCanvasAgg), no pyplot: el
+render corre en un hilo propio (submit_match_card) fuera del scheduler.
+"""
 import io
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 import numpy as np
-import requests
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
 from matplotlib.offsetbox import AnnotationBbox, OffsetImage
 from matplotlib.patches import FancyBboxPatch
+from matplotlib.path import Path
+from matplotlib.transforms import Bbox
+from PIL import Image
+
+from infrastructure.telegram import logo_cache
 
 logger = logging.getLogger(__name__)
 
@@ -46,64 +69,112 @@ ICON_COLORS  = {"home_win": BLUE_EL, "draw": TEAL, "away_win": RED_SOFT}
 SECTION_BG   = {"home_win": "#0C1529", "draw": "#0F1E38", "away_win": "#0C1529"}
 
 
+# ── Geometría ─────────────────────────────────────────────────────────────────
+DPI        = 150
+FIG_W      = 9
+HDR_Y      = 0.835
+HDR_H      = 0.118
+RESULTS_TOP = 0.815
+BAR_X  = 0.155
+BAR_W  = 0.660
+BAR_H  = 0.038
+BAR_MH = 0.024
+PAD_INCHES = 0.1   # mismo margen que savefig(bbox_inches="tight")
+
+# Un único hilo de render: matplotlib no es thread-safe entre figuras que
+# comparten caché de fuentes, y así el scheduler nunca espera a un savefig
+_render_executor: ThreadPoolExecutor | None = None
+_templates: dict[bool, tuple[np.ndarray, Bbox]] = {}
+_templates_lock = threading.Lock()
+_executor_lock = threading.Lock()
+_gradients: dict[str, np.ndarray] = {}
+_track_masks: dict[tuple, tuple[int, int, np.ndarray]] = {}
+
+
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _fetch_logo(logo_url: str):
-    try:
-        r = requests.get(logo_url, timeout=5)
-        return plt.imread(io.BytesIO(r.content), format="png")
-    except Exception as e:
-        logger.warning("Logo no disponible: %s", e)
-        return None
+def _gradient(cmap) -> np.ndarray:
+    """Degradado RGBA de 512 pasos del colormap, calculado una sola vez."""
+    if cmap.name not in _gradients:
+        _gradients[cmap.name] = cmap(np.linspace(0, 1, 512))[np.newaxis, :, :]
+    return _gradients[cmap.name]
 
 
-def _gradient_bar(ax, x0, y0, w, h, prob, cmap, radius=0.003):
-    """Barra con degradado, fondo redondeado y clip preciso."""
-    # Fondo vacío
+def _bar_track(ax, x0, y0, w, h, radius=0.003):
+    """Fondo vacío redondeado de una barra."""
     ax.add_patch(FancyBboxPatch(
         (x0, y0), w, h,
         boxstyle=f"round,pad={radius}",
         facecolor=EMPTY, edgecolor="none", zorder=2,
     ))
-    filled_w = max(prob * w, 0.001)
-    gradient = np.linspace(0, 1, 512).reshape(1, -1)
-    img = ax.imshow(
-        gradient, aspect="auto", cmap=cmap,
-        extent=[x0, x0 + filled_w, y0, y0 + h],
-        zorder=3, origin="lower",
-    )
-    clip = mpatches.Rectangle((x0, y0), filled_w, h, transform=ax.transData)
-    img.set_clip_path(clip)
 
 
+def _track_mask(to_px, height, x0, y0, w, h, radius=0.003) -> tuple[int, int, np.ndarray]:
+    """(fila, columna, máscara) en píxeles de la pista redondeada de una barra.
+
+    Solo depende de la geometría, así que se calcula una vez por pista.
+    """
+    key = (height, x0, y0, w, h, radius)
+    if key not in _track_masks:
+        path = FancyBboxPatch((x0, y0), w, h, boxstyle=f"round,pad={radius}").get_path()
+        verts = to_px(path.vertices)
+        px_path = Path(verts, path.codes)
+        (bx0, by0), (bx1, by1) = verts.min(axis=0), verts.max(axis=0)
+        col0, row0 = int(np.floor(bx0)), int(np.floor(height - by1))
+        cols = np.arange(col0, int(np.ceil(bx1)))
+        rows = np.arange(row0, int(np.ceil(height - by0)))
+        xx, yy = np.meshgrid(cols + 0.5, height - (rows + 0.5))
+        inside = px_path.contains_points(np.column_stack([xx.ravel(), yy.ravel()]))
+        _track_masks[key] = (row0, col0, inside.reshape(xx.shape))
+    return _track_masks[key]
+
+
+def _bar_fill(pixels, to_px, x0, y0, w, h, prob, cmap):
+    """Pinta sobre los píxeles el tramo lleno de la barra, con el degradado
+    estirado hasta prob y recortado a la forma de la pista."""
+    (px0, py1), (px1, py0) = to_px([(x0, y0), (x0 + max(prob * w, 0.001), y0 + h)])
+    height = pixels.shape[0]
+    c0 = int(round(px0))
+    c1 = max(int(round(px1)), c0 + 1)
+    r0, r1 = int(round(height - py0)), int(round(height - py1))
+    grad = _gradient(cmap)[0, :, :3]
+    steps = np.linspace(0, len(grad) - 1, c1 - c0)
+    line = np.stack([np.interp(steps, np.arange(len(grad)), grad[:, c]) for c in range(3)], axis=1)
+    fill = np.broadcast_to(np.round(line * 255).astype(np.uint8), (r1 - r0, c1 - c0, 3))
+
+    mr0, mc0, mask = _track_mask(to_px, height, x0, y0, w, h)
+    mask = mask[r0 - mr0:r1 - mr0, c0 - mc0:c1 - mc0]
+    region = pixels[r0:r1, c0:c1, :3]
+    region[mask] = fill[mask]
+
 
 def _sep(ax, y, x0=0.06, x1=0.94, alpha=0.4):
     ax.axhline(y, xmin=x0, xmax=x1, color=BORDER_AC, linewidth=0.6, alpha=alpha)
 
 
-# ── Card principal ────────────────────────────────────────────────────────────
-
-def generate_match_card(
-    partido: str,
-    fecha_str: str,
-    liga: str,
-    pred: dict,
-    labels: dict,
-    odds: dict,
-    fair: dict,
-    value_bets: list | None = None,
-    league_logo_url: str | None = None,
-) -> bytes:
-    is_value = bool(value_bets)
-    vb_set   = {lbl for lbl, *_ in (value_bets or [])}
-
-    fig_h = 10.0 if is_value else 8.5
-    fig, ax = plt.subplots(figsize=(9, fig_h), dpi=150)
-    fig.patch.set_facecolor(BG)
-    ax.set_facecolor(BG)
+def _new_figure(fig_h: float, transparent: bool = False):
+    fig = Figure(figsize=(FIG_W, fig_h), dpi=DPI)
+    canvas = FigureCanvasAgg(fig)
+    if transparent:
+        fig.patch.set_alpha(0)
+    ax = fig.add_subplot()
     ax.set_xlim(0, 1)
     ax.set_ylim(0, 1)
     ax.axis("off")
+    return fig, canvas, ax
+
+
+def _layout(is_value: bool) -> tuple[float, float, float]:
+    """(alto de figura, límite inferior de resultados, alto de sección)."""
+    fig_h = 10.0 if is_value else 8.5
+    bottom_limit = 0.14 if is_value else 0.07
+    return fig_h, bottom_limit, (RESULTS_TOP - bottom_limit) / 3
+
+
+# ── Plantilla estática ────────────────────────────────────────────────────────
+
+def _draw_static(ax, is_value: bool) -> None:
+    _, bottom_limit, section_h = _layout(is_value)
 
     # ── Sombra exterior (efecto glow) ─────────────────────────────────────
     for offset, alpha in [(0.008, 0.08), (0.004, 0.15)]:
@@ -138,52 +209,137 @@ def generate_match_card(
             ha="center", va="center", zorder=6)
 
     # Panel blanco para logo + nombre del partido
-    hdr_y = 0.835
-    hdr_h = 0.118
     ax.add_patch(FancyBboxPatch(
-        (0.03, hdr_y), 0.94, hdr_h,
+        (0.03, HDR_Y), 0.94, HDR_H,
         boxstyle="round,pad=0.010",
         facecolor="#FFFFFF", edgecolor="#E0E4EE",
         linewidth=0.8, zorder=2,
     ))
 
-    # Logo de liga sobre fondo blanco
-    logo_img = _fetch_logo(league_logo_url) if league_logo_url else None
+    _sep(ax, HDR_Y - 0.005)
+
+    # ── Secciones de resultados: fondos, rótulos y pistas vacías de barras ──
+    for i in range(len(RESULT_KEYS)):
+        y_top  = RESULTS_TOP - i * section_h
+        sec_bg = CARD_ALT if i % 2 == 1 else CARD
+
+        # Fondo de sección alternado
+        ax.add_patch(mpatches.Rectangle(
+            (0.03, y_top - section_h + 0.002), 0.94, section_h - 0.004,
+            facecolor=sec_bg, zorder=1,
+        ))
+
+        y_model = y_top - 0.073
+        ax.text(0.148, y_model + BAR_H / 2, "MODELO",
+                color=TXT_SEC, fontsize=7, va="center", ha="right",
+                fontweight="bold", zorder=5)
+        _bar_track(ax, BAR_X, y_model, BAR_W, BAR_H)
+
+        y_market = y_model - BAR_MH - 0.016
+        ax.text(0.148, y_market + BAR_MH / 2, "BETPLAY",
+                color=TXT_SEC, fontsize=7, va="center", ha="right",
+                fontweight="bold", zorder=5)
+        _bar_track(ax, BAR_X, y_market, BAR_W, BAR_MH)
+
+        if i < 2:
+            _sep(ax, y_top - section_h + 0.01)
+
+    # ── Footer: recuadro de la apuesta recomendada ────────────────────────
+    if is_value:
+        footer_top = bottom_limit + 0.045
+        _sep(ax, footer_top, alpha=0.7)
+
+        # Hacemos el recuadro del footer más compacto (menos alto)
+        footer_y_min = 0.065
+        footer_h = footer_top - footer_y_min
+        ax.add_patch(FancyBboxPatch(
+            (0.03, footer_y_min), 0.94, footer_h,
+            boxstyle="round,pad=0.010",
+            facecolor="#1A0E00", edgecolor=GOLD,
+            linewidth=0.8, zorder=2,
+        ))
+
+        # Título del footer
+        ax.text(0.5, footer_top - 0.018,
+                "APUESTA RECOMENDADA",
+                color=GOLD, fontsize=10.5, fontweight="bold",
+                ha="center", va="center", zorder=5)
+
+    # ── Branding footer ───────────────────────────────────────────────────
+    ax.text(0.5, 0.045,
+            "Sport Analytics  ·  Powered by XGBoost",
+            color="#2A4878", fontsize=7,
+            ha="center", va="center", zorder=5)
+
+
+def _template(is_value: bool) -> tuple[np.ndarray, Bbox]:
+    """Raster RGBA del layout estático y su bbox ajustado (pulgadas, sin margen)."""
+    with _templates_lock:
+        if is_value not in _templates:
+            fig_h, _, _ = _layout(is_value)
+            fig, canvas, ax = _new_figure(fig_h)
+            fig.patch.set_facecolor(BG)
+            _draw_static(ax, is_value)
+            canvas.draw()
+            raster = np.asarray(canvas.buffer_rgba()).copy()
+
+            # Parte estática del bbox_inches="tight"; la capa dinámica se une en cada card
+            _templates[is_value] = (raster, fig.get_tightbbox(canvas.get_renderer()))
+            logger.debug("Plantilla de card rasterizada (value=%s, %dx%d px)",
+                         is_value, raster.shape[1], raster.shape[0])
+        return _templates[is_value]
+
+
+# ── Card principal ────────────────────────────────────────────────────────────
+
+def generate_match_card(
+    partido: str,
+    fecha_str: str,
+    liga: str,
+    pred: dict,
+    labels: dict,
+    odds: dict,
+    fair: dict,
+    value_bets: list | None = None,
+    league_logo_url: str | None = None,
+) -> bytes:
+    is_value = bool(value_bets)
+    vb_set   = {lbl for lbl, *_ in (value_bets or [])}
+
+    fig_h, _, section_h = _layout(is_value)
+    raster, static_bbox = _template(is_value)
+
+    pixels = raster.copy()
+    fig, canvas, ax = _new_figure(fig_h, transparent=True)
+    to_px = ax.transData.transform
+
+    # ── Cabecera: logo, partido, liga y fecha ─────────────────────────────
+    logo_img = logo_cache.get_logo(league_logo_url) if league_logo_url else None
     partido_x = 0.5
 
     if logo_img is not None:
         imagebox = OffsetImage(logo_img, zoom=0.42)
         ab = AnnotationBbox(
-            imagebox, (0.10, hdr_y + hdr_h / 2),
+            imagebox, (0.10, HDR_Y + HDR_H / 2),
             frameon=False, xycoords="data", zorder=10,
         )
         ax.add_artist(ab)
         partido_x = 0.57
 
     # Nombre del partido: tipografía grande sobre blanco
-    ax.text(partido_x, hdr_y + hdr_h * 0.62, partido,
+    ax.text(partido_x, HDR_Y + HDR_H * 0.62, partido,
             color="#0C1529", fontsize=17, fontweight="bold",
             ha="center", va="center", zorder=5)
 
     # Subheader liga / fecha sobre el panel blanco
     # Usamos posiciones fijas y alineaciones opuestas para evitar solapamientos
     liga_x = 0.24 if logo_img is not None else 0.06
-    ax.text(liga_x, hdr_y + hdr_h * 0.22, liga.upper(),
+    ax.text(liga_x, HDR_Y + HDR_H * 0.22, liga.upper(),
             color="#6B88B5", fontsize=9, va="center", ha="left", fontweight="bold", zorder=5)
-    ax.text(0.94, hdr_y + hdr_h * 0.22, fecha_str,
+    ax.text(0.94, HDR_Y + HDR_H * 0.22, fecha_str,
             color="#6B88B5", fontsize=8.5, va="center", ha="right", zorder=5)
 
-    _sep(ax, hdr_y - 0.005)
-
     # ── Secciones de resultados ───────────────────────────────────────────
-    results_top  = 0.815
-    bottom_limit = 0.14 if is_value else 0.07
-    section_h    = (results_top - bottom_limit) / 3
-    BAR_X  = 0.155
-    BAR_W  = 0.660
-    BAR_H  = 0.038
-    BAR_MH = 0.024
-
     for i, key in enumerate(RESULT_KEYS):
         label   = labels[key]
         model_p = pred[key]
@@ -191,16 +347,7 @@ def generate_match_card(
         odd     = odds[key]
         is_vb   = label in vb_set
 
-        y_top    = 0.815 - i * section_h
-        sec_bg   = CARD_ALT if i % 2 == 1 else CARD
-
-        # Fondo de sección alternado
-        ax.add_patch(mpatches.Rectangle(
-            (0.03, y_top - section_h + 0.002), 0.94, section_h - 0.004,
-            facecolor=sec_bg, zorder=1,
-        ))
-
-        icon_clr = ICON_COLORS[key]
+        y_top    = RESULTS_TOP - i * section_h
         pct_clr  = GOLD if is_vb else TXT_PRI
 
         # Nombre del resultado (alineado a la izquierda)
@@ -215,11 +362,8 @@ def generate_match_card(
 
         # ── Barra modelo ──────────────────────────────────────────────────
         y_model = y_top - 0.073
-        ax.text(0.148, y_model + BAR_H / 2, "MODELO",
-                color=TXT_SEC, fontsize=7, va="center", ha="right",
-                fontweight="bold", zorder=5)
-        _gradient_bar(ax, BAR_X, y_model, BAR_W, BAR_H, model_p,
-                      VALUE_CMAP if is_vb else MODEL_CMAP)
+        _bar_fill(pixels, to_px, BAR_X, y_model, BAR_W, BAR_H, model_p,
+                  VALUE_CMAP if is_vb else MODEL_CMAP)
         # Etiqueta de porcentaje encima de la barra
         ax.text(BAR_X + BAR_W + 0.01, y_model + BAR_H / 2,
                 f"{model_p * 100:.0f}%",
@@ -228,11 +372,8 @@ def generate_match_card(
 
         # ── Barra betplay ─────────────────────────────────────────────────
         y_market = y_model - BAR_MH - 0.016
-        ax.text(0.148, y_market + BAR_MH / 2, "BETPLAY",
-                color=TXT_SEC, fontsize=7, va="center", ha="right",
-                fontweight="bold", zorder=5)
         if fair_p:
-            _gradient_bar(ax, BAR_X, y_market, BAR_W, BAR_MH, fair_p, MARKET_CMAP)
+            _bar_fill(pixels, to_px, BAR_X, y_market, BAR_W, BAR_MH, fair_p, MARKET_CMAP)
             odd_str = f"@ {odd:.2f}" if odd else "—"
             ax.text(BAR_X + BAR_W + 0.01, y_market + BAR_MH / 2,
                     f"{fair_p * 100:.0f}%  {odd_str}",
@@ -255,30 +396,9 @@ def generate_match_card(
                     color=GOLD_LT, fontsize=8.5, fontweight="bold",
                     ha="center", va="center", zorder=5)
 
-        if i < 2:
-            _sep(ax, y_top - section_h + 0.01)
-
     # ── Footer: apuesta recomendada ───────────────────────────────────────
     if is_value:
-        footer_top = bottom_limit + 0.045
-        _sep(ax, footer_top, alpha=0.7)
-
-        # Hacemos el recuadro del footer más compacto (menos alto)
-        footer_y_min = 0.065
-        footer_h = footer_top - footer_y_min
-        ax.add_patch(FancyBboxPatch(
-            (0.03, footer_y_min), 0.94, footer_h,
-            boxstyle="round,pad=0.010",
-            facecolor="#1A0E00", edgecolor=GOLD,
-            linewidth=0.8, zorder=2,
-        ))
-        
-        # Título del footer
-        ax.text(0.5, footer_top - 0.018,
-                "APUESTA RECOMENDADA",
-                color=GOLD, fontsize=10.5, fontweight="bold",
-                ha="center", va="center", zorder=5)
-
+        footer_top = 0.14 + 0.045
         vb_parts = [
             f"{lbl}  @{odd:.2f}  ·  edge +{(prob * odd - 1) * 100:.0f}%"
             for lbl, prob, odd, _ in (value_bets or [])
@@ -289,17 +409,36 @@ def generate_match_card(
                 color=TXT_PRI, fontsize=10,
                 ha="center", va="center", zorder=5)
 
-    # ── Branding footer ───────────────────────────────────────────────────
-    brand_y = 0.045
-    ax.text(0.5, brand_y,
-            "Sport Analytics  ·  Powered by XGBoost",
-            color="#2A4878", fontsize=7,
-            ha="center", va="center", zorder=5)
+    # ── Render: plantilla + capa dinámica, recortada y codificada ─────────
+    canvas.draw()
+    # Recorte equivalente a bbox_inches="tight" sobre la card completa
+    bbox = Bbox.union([static_bbox, fig.get_tightbbox(canvas.get_renderer())]).padded(PAD_INCHES)
+    height, width = pixels.shape[:2]
+    x0, x1 = int(np.floor(bbox.x0 * DPI)), int(np.ceil(bbox.x1 * DPI))
+    y0, y1 = int(np.floor(height - bbox.y1 * DPI)), int(np.ceil(height - bbox.y0 * DPI))
+
+    if x0 >= 0 and y0 >= 0 and x1 <= width and y1 <= height:
+        layer = Image.fromarray(np.asarray(canvas.buffer_rgba()))
+        card = Image.alpha_composite(Image.fromarray(pixels), layer).crop((x0, y0, x1, y1))
+    else:
+        # Texto fuera de la figura: como savefig(bbox_inches="tight"), se amplía
+        # el lienzo con el color de fondo y la capa dinámica se renderiza completa
+        layer_buf = io.BytesIO()
+        fig.savefig(layer_buf, format="png", dpi=DPI, bbox_inches=bbox, transparent=True)
+        layer = Image.open(layer_buf).convert("RGBA")
+        card = Image.new("RGBA", layer.size, BG)
+        card.paste(Image.fromarray(pixels), (-x0, -y0))
+        card = Image.alpha_composite(card, layer)
 
-    # ── Render ────────────────────────────────────────────────────────────
     buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight",
-                facecolor=BG, dpi=150)
-    plt.close(fig)
-    buf.seek(0)
-    return buf.read()
+    card.convert("RGB").save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def submit_match_card(*args, **kwargs) -> Future:
+    """Encola generate_match_card en el hilo de render; retorna un Future con los bytes."""
+    global _render_executor
+    with _executor_lock:
+        if _render_executor is None:
+            _render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="card-render")
+    return _render_executor.submit(generate_match_card, *args, **kwargs)
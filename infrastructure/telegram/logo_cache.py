@@ -0,0 +1,128 @@
+"""
+Caché de logos de liga para los cards, en dos niveles:
+
+  memoria  arrays RGBA ya decodificados, LRU de MAX_IN_MEMORY logos
+  disco    bytes originales en LOGO_CACHE_DIR/<sha1 de la URL>.img,
+           persisten entre reinicios
+
+Solo se descarga un logo la primera vez que se ve su URL. Una descarga fallida
+se recuerda durante RETRY_AFTER para no volver a esperar el timeout en cada
+card. warm_up_in_background precarga los logos de las ligas activas al
+arrancar, así en régimen normal generar un card no hace llamadas de red.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+LOGO_CACHE_DIR = os.getenv("LOGO_CACHE_DIR", "data/cache/logos")
+MAX_IN_MEMORY = 16
+RETRY_AFTER = 3600  # s antes de reintentar una URL que falló
+TIMEOUT = 5
+
+_memory: OrderedDict[str, np.ndarray] = OrderedDict()
+_failed: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _path(url: str) -> str:
+    return os.path.join(LOGO_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + ".img")
+
+
+def _decode(data: bytes) -> np.ndarray:
+    # PIL se importa aquí: main.py importa este módulo y no debe pagar su carga al arrancar
+    from PIL import Image
+
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGBA"))
+
+
+def _read_disk(url: str) -> bytes | None:
+    try:
+        with open(_path(url), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_disk(url: str, data: bytes) -> None:
+    path = _path(url)
+    try:
+        os.makedirs(LOGO_CACHE_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.warning("No se pudo guardar el logo en disco (%s): %s", url, e)
+
+
+def _download(url: str) -> bytes:
+    r = requests.get(url, timeout=TIMEOUT)
+    r.raise_for_status()
+    return r.content
+
+
+def get_logo(url: str) -> np.ndarray | None:
+    """Logo decodificado (RGBA uint8) de la URL, o None si no está disponible."""
+    with _lock:
+        if url in _memory:
+            _memory.move_to_end(url)
+            return _memory[url]
+        if time.monotonic() - _failed.get(url, -RETRY_AFTER) < RETRY_AFTER:
+            return None
+
+    data = _read_disk(url)
+    from_disk = data is not None
+    try:
+        if data is None:
+            data = _download(url)
+        img = _decode(data)
+    except Exception as e:
+        logger.warning("Logo no disponible (%s): %s", url, e)
+        with _lock:
+            _failed[url] = time.monotonic()
+        return None
+    if not from_disk:
+        _write_disk(url, data)
+
+    with _lock:
+        _failed.pop(url, None)
+        _memory[url] = img
+        _memory.move_to_end(url)
+        while len(_memory) > MAX_IN_MEMORY:
+            _memory.popitem(last=False)
+    return img
+
+
+def warm_up(leagues: list[dict]) -> int:
+    """Carga en caché los logos de las ligas (filas de `leagues`); retorna cuántos quedaron."""
+    from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
+
+    repo = LeaguesConfigRepository()
+    loaded = 0
+    for lg in leagues:
+        url = lg.get("logo_url") or repo.get_logo_url(lg["league_db"])
+        if url and get_logo(url) is not None:
+            loaded += 1
+    logger.info("Logos de liga en caché: %d/%d", loaded, len(leagues))
+    return loaded
+
+
+def warm_up_in_background(leagues: list[dict]) -> threading.Thread:
+    """Lanza warm_up en un hilo daemon y retorna el hilo."""
+    def _run():
+        try:
+            warm_up(leagues)
+        except Exception as e:
+            logger.error("Precarga de logos falló: %s", e, exc_info=True)
+
+    thread = threading.Thread(target=_run, name="logo-warmup", daemon=True)
+    thread.start()
+    return thread
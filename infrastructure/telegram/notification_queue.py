@@ -0,0 +1,171 @@
+"""
+Cola de salida de notificaciones de Telegram.
+
+El predictor solo encola: cada Notification lleva el Future del card (render en
+card_generator), una función que produce el caption (explicación de Groq) y el
+texto de respaldo por si el card falla, y opcionalmente on_done(entregada),
+que se llama una vez por notificación al terminar su envío. Un pool de WORKERS hilos consume la
+cola; cada worker junta lo que llegue en BATCH_WINDOW segundos (hasta
+ALBUM_LIMIT) y lo envía como un álbum sendMediaGroup. El rate limit del chat y
+los reintentos con backoff los aplica TelegramNotifier.
+"""
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable
+
+from infrastructure.telegram.telegram_notifier import ALBUM_LIMIT, TelegramNotifier
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("TELEGRAM_WORKERS", "2"))
+BATCH_WINDOW = 2.0
+MAX_PENDING = 200
+
+
+@dataclass
+class Notification:
+    label: str
+    text: str                                   # mensaje completo si no hay card
+    card: Future | None = None                  # Future[bytes] del card
+    caption: Callable[[], str | None] | None = None
+    on_done: Callable[[bool], None] | None = None
+    settled: bool = field(default=False, init=False, repr=False)
+
+
+class NotificationQueue:
+    def __init__(self, notifier: TelegramNotifier | None = None, workers: int = WORKERS):
+        self.notifier = notifier or TelegramNotifier()
+        self._queue: queue.Queue[Notification] = queue.Queue(maxsize=MAX_PENDING)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"telegram-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for w in self._workers:
+            w.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.notifier.enabled
+
+    def put(self, notification: Notification) -> None:
+        self._queue.put(notification)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Bloquea hasta que todo lo encolado se haya enviado (o descartado).
+
+        Con timeout devuelve False si al vencer todavía quedaba trabajo pendiente.
+        """
+        q = self._queue
+        with q.all_tasks_done:
+            return q.all_tasks_done.wait_for(lambda: q.unfinished_tasks == 0, timeout)
+
+    def _next_batch(self) -> list[Notification]:
+        batch = [self._queue.get()]
+        while len(batch) < ALBUM_LIMIT:
+            try:
+                batch.append(self._queue.get(timeout=BATCH_WINDOW))
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                logger.error("Error despachando %d notificaciones: %s", len(batch), e, exc_info=True)
+                for n in batch:
+                    self._settle(n, False)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _caption(n: Notification) -> str | None:
+        if n.caption is None:
+            return None
+        try:
+            return n.caption()
+        except Exception as e:
+            logger.warning("Sin caption para '%s': %s", n.label, e)
+            return None
+
+    @staticmethod
+    def _settle(n: Notification, delivered: bool) -> None:
+        if n.on_done is None or n.settled:
+            return
+        n.settled = True
+        try:
+            n.on_done(delivered)
+        except Exception as e:
+            logger.warning("on_done falló para '%s': %s", n.label, e)
+
+    def _send_text(self, n: Notification, caption: str | None) -> bool:
+        ok = self.notifier.send(n.text)
+        if ok and caption:
+            self.notifier.send(caption)
+        return ok
+
+    def _dispatch(self, batch: list[Notification]) -> None:
+        album = []   # [(notification, bytes del card, caption)]
+        for n in batch:
+            caption = self._caption(n)
+            try:
+                album.append((n, n.card.result(), caption))
+            except Exception as e:
+                logger.warning("No se pudo generar el card de '%s' — usando texto: %s", n.label, e)
+                self._settle(n, self._send_text(n, caption))
+        if not album:
+            return
+        if self.notifier.send_media_group([(image, caption) for _, image, caption in album]):
+            logger.info("Telegram: %d notificaciones enviadas", len(album))
+            for n, _, _ in album:
+                self._settle(n, True)
+            return
+
+        # Un solo item inválido hace que Telegram rechace el álbum completo:
+        # se reintenta cada card por separado y sin caption, y si tampoco
+        # pasa se manda el mensaje de texto
+        logger.warning("Telegram rechazó el álbum de %d cards — reenviando uno a uno", len(album))
+        for n, image, caption in album:
+            if self.notifier.send_photo_bytes(image):
+                if caption:
+                    self.notifier.send(caption)
+                self._settle(n, True)
+            elif self._send_text(n, caption):
+                self._settle(n, True)
+            else:
+                logger.error("No se pudo notificar '%s' por Telegram", n.label)
+                self._settle(n, False)
+
+
+_instance: NotificationQueue | None = None
+_instance_lock = threading.Lock()
+
+
+def get_queue() -> NotificationQueue:
+    """Cola compartida del proceso; los workers arrancan con el primer uso."""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = NotificationQueue()
+        return _instance
+
+
+def drain(timeout: float | None = None) -> None:
+    """Espera a que la cola compartida termine de enviar, si llegó a crearse.
+
+    Se llama al apagar el proceso: los workers son daemon y sin esto las
+    notificaciones encoladas se perderían.
+    """
+    with _instance_lock:
+        instance = _instance
+    if instance is None:
+        return
+    if not instance.join(timeout):
+        logger.warning("Apagado con notificaciones de Telegram pendientes (timeout %.0fs)", timeout)
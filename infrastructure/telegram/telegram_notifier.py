@@ -1,13 +1,22 @@
+import json
 import logging
 import os
+import time
 
 import requests
 from dotenv import load_dotenv
 
+from infrastructure.rate_limiter import get_limiter
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0   # s; se duplica en cada reintento
+CAPTION_LIMIT = 1024
+ALBUM_LIMIT = 10     # fotos por sendMediaGroup
+
 
 class TelegramNotifier:
     _BASE = "https://api.telegram.org/bot{token}/{method}"
@@ -19,20 +28,41 @@ class TelegramNotifier:
         if not self.enabled:
             logger.debug("TelegramNotifier deshabilitado (sin token/chat_id)")
 
-    def _post(self, method: str, payload: dict) -> bool:
-        try:
-            url = self._BASE.format(token=self.token, method=method)
-            data = requests.post(url, json=payload, timeout=10).json()
-            if data.get("ok"):
-                return True
-            logger.warning("Telegram rechazó '%s': %s", method, data.get("description"))
-        except Exception as e:
-            logger.error("Telegram error en '%s': %s", method, e)
+    def _call(self, method: str, timeout: int = 10, **request_kwargs) -> bool:
+        """POST a la Bot API respetando el rate limit del chat.
+
+        Reintenta con backoff exponencial ante errores de red, 5xx y 429
+        (en ese caso espera el retry_after que indica Telegram).
+        """
+        url = self._BASE.format(token=self.token, method=method)
+        for attempt in range(MAX_RETRIES + 1):
+            delay = BACKOFF_BASE * 2 ** attempt
+            try:
+                get_limiter("telegram", key=self.chat_id).acquire()
+                data = requests.post(url, timeout=timeout, **request_kwargs).json()
+                if data.get("ok"):
+                    return True
+                code = data.get("error_code")
+                if code != 429 and not (code or 0) >= 500:
+                    logger.warning("Telegram rechazó '%s': %s", method, data.get("description"))
+                    return False
+                delay = max(delay, (data.get("parameters") or {}).get("retry_after", 0))
+                error = data.get("description")
+            except Exception as e:
+                error = e
+            if attempt < MAX_RETRIES:
+                logger.warning("Telegram '%s' falló (%s) — reintento %d/%d en %.0fs",
+                               method, error, attempt + 1, MAX_RETRIES, delay)
+                time.sleep(delay)
+        logger.error("Telegram error en '%s': %s", method, error)
         return False
 
-    def send(self, message: str) -> None:
+    def _post(self, method: str, payload: dict) -> bool:
+        return self._call(method, json=payload)
+
+    def send(self, message: str) -> bool:
         if not self.enabled:
-            return
+            return False
         ok = self._post("sendMessage", {
             "chat_id": self.chat_id,
             "text": message,
@@ -40,6 +70,7 @@ class TelegramNotifier:
         })
         if ok:
             logger.debug("Telegram: mensaje enviado")
+        return ok
 
     def send_photo(self, photo_url: str) -> None:
         """Envía una imagen a partir de una URL pública."""
@@ -52,21 +83,45 @@ class TelegramNotifier:
         if ok:
             logger.debug("Telegram: foto enviada (%s)", photo_url)
 
-    def send_photo_bytes(self, image_bytes: bytes, filename: str = "card.png") -> None:
-        """Envía una imagen generada en memoria (bytes)."""
+    def send_photo_bytes(self, image_bytes: bytes, filename: str = "card.png",
+                         caption: str | None = None) -> bool:
+        """Envía una imagen generada en memoria (bytes), con caption HTML opcional.
+
+        El caption ya debe venir escapado y dentro de CAPTION_LIMIT: recortar
+        aquí podría partir una etiqueta HTML.
+        """
         if not self.enabled:
-            return
-        try:
-            url = self._BASE.format(token=self.token, method="sendPhoto")
-            data = requests.post(
-                url,
-                data={"chat_id": self.chat_id},
-                files={"photo": (filename, image_bytes, "image/png")},
-                timeout=20,
-            ).json()
-            if data.get("ok"):
-                logger.debug("Telegram: card enviada")
-            else:
-                logger.warning("Telegram rechazó card: %s", data.get("description"))
-        except Exception as e:
-            logger.error("Telegram error enviando card: %s", e)
+            return False
+        data = {"chat_id": self.chat_id}
+        if caption:
+            data.update(caption=caption, parse_mode="HTML")
+        ok = self._call(
+            "sendPhoto", timeout=20,
+            data=data,
+            files={"photo": (filename, image_bytes, "image/png")},
+        )
+        if ok:
+            logger.debug("Telegram: card enviada")
+        return ok
+
+    def send_media_group(self, photos: list[tuple[bytes, str | None]]) -> bool:
+        """Envía hasta ALBUM_LIMIT imágenes [(bytes, caption)] como un solo álbum."""
+        if not self.enabled:
+            return False
+        if len(photos) == 1:
+            return self.send_photo_bytes(photos[0][0], caption=photos[0][1])
+        media, files = [], {}
+        for i, (image_bytes, caption) in enumerate(photos[:ALBUM_LIMIT]):
+            item = {"type": "photo", "media": f"attach://card{i}"}
+            if caption:
+                item.update(caption=caption, parse_mode="HTML")
+            media.append(item)
+            files[f"card{i}"] = (f"card{i}.png", image_bytes, "image/png")
+        ok = self._call(
+            "sendMediaGroup", timeout=30,
+            data={"chat_id": self.chat_id, "media": json.dumps(media)},
+            files=files,
+        )
+        if ok:
+            logger.debug("Telegram: álbum de %d cards enviado", len(media))
+        return ok
@@ -6,14 +6,17 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import FastAPI
 
 from application.scheduler import create_scheduler, last_run, run_betplay, run_nightly
+from infrastructure.betplay.betplay_api_client import latency_metrics as betplay_latency
 from infrastructure.logging_config import setup_logging
 from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
 from infrastructure.persistence.postgres_config import PostgresConfig
+from infrastructure.telegram import logo_cache
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 scheduler: BackgroundScheduler | None = None
+SHUTDOWN_DRAIN_SECONDS = 60.0
 
 
 @asynccontextmanager
@@ -24,6 +27,7 @@ async def lifespan(app: FastAPI):
     logger.info("Ligas configuradas: %d", len(leagues))
     for lg in leagues:
         logger.info("  · %s  (db=%s)", lg["name"], lg["league_db"])
+    logo_cache.warm_up_in_background(leagues)
 
     scheduler = create_scheduler()
     logger.info("Arrancando scheduler...")
@@ -33,6 +37,11 @@ async def lifespan(app: FastAPI):
     scheduler.shutdown()
     logger.info("Scheduler detenido")
 
+    # Import diferido: la cola solo existe si algún job llegó a notificar
+    from infrastructure.telegram.notification_queue import drain
+    drain(timeout=SHUTDOWN_DRAIN_SECONDS)
+    logger.info("Cola de Telegram vaciada")
+
 
 app = FastAPI(title="Apuestas Deportivas API", lifespan=lifespan)
 
@@ -48,7 +57,7 @@ def status():
         {"id": j.id, "next_run": str(j.next_run_time)}
         for j in scheduler.get_jobs()
     ] if scheduler else []
-    return {"jobs": jobs, "last_run": last_run}
+    return {"jobs": jobs, "last_run": last_run, "betplay_latency": betplay_latency()}
 
 
 @app.post("/run/betplay")
@@ -85,7 +85,7 @@ def load_historical_matches(db_name: str) -> pd.DataFrame:
 
 
 def load_matches(db_name: str) -> pd.DataFrame:
-    """Carga el último snapshot de cuotas desde betplay_odds_history."""
+    """Carga el último snapshot de cuotas (vista betplay_odds_latest) por evento."""
     league_id = PostgresConfig.get_league_id(db_name)
     conn = PostgresConfig.get_connection()
     try:
@@ -94,28 +94,56 @@ def load_matches(db_name: str) -> pd.DataFrame:
                 """
                 SELECT event_id AS id, registered_at AS fecha_registro,
                        event_at AS fecha_evento, league_name AS liga,
-                       match_name AS partido, odds
-                FROM betplay_odds_history
+                       match_name AS partido
+                FROM betplay_events
                 WHERE league_id = %s
                 """,
                 (league_id,),
             )
             cols = [d[0] for d in cur.description]
-            rows = cur.fetchall()
+            events = cur.fetchall()
+
+            cur.execute(
+                """
+                SELECT event_id AS id, market || ' ' || outcome AS selection,
+                       price::float8 AS price
+                FROM betplay_odds_latest
+                WHERE league_id = %s
+                """,
+                (league_id,),
+            )
+            prices = cur.fetchall()
     finally:
         PostgresConfig.put_connection(conn)
 
-    if not rows:
+    if not events:
         return pd.DataFrame()
 
-    df = pd.DataFrame(rows, columns=cols)
+    df = pd.DataFrame(events, columns=cols)
 
-    # Expandir columna JSONB `odds` al nivel del DataFrame
-    odds_df = pd.json_normalize(df["odds"].tolist())
-    df = pd.concat([df.drop(columns=["odds"]), odds_df], axis=1)
+    # Pivotar los ticks (id, selección, precio) a una columna por selección
+    if prices:
+        odds_df = (
+            pd.DataFrame(prices, columns=["id", "selection", "price"])
+            .pivot(index="id", columns="selection", values="price")
+            .rename_axis(columns=None)
+            .reset_index()
+        )
+        df = df.merge(odds_df, on="id", how="left")
 
     df[["home_team", "away_team"]] = df["partido"].str.split(" - ", expand=True)
     df["home_team"] = df["home_team"].apply(normalize_team)
     df["away_team"] = df["away_team"].apply(normalize_team)
 
     return df
+
+
+def h2h_fixtures(df: pd.DataFrame) -> list[tuple[int, str, str]]:
+    """[(event_id, local, visitante)] de un DataFrame de cuotas Betplay (columnas id, partido),
+    con los nombres normalizados igual que en load_matches."""
+    fixtures = []
+    for event_id, partido in zip(df["id"], df["partido"]):
+        teams = str(partido).split(" - ")
+        if len(teams) == 2:
+            fixtures.append((int(event_id), normalize_team(teams[0]), normalize_team(teams[1])))
+    return fixtures
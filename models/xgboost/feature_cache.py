@@ -0,0 +1,133 @@
+"""
+Almacén en disco de la matriz de features (X, y, seasons) por liga.
+
+Cada liga guarda una única matriz junto con la huella del historial del que
+salió (filas, fecha máxima y checksum) y FEATURE_VERSION:
+
+  CACHE_DIR/<league_db>/features_v<FEATURE_VERSION>.npz    X, columnas, y, seasons
+  CACHE_DIR/<league_db>/features_v<FEATURE_VERSION>.json   huella del historial
+
+Al pedir las features:
+  · misma huella                → se sirve la matriz guardada, sin cálculo
+  · solo hay partidos nuevos    → se calculan las filas de esos partidos
+    posteriores a la fecha máxima   (el historial previo solo da contexto) y se
+                                    añaden al final
+  · cualquier otro cambio       → reconstrucción completa
+
+El checksum no depende del orden de las filas: PostgreSQL no garantiza el
+orden de partidos con la misma fecha y eso no cambia ninguna feature.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from models.xgboost.feature_engineer import FEATURE_VERSION, build_features
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", "data/cache/features")
+
+# Columnas del historial que intervienen en las features
+_SOURCE_COLS = ["Date", "HomeTeam", "AwayTeam", "FTHG", "FTAG", "FTR", "B365H", "B365D", "B365A", "season"]
+
+
+def _source(df: pd.DataFrame) -> pd.DataFrame:
+    src = df[[c for c in _SOURCE_COLS if c in df.columns]].copy()
+    src["Date"] = pd.to_datetime(src["Date"], format="mixed", dayfirst=True)
+    return src
+
+
+def _checksum(src: pd.DataFrame) -> str:
+    # Suma (módulo 2^64) de los hashes por fila: independiente del orden
+    return f"{int(pd.util.hash_pandas_object(src, index=False).to_numpy().sum()):016x}"
+
+
+def fingerprint(df: pd.DataFrame) -> dict:
+    """Huella del historial: número de filas, fecha máxima y checksum."""
+    src = _source(df)
+    return {
+        "count":    int(len(src)),
+        "max_date": src["Date"].max().isoformat() if len(src) else None,
+        "checksum": _checksum(src),
+    }
+
+
+def _paths(league_db: str) -> tuple[str, str]:
+    base = os.path.join(CACHE_DIR, league_db, f"features_v{FEATURE_VERSION}")
+    return f"{base}.npz", f"{base}.json"
+
+
+def _read(league_db: str) -> tuple[dict, tuple[pd.DataFrame, pd.Series, pd.Series]] | None:
+    npz_path, meta_path = _paths(league_db)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with np.load(npz_path, allow_pickle=False) as data:
+            X = pd.DataFrame(data["X"], columns=data["columns"].tolist())
+            y = pd.Series(data["y"], name="result")
+            seasons = pd.Series(data["seasons"], name="season", dtype=object)
+    except (OSError, ValueError, KeyError):
+        return None
+    return meta, (X, y, seasons)
+
+
+def _write(league_db: str, fp: dict, X: pd.DataFrame, y: pd.Series, seasons: pd.Series) -> None:
+    npz_path, meta_path = _paths(league_db)
+    try:
+        os.makedirs(os.path.dirname(npz_path), exist_ok=True)
+        tmp = f"{npz_path}.tmp.npz"
+        np.savez(
+            tmp,
+            X=X.to_numpy(dtype=float),
+            columns=np.array(X.columns, dtype=str),
+            y=y.to_numpy(dtype=np.int64),
+            seasons=seasons.to_numpy(dtype=str),
+        )
+        os.replace(tmp, npz_path)
+        # La huella se escribe al final: solo marca válida una matriz completa
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"feature_version": FEATURE_VERSION, **fp}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+    except OSError as e:
+        logger.warning("No se pudo guardar la matriz de features de %s: %s", league_db, e)
+
+
+def _reset(X: pd.DataFrame, y: pd.Series, seasons: pd.Series):
+    return X.reset_index(drop=True), y.reset_index(drop=True), seasons.reset_index(drop=True)
+
+
+def load_or_build(league_db: str, df: pd.DataFrame, engine: str = "stream") -> tuple[pd.DataFrame, pd.Series, pd.Series]:
+    """Retorna build_features(df) reutilizando la matriz guardada siempre que se pueda."""
+    fp = fingerprint(df)
+    stored = _read(league_db)
+
+    if stored is not None:
+        meta, (X, y, seasons) = stored
+        if all(meta.get(k) == fp[k] for k in fp):
+            logger.info("Features de %s sin cambios (%d filas) — se reutilizan", league_db, len(X))
+            return X, y, seasons
+
+        if meta.get("max_date") and fp["count"] > meta["count"]:
+            src = _source(df)
+            old = src[src["Date"] <= pd.Timestamp(meta["max_date"])]
+            if len(old) == meta["count"] and _checksum(old) == meta["checksum"] and not X.empty:
+                X_new, y_new, s_new = build_features(df, after=meta["max_date"])
+                # Una matriz guardada con otras columnas (o vacía, sin columnas)
+                # no se puede extender: se reconstruye desde cero
+                if set(X_new.columns) == set(X.columns):
+                    if not X_new.empty:
+                        X = pd.concat([X, X_new[X.columns]], ignore_index=True)
+                        y = pd.concat([y, y_new], ignore_index=True)
+                        seasons = pd.concat([seasons, s_new.astype(object)], ignore_index=True)
+                    logger.info("Features de %s: %d partidos nuevos → %d filas añadidas",
+                                league_db, fp["count"] - meta["count"], len(X_new))
+                    _write(league_db, fp, X, y, seasons)
+                    return X, y, seasons
+
+    logger.info("Features de %s: reconstrucción completa (engine=%s)", league_db, engine)
+    X, y, seasons = _reset(*build_features(df, engine=engine))
+    _write(league_db, fp, X, y, seasons)
+    return X, y, seasons
@@ -1,9 +1,15 @@
+from collections import deque
+
 import pandas as pd
 import numpy as np
 
 WINDOW = 5
 H2H_WINDOW = 5
 
+# Versión del cálculo de features: subirla al cambiar columnas o lógica para
+# invalidar las matrices guardadas en feature_cache
+FEATURE_VERSION = 1
+
 H2H_DEFAULTS = {
     "h2h_home_win_rate": 0.45,
     "h2h_draw_rate":     0.25,
@@ -155,16 +161,149 @@ def _h2h_from_api_doc(home_team: str, h2h_doc: dict | None) -> dict:
     }
 
 
-def build_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
-    """Construye X (features) e y (target) para todos los partidos históricos.
-    Requiere columnas: Date, HomeTeam, AwayTeam, FTHG, FTAG, FTR, B365H, B365D, B365A
-    Target: H=0, D=1, A=2
+class _RollingForm:
+    """Forma reciente incremental: una sola pasada sobre los partidos ordenados.
+
+    Mantiene buffers circulares (deque con maxlen) con los últimos WINDOW
+    partidos de cada equipo, de cada (equipo, rol) y los últimos H2H_WINDOW
+    de cada pareja. Las consultas devuelven los mismos dicts que
+    _team_stats / _role_stats / _h2h_stats pero en O(1).
     """
+
+    def __init__(self, n: int = WINDOW, n_h2h: int = H2H_WINDOW):
+        self.n = n
+        self.n_h2h = n_h2h
+        self._team: dict[str, deque] = {}
+        self._role: dict[tuple[str, str], deque] = {}
+        self._pair: dict[frozenset, deque] = {}
+
+    def push(self, home: str, away: str, fthg, ftag, ftr) -> None:
+        """Registra un partido jugado (ya no visible para su propia fecha)."""
+        home_pts = 3 if ftr == "H" else (0 if ftr == "A" else 1)
+        away_pts = 0 if ftr == "H" else (3 if ftr == "A" else 1)
+
+        self._team.setdefault(home, deque(maxlen=self.n)).append((True, fthg, ftag, home_pts))
+        self._team.setdefault(away, deque(maxlen=self.n)).append((False, ftag, fthg, away_pts))
+        self._role.setdefault((home, "home"), deque(maxlen=self.n)).append((fthg, ftag, home_pts))
+        self._role.setdefault((away, "away"), deque(maxlen=self.n)).append((ftag, fthg, away_pts))
+        self._pair.setdefault(frozenset((home, away)), deque(maxlen=self.n_h2h)).append(
+            (home, fthg, ftag, ftr)
+        )
+
+    def teams(self) -> list[str]:
+        return list(self._team)
+
+    def team_stats(self, team: str) -> dict:
+        recent = self._team.get(team)
+        if not recent:
+            return {
+                "gf5": np.nan, "ga5": np.nan, "pts5": np.nan,
+                "home_gf5": np.nan, "home_ga5": np.nan,
+                "away_gf5": np.nan, "away_ga5": np.nan,
+            }
+
+        home_m = [r for r in recent if r[0]]
+        away_m = [r for r in recent if not r[0]]
+        return {
+            "gf5":      _mean(r[1] for r in recent),
+            "ga5":      _mean(r[2] for r in recent),
+            "pts5":     _mean(r[3] for r in recent),
+            "home_gf5": _mean(r[1] for r in home_m) if home_m else np.nan,
+            "home_ga5": _mean(r[2] for r in home_m) if home_m else np.nan,
+            "away_gf5": _mean(r[1] for r in away_m) if away_m else np.nan,
+            "away_ga5": _mean(r[2] for r in away_m) if away_m else np.nan,
+        }
+
+    def role_stats(self, team: str, role: str) -> dict:
+        recent = self._role.get((team, role))
+        if not recent:
+            return {"role_gf5": np.nan, "role_ga5": np.nan, "role_pts5": np.nan}
+        return {
+            "role_gf5":  _mean(r[0] for r in recent),
+            "role_ga5":  _mean(r[1] for r in recent),
+            "role_pts5": _mean(r[2] for r in recent),
+        }
+
+    def h2h_stats(self, home: str, away: str) -> dict:
+        recent = self._pair.get(frozenset((home, away)))
+        if not recent:
+            return H2H_DEFAULTS.copy()
+
+        home_wins = away_wins = draws = 0
+        hg, ag = [], []
+        for played_home, fthg, ftag, ftr in recent:
+            home_is_home = played_home == home
+            hg.append(fthg if home_is_home else ftag)
+            ag.append(ftag if home_is_home else fthg)
+            if ftr == "D":
+                draws += 1
+            elif ftr == "H":
+                if home_is_home: home_wins += 1
+                else:            away_wins += 1
+            elif ftr == "A":
+                if home_is_home: away_wins += 1
+                else:            home_wins += 1
+
+        total = len(recent)
+        return {
+            "h2h_home_win_rate": home_wins / total,
+            "h2h_draw_rate":     draws     / total,
+            "h2h_away_win_rate": away_wins / total,
+            "h2h_home_goals":    _mean(hg),
+            "h2h_away_goals":    _mean(ag),
+        }
+
+
+def _mean(values) -> float:
+    vals = list(values)
+    return sum(vals) / len(vals)
+
+
+def _prepare_history(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df["Date"] = pd.to_datetime(df["Date"], format="mixed", dayfirst=True)
     df = df.sort_values("Date").reset_index(drop=True)
-    df = df.dropna(subset=["FTR", "B365H", "B365D", "B365A"])
+    return df.dropna(subset=["FTR", "B365H", "B365D", "B365A"])
+
 
+def _feature_row(match, hs: dict, aws: dict, hs_rol: dict, aws_rol: dict, h2h: dict) -> dict:
+    return {
+        "home_gf5":      hs["gf5"],
+        "home_ga5":      hs["ga5"],
+        "home_pts5":     hs["pts5"],
+        "home_home_gf5": hs["home_gf5"] if not pd.isna(hs["home_gf5"]) else hs["gf5"],
+        "home_home_ga5": hs["home_ga5"] if not pd.isna(hs["home_ga5"]) else hs["ga5"],
+        "home_role_gf5":  hs_rol["role_gf5"]  if not pd.isna(hs_rol["role_gf5"])  else hs["gf5"],
+        "home_role_ga5":  hs_rol["role_ga5"]  if not pd.isna(hs_rol["role_ga5"])  else hs["ga5"],
+        "home_role_pts5": hs_rol["role_pts5"] if not pd.isna(hs_rol["role_pts5"]) else hs["pts5"],
+        "away_gf5":      aws["gf5"],
+        "away_ga5":      aws["ga5"],
+        "away_pts5":     aws["pts5"],
+        "away_away_gf5": aws["away_gf5"] if not pd.isna(aws["away_gf5"]) else aws["gf5"],
+        "away_away_ga5": aws["away_ga5"] if not pd.isna(aws["away_ga5"]) else aws["ga5"],
+        "away_role_gf5":  aws_rol["role_gf5"]  if not pd.isna(aws_rol["role_gf5"])  else aws["gf5"],
+        "away_role_ga5":  aws_rol["role_ga5"]  if not pd.isna(aws_rol["role_ga5"])  else aws["ga5"],
+        "away_role_pts5": aws_rol["role_pts5"] if not pd.isna(aws_rol["role_pts5"]) else aws["pts5"],
+        "odd_h":         float(match.B365H),
+        "odd_d":         float(match.B365D),
+        "odd_a":         float(match.B365A),
+        **h2h,
+        "season":        match.season,
+        "result":        0 if match.FTR == "H" else (1 if match.FTR == "D" else 2),
+    }
+
+
+def _split_features(features_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series, pd.Series]:
+    if features_df.empty:
+        return pd.DataFrame(), pd.Series(dtype="int64", name="result"), pd.Series(dtype=object, name="season")
+    X = features_df.drop(columns=["result", "season"])
+    y = features_df["result"]
+    seasons = features_df["season"]
+    return X, y, seasons
+
+
+def _build_scan(df: pd.DataFrame) -> pd.DataFrame:
+    """Implementación original: una máscara sobre todo el historial por partido (O(n²))."""
     rows = []
     # itertuples es ~10x más rápido que iterrows para acceso a columnas
     for match in df.itertuples(index=False):
@@ -181,67 +320,254 @@ def build_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
         if pd.isna(hs["gf5"]) or pd.isna(aws["gf5"]):
             continue
 
-        rows.append({
-            "home_gf5":      hs["gf5"],
-            "home_ga5":      hs["ga5"],
-            "home_pts5":     hs["pts5"],
-            "home_home_gf5": hs["home_gf5"] if not pd.isna(hs["home_gf5"]) else hs["gf5"],
-            "home_home_ga5": hs["home_ga5"] if not pd.isna(hs["home_ga5"]) else hs["ga5"],
-            "home_role_gf5":  hs_rol["role_gf5"]  if not pd.isna(hs_rol["role_gf5"])  else hs["gf5"],
-            "home_role_ga5":  hs_rol["role_ga5"]  if not pd.isna(hs_rol["role_ga5"])  else hs["ga5"],
-            "home_role_pts5": hs_rol["role_pts5"] if not pd.isna(hs_rol["role_pts5"]) else hs["pts5"],
-            "away_gf5":      aws["gf5"],
-            "away_ga5":      aws["ga5"],
-            "away_pts5":     aws["pts5"],
-            "away_away_gf5": aws["away_gf5"] if not pd.isna(aws["away_gf5"]) else aws["gf5"],
-            "away_away_ga5": aws["away_ga5"] if not pd.isna(aws["away_ga5"]) else aws["ga5"],
-            "away_role_gf5":  aws_rol["role_gf5"]  if not pd.isna(aws_rol["role_gf5"])  else aws["gf5"],
-            "away_role_ga5":  aws_rol["role_ga5"]  if not pd.isna(aws_rol["role_ga5"])  else aws["ga5"],
-            "away_role_pts5": aws_rol["role_pts5"] if not pd.isna(aws_rol["role_pts5"]) else aws["pts5"],
-            "odd_h":         float(match.B365H),
-            "odd_d":         float(match.B365D),
-            "odd_a":         float(match.B365A),
-            **h2h,
-            "season":        match.season,
-            "result":        0 if match.FTR == "H" else (1 if match.FTR == "D" else 2),
-        })
-
-    features_df = pd.DataFrame(rows)
-    X = features_df.drop(columns=["result", "season"])
-    y = features_df["result"]
-    seasons = features_df["season"]
-    return X, y, seasons
+        rows.append(_feature_row(match, hs, aws, hs_rol, aws_rol, h2h))
+    return pd.DataFrame(rows)
 
 
-def build_match_features(
-    home: str,
-    away: str,
-    odd_h: float,
-    odd_d: float,
-    odd_a: float,
-    df_history: pd.DataFrame,
-    h2h_doc: dict | None = None,
-    future_date=None,
-) -> pd.DataFrame:
-    """Construye features para un partido futuro (de Betplay) usando el historial.
+def _build_stream(df: pd.DataFrame, after=None) -> pd.DataFrame:
+    """Una sola pasada (O(n)) con _RollingForm.
+
+    Los partidos de una misma fecha se registran en el tracker solo al pasar a
+    la fecha siguiente, igual que el filtro `Date < before_date` del escaneo.
+    Con `after`, los partidos hasta esa fecha (inclusive) solo alimentan el
+    tracker y únicamente se generan filas para los posteriores.
+    """
+    form = _RollingForm()
+    rows = []
+    pending = []
+    current_date = None
+
+    for match in df.itertuples(index=False):
+        if match.Date != current_date:
+            for m in pending:
+                form.push(m.HomeTeam, m.AwayTeam, m.FTHG, m.FTAG, m.FTR)
+            pending.clear()
+            current_date = match.Date
+        pending.append(match)
+        if after is not None and match.Date <= after:
+            continue
+
+        home = match.HomeTeam
+        away = match.AwayTeam
+
+        hs  = form.team_stats(home)
+        aws = form.team_stats(away)
+        if pd.isna(hs["gf5"]) or pd.isna(aws["gf5"]):
+            continue
+
+        rows.append(_feature_row(
+            match, hs, aws,
+            form.role_stats(home, "home"),
+            form.role_stats(away, "away"),
+            form.h2h_stats(home, away),
+        ))
+    return pd.DataFrame(rows)
+
+
+def _rolling_before(long: pd.DataFrame, keys: list[str], cols: list[str], n: int) -> pd.DataFrame:
+    """Sumas y conteo de los últimos n partidos de cada grupo *antes* de cada fila.
+
+    `rolling(n).sum()` incluye la fila actual; `shift(1)` la excluye y tomar la
+    primera fila de cada (grupo, fecha) replica el filtro estricto
+    `Date < before_date` cuando un grupo tiene varias filas en la misma fecha.
+    Un NaN dentro de la ventana deja la suma en NaN, como np.mean en "scan".
+    """
+    group_keys = [long[k] for k in keys]
+    values = long[cols]
+    nans = values.isna().astype(float).add_suffix("__nan")
+    frame = pd.concat([values.fillna(0.0), nans], axis=1)
+    frame["n"] = 1.0
+
+    rolled = frame.groupby(group_keys, sort=False).rolling(n, min_periods=1).sum()
+    rolled = rolled.reset_index(level=list(range(len(keys))), drop=True).sort_index()
+    sums = rolled[cols].mask(rolled[nans.columns].to_numpy() > 0)
+    sums["n"] = rolled["n"]
+
+    before = sums.groupby(group_keys, sort=False).shift(1)
+    # Posición de la primera fila de cada (grupo, fecha); "first" de pandas
+    # saltaría los NaN y tomaría una fila que ya incluye el partido del mismo día
+    first = pd.Series(np.arange(len(long)), index=long.index).groupby(
+        group_keys + [long["Date"]], sort=False
+    ).transform("min")
+    return before.iloc[first.to_numpy()].set_axis(long.index)
+
+
+def _build_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    """Implementación vectorizada: tabla larga equipo-partido + rolling agrupado.
+
+    Sin bucles de Python por partido; produce la misma matriz que "stream".
+    """
+    df = df.reset_index(drop=True)
+    n_matches = len(df)
+    fthg = df["FTHG"].astype(float)
+    ftag = df["FTAG"].astype(float)
+    ftr  = df["FTR"]
+    home_pts = np.where(ftr == "H", 3, np.where(ftr == "A", 0, 1))
+    away_pts = np.where(ftr == "H", 0, np.where(ftr == "A", 3, 1))
+
+    # Tabla larga: fila 2i = local del partido i, fila 2i+1 = visitante
+    long = pd.DataFrame({
+        "match":   np.repeat(np.arange(n_matches), 2),
+        "Date":    np.repeat(df["Date"].values, 2),
+        "team":    np.column_stack([df["HomeTeam"], df["AwayTeam"]]).ravel(),
+        "is_home": np.tile([1.0, 0.0], n_matches),
+        "gf":      np.column_stack([fthg, ftag]).ravel(),
+        "ga":      np.column_stack([ftag, fthg]).ravel(),
+        "pts":     np.column_stack([home_pts, away_pts]).ravel().astype(float),
+    })
+    # Goles solo en las filas del rol (0 en las demás: un NaN de visitante no
+    # debe contaminar la suma de local, igual que gf[is_home] en "scan")
+    is_home = long["is_home"] > 0
+    long["home_gf"] = long["gf"].where(is_home, 0.0)
+    long["home_ga"] = long["ga"].where(is_home, 0.0)
+    long["away_gf"] = long["gf"].where(~is_home, 0.0)
+    long["away_ga"] = long["ga"].where(~is_home, 0.0)
+
+    team = _rolling_before(
+        long, ["team"], ["gf", "ga", "pts", "is_home", "home_gf", "home_ga", "away_gf", "away_ga"], WINDOW,
+    )
+    n_home = team["is_home"].where(team["is_home"] > 0)
+    n_away = (team["n"] - team["is_home"]).where(team["n"] - team["is_home"] > 0)
+    team_feats = pd.DataFrame({
+        "gf5":      team["gf"]  / team["n"],
+        "ga5":      team["ga"]  / team["n"],
+        "pts5":     team["pts"] / team["n"],
+        "home_gf5": team["home_gf"] / n_home,
+        "home_ga5": team["home_ga"] / n_home,
+        "away_gf5": team["away_gf"] / n_away,
+        "away_ga5": team["away_ga"] / n_away,
+    })
+
+    role = _rolling_before(long, ["team", "is_home"], ["gf", "ga", "pts"], WINDOW)
+    role_feats = pd.DataFrame({
+        "role_gf5":  role["gf"]  / role["n"],
+        "role_ga5":  role["ga"]  / role["n"],
+        "role_pts5": role["pts"] / role["n"],
+    })
+
+    hs,  aws     = team_feats.iloc[0::2].reset_index(drop=True), team_feats.iloc[1::2].reset_index(drop=True)
+    hs_rol, aws_rol = role_feats.iloc[0::2].reset_index(drop=True), role_feats.iloc[1::2].reset_index(drop=True)
+
+    # H2H: cada pareja orientada canónicamente (a = nombre menor) y reorientada al final
+    home_is_a = (df["HomeTeam"] <= df["AwayTeam"]).to_numpy()
+    pair = pd.DataFrame({
+        "pair":   np.where(home_is_a, df["HomeTeam"] + "\x00" + df["AwayTeam"],
+                           df["AwayTeam"] + "\x00" + df["HomeTeam"]),
+        "Date":   df["Date"],
+        "a_goals": np.where(home_is_a, fthg, ftag),
+        "b_goals": np.where(home_is_a, ftag, fthg),
+        "a_win":  np.where(home_is_a, ftr == "H", ftr == "A").astype(float),
+        "b_win":  np.where(home_is_a, ftr == "A", ftr == "H").astype(float),
+        "draw":   (ftr == "D").astype(float).to_numpy(),
+    })
+    h2h = _rolling_before(pair, ["pair"], ["a_goals", "b_goals", "a_win", "b_win", "draw"], H2H_WINDOW)
+    h2h_n = h2h["n"].where(h2h["n"] > 0)
+    h2h_feats = pd.DataFrame({
+        "h2h_home_win_rate": np.where(home_is_a, h2h["a_win"], h2h["b_win"]) / h2h_n,
+        "h2h_draw_rate":     h2h["draw"] / h2h_n,
+        "h2h_away_win_rate": np.where(home_is_a, h2h["b_win"], h2h["a_win"]) / h2h_n,
+        "h2h_home_goals":    np.where(home_is_a, h2h["a_goals"], h2h["b_goals"]) / h2h_n,
+        "h2h_away_goals":    np.where(home_is_a, h2h["b_goals"], h2h["a_goals"]) / h2h_n,
+    })
+    no_h2h = h2h_n.isna().to_numpy()
+    for col, default in H2H_DEFAULTS.items():
+        h2h_feats.loc[no_h2h, col] = default
+
+    features_df = pd.DataFrame({
+        "home_gf5":       hs["gf5"],
+        "home_ga5":       hs["ga5"],
+        "home_pts5":      hs["pts5"],
+        "home_home_gf5":  hs["home_gf5"].fillna(hs["gf5"]),
+        "home_home_ga5":  hs["home_ga5"].fillna(hs["ga5"]),
+        "home_role_gf5":  hs_rol["role_gf5"].fillna(hs["gf5"]),
+        "home_role_ga5":  hs_rol["role_ga5"].fillna(hs["ga5"]),
+        "home_role_pts5": hs_rol["role_pts5"].fillna(hs["pts5"]),
+        "away_gf5":       aws["gf5"],
+        "away_ga5":       aws["ga5"],
+        "away_pts5":      aws["pts5"],
+        "away_away_gf5":  aws["away_gf5"].fillna(aws["gf5"]),
+        "away_away_ga5":  aws["away_ga5"].fillna(aws["ga5"]),
+        "away_role_gf5":  aws_rol["role_gf5"].fillna(aws["gf5"]),
+        "away_role_ga5":  aws_rol["role_ga5"].fillna(aws["ga5"]),
+        "away_role_pts5": aws_rol["role_pts5"].fillna(aws["pts5"]),
+        "odd_h":          df["B365H"].astype(float),
+        "odd_d":          df["B365D"].astype(float),
+        "odd_a":          df["B365A"].astype(float),
+        **{col: h2h_feats[col] for col in H2H_DEFAULTS},
+        "season":         df["season"],
+        "result":         np.where(ftr == "H", 0, np.where(ftr == "D", 1, 2)),
+    })
+
+    has_form = hs["gf5"].notna() & aws["gf5"].notna()
+    return features_df[has_form].reset_index(drop=True)
+
+
+_ENGINES = {
+    "stream":     _build_stream,
+    "vectorized": _build_vectorized,
+    "scan":       _build_scan,
+}
+
+
+def build_features(df: pd.DataFrame, engine: str = "stream", after=None) -> tuple[pd.DataFrame, pd.Series, pd.Series]:
+    """Construye X (features) e y (target) para todos los partidos históricos.
+    Requiere columnas: Date, HomeTeam, AwayTeam, FTHG, FTAG, FTR, B365H, B365D, B365A
+    Target: H=0, D=1, A=2
 
     Args:
-        future_date: fecha de corte precalculada. Si None se calcula internamente.
-                     Pasar este valor evita recalcularlo en cada llamada del loop.
+        engine: "stream" (una pasada, O(n)), "vectorized" (rolling agrupado de
+                pandas, sin bucle por partido) o "scan" (implementación original
+                O(n²), se conserva como referencia para comparar resultados).
+        after:  si se indica, solo se generan filas para partidos posteriores a
+                esa fecha (el historial anterior se usa solo como contexto).
+                Solo con engine "stream".
     """
-    if future_date is None:
-        future_date = df_history["Date"].max() + pd.Timedelta(days=1)
+    if engine not in _ENGINES:
+        raise ValueError(f"Engine desconocido: '{engine}'. Opciones: {sorted(_ENGINES)}")
+    df = _prepare_history(df)
+    if after is not None:
+        if engine != "stream":
+            raise ValueError("build_features(after=...) solo está soportado con engine='stream'")
+        return _split_features(_build_stream(df, after=pd.Timestamp(after)))
+    return _split_features(_ENGINES[engine](df))
+
+
+def build_form_snapshot(df_history: pd.DataFrame) -> dict[str, dict]:
+    """Forma más reciente de cada equipo tras todo el historial, en una pasada.
+
+    Equivale a llamar _team_stats / _role_stats con future_date posterior al
+    último partido, pero para todos los equipos a la vez. Retorna
+    {equipo: {col: valor}} con las columnas de la tabla team_form_snapshot
+    (ver _FORM_COLS en infrastructure/persistence/team_form_repository.py).
+    """
+    form = _RollingForm()
+    for m in df_history.itertuples(index=False):
+        form.push(m.HomeTeam, m.AwayTeam, m.FTHG, m.FTAG, m.FTR)
+
+    snapshot = {}
+    for team in form.teams():
+        home_rol = form.role_stats(team, "home")
+        away_rol = form.role_stats(team, "away")
+        snapshot[team] = {
+            **form.team_stats(team),
+            "home_role_gf5":  home_rol["role_gf5"],
+            "home_role_ga5":  home_rol["role_ga5"],
+            "home_role_pts5": home_rol["role_pts5"],
+            "away_role_gf5":  away_rol["role_gf5"],
+            "away_role_ga5":  away_rol["role_ga5"],
+            "away_role_pts5": away_rol["role_pts5"],
+        }
+    return snapshot
 
-    hs      = _team_stats(home, future_date, df_history)
-    aws     = _team_stats(away, future_date, df_history)
-    hs_rol  = _role_stats(home, "home", future_date, df_history)
-    aws_rol = _role_stats(away, "away", future_date, df_history)
-    h2h     = _h2h_from_api_doc(home, h2h_doc)
 
+def _match_feature_row(
+    hs: dict, aws: dict, hs_rol: dict, aws_rol: dict,
+    odd_h: float, odd_d: float, odd_a: float, h2h: dict,
+) -> dict:
     def _v(val, fallback):
         return val if not pd.isna(val) else fallback
 
-    return pd.DataFrame([{
+    return {
         "home_gf5":       _v(hs["gf5"],   1.5),
         "home_ga5":       _v(hs["ga5"],   1.5),
         "home_pts5":      _v(hs["pts5"],  1.0),
@@ -262,4 +588,89 @@ def build_match_features(
         "odd_d": odd_d if odd_d else 3.3,
         "odd_a": odd_a if odd_a else 2.5,
         **h2h,
-    }])
+    }
+
+
+def build_match_features(
+    home: str,
+    away: str,
+    odd_h: float,
+    odd_d: float,
+    odd_a: float,
+    df_history: pd.DataFrame,
+    h2h_doc: dict | None = None,
+    future_date=None,
+) -> pd.DataFrame:
+    """Construye features para un partido futuro (de Betplay) usando el historial.
+
+    Args:
+        future_date: fecha de corte precalculada. Si None se calcula internamente.
+                     Pasar este valor evita recalcularlo en cada llamada del loop.
+    """
+    if future_date is None:
+        future_date = df_history["Date"].max() + pd.Timedelta(days=1)
+
+    hs      = _team_stats(home, future_date, df_history)
+    aws     = _team_stats(away, future_date, df_history)
+    hs_rol  = _role_stats(home, "home", future_date, df_history)
+    aws_rol = _role_stats(away, "away", future_date, df_history)
+    h2h     = _h2h_from_api_doc(home, h2h_doc)
+    return pd.DataFrame([_match_feature_row(hs, aws, hs_rol, aws_rol, odd_h, odd_d, odd_a, h2h)])
+
+
+def _snapshot_team(entry: dict) -> dict:
+    return {k: entry.get(k, np.nan) for k in
+            ("gf5", "ga5", "pts5", "home_gf5", "home_ga5", "away_gf5", "away_ga5")}
+
+
+def _snapshot_role(entry: dict, role: str) -> dict:
+    return {
+        "role_gf5":  entry.get(f"{role}_role_gf5", np.nan),
+        "role_ga5":  entry.get(f"{role}_role_ga5", np.nan),
+        "role_pts5": entry.get(f"{role}_role_pts5", np.nan),
+    }
+
+
+def _snapshot_row(
+    home: str, away: str, odd_h: float, odd_d: float, odd_a: float,
+    snapshot: dict[str, dict], h2h_doc: dict | None,
+) -> dict:
+    hs  = snapshot.get(home, {})
+    aws = snapshot.get(away, {})
+    return _match_feature_row(
+        _snapshot_team(hs), _snapshot_team(aws),
+        _snapshot_role(hs, "home"), _snapshot_role(aws, "away"),
+        odd_h, odd_d, odd_a, _h2h_from_api_doc(home, h2h_doc),
+    )
+
+
+def build_match_features_from_snapshot(
+    home: str,
+    away: str,
+    odd_h: float,
+    odd_d: float,
+    odd_a: float,
+    snapshot: dict[str, dict],
+    h2h_doc: dict | None = None,
+) -> pd.DataFrame:
+    """Igual que build_match_features pero con búsquedas O(1) en el snapshot de forma.
+
+    Un equipo ausente del snapshot recibe los mismos valores por defecto que
+    un equipo sin partidos en el historial.
+    """
+    return pd.DataFrame([_snapshot_row(home, away, odd_h, odd_d, odd_a, snapshot, h2h_doc)])
+
+
+def build_fixtures_features(fixtures: list[dict], snapshot: dict[str, dict]) -> pd.DataFrame:
+    """Matriz de features de una jornada completa a partir del snapshot.
+
+    Cada fixture es un dict con home, away, odd_h, odd_d, odd_a y h2h_doc
+    (opcional). Retorna una fila por fixture, en el mismo orden.
+    """
+    return pd.DataFrame([
+        _snapshot_row(
+            f["home"], f["away"], f["odd_h"], f["odd_d"], f["odd_a"],
+            snapshot, f.get("h2h_doc"),
+        )
+        for f in fixtures
+    ])
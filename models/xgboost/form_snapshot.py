@@ -0,0 +1,24 @@
+import logging
+
+from infrastructure.persistence.team_form_repository import TeamFormRepository
+from models.xgboost.data_loader import load_historical_matches
+from models.xgboost.feature_engineer import build_form_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def refresh(db_name: str) -> dict[str, dict]:
+    """Recalcula y persiste el snapshot de forma de la liga a partir del historial."""
+    df_history = load_historical_matches(db_name)
+    snapshot = build_form_snapshot(df_history)
+    TeamFormRepository(db_name).replace(snapshot)
+    return snapshot
+
+
+def load(db_name: str) -> dict[str, dict]:
+    """Carga el snapshot persistido; si aún no existe lo calcula y lo guarda."""
+    snapshot = TeamFormRepository(db_name).load()
+    if snapshot:
+        return snapshot
+    logger.info("Snapshot de forma inexistente para %s — calculándolo desde el historial", db_name)
+    return refresh(db_name)
@@ -1,16 +1,26 @@
+import json
 import os
-import joblib
 import numpy as np
 import pandas as pd
-from xgboost import XGBClassifier
-from sklearn.isotonic import IsotonicRegression
-from sklearn.preprocessing import label_binarize
-from sklearn.metrics import accuracy_score, log_loss
 
 MODEL_PATH = "models/xgboost/saved/xgb_1x2.pkl"
 
+# Formato compacto: booster nativo (UBJSON) + calibradores como arrays de umbrales
+NATIVE_EXT = ".ubj"
+CALIBRATION_SUFFIX = ".calib.json"
+
 LABELS = {0: "Local", 1: "Empate", 2: "Visitante"}
 
+# Hiperparámetros por defecto; train_xgboost --tune busca alternativas y las
+# guarda en los metadatos del registro ("params")
+DEFAULT_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 4,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+}
+
 
 class XGBoostResult:
     """
@@ -20,18 +30,19 @@ class XGBoostResult:
     conjunto de calibración separado para evitar el efecto de "probabilidades planas".
     """
 
-    def __init__(self):
+    def __init__(self, params: dict | None = None):
+        # xgboost se importa aquí y no a nivel de módulo: importar el predictor
+        # (o main.py) no debe cargar la librería hasta que se use un modelo
+        from xgboost import XGBClassifier
+
         self.clf = XGBClassifier(
-            n_estimators=300,
-            max_depth=4,
-            learning_rate=0.05,
-            subsample=0.8,
-            colsample_bytree=0.8,
+            **{**DEFAULT_PARAMS, **(params or {})},
             eval_metric="mlogloss",
             random_state=42,
             n_jobs=-1,
         )
-        self._calibrators = None  # lista de IsotonicRegression por clase
+        self._calibrators = None  # lista de (x_thresholds, y_thresholds) por clase
+        self._booster = None  # xgboost.Booster nativo cuando se carga desde .ubj
 
     def fit(
         self,
@@ -47,43 +58,72 @@ class XGBoostResult:
         Esto corrige la tendencia de XGBoost a producir probabilidades "planas"
         muy cercanas a las frecuencias base del entrenamiento.
         """
+        from sklearn.isotonic import IsotonicRegression
+        from sklearn.preprocessing import label_binarize
+
         self.clf.fit(X, y, sample_weight=sample_weight)
+        self._booster = None
 
         if X_cal is not None and y_cal is not None:
             raw_proba = self.clf.predict_proba(X_cal)          # (n, 3)
             y_bin = label_binarize(y_cal, classes=[0, 1, 2])   # (n, 3)
 
-            self._calibrators = []
+            calibrators = []
             for i in range(3):
                 iso = IsotonicRegression(out_of_bounds="clip")
                 iso.fit(raw_proba[:, i], y_bin[:, i])
-                self._calibrators.append(iso)
+                calibrators.append(iso)
+            self._calibrators = _as_thresholds(calibrators)
 
             print("  📐 Probabilidades calibradas con regresión isotónica")
 
         return self
 
+    def _raw_proba(self, X: pd.DataFrame) -> np.ndarray:
+        """Probabilidades sin calibrar; usa el booster nativo si el modelo se cargó de .ubj."""
+        if self._booster is not None:
+            return self._booster.inplace_predict(X)
+        return self.clf.predict_proba(X)
+
     def _calibrated_proba(self, raw: np.ndarray) -> np.ndarray:
-        """Aplica calibración isotónica y renormaliza a suma 1."""
+        """Aplica calibración isotónica y renormaliza a suma 1.
+
+        La isotónica con out_of_bounds="clip" es una interpolación lineal entre
+        sus umbrales, así que basta np.interp sobre los arrays guardados.
+        """
         if self._calibrators is None:
             return raw
-        cal = np.array([self._calibrators[i].predict(raw[:, i]) for i in range(3)]).T
+        cal = np.array([np.interp(raw[:, i], xs, ys) for i, (xs, ys) in enumerate(self._calibrators)]).T
         totals = cal.sum(axis=1, keepdims=True)
         totals = np.where(totals == 0, 1, totals)
         return cal / totals
 
     def predict(self, X: pd.DataFrame) -> dict:
         """Retorna probabilidades {home_win, draw, away_win} para una fila de features."""
-        raw   = self.clf.predict_proba(X)
-        proba = self._calibrated_proba(raw)[0]
-        return {
-            "home_win": round(float(proba[0]), 4),
-            "draw":     round(float(proba[1]), 4),
-            "away_win": round(float(proba[2]), 4),
-        }
-
-    def evaluate(self, X: pd.DataFrame, y: pd.Series):
-        raw    = self.clf.predict_proba(X)
+        return self.predict_batch(X)[0]
+
+    def predict_batch(self, X: pd.DataFrame) -> list[dict]:
+        """Probabilidades calibradas para todas las filas de X en una sola llamada.
+
+        Un único predict_proba + una pasada de calibradores para toda la matriz;
+        retorna una lista de dicts {home_win, draw, away_win} en el orden de X.
+        """
+        if X.empty:
+            return []
+        proba = self._calibrated_proba(self._raw_proba(X))
+        return [
+            {
+                "home_win": round(float(h), 4),
+                "draw":     round(float(d), 4),
+                "away_win": round(float(a), 4),
+            }
+            for h, d, a in proba
+        ]
+
+    def evaluate(self, X: pd.DataFrame, y: pd.Series) -> dict:
+        from sklearn.metrics import accuracy_score, log_loss
+
+        raw    = self._raw_proba(X)
         probas = self._calibrated_proba(raw)
         preds  = probas.argmax(axis=1)
         acc = accuracy_score(y, preds)
@@ -91,10 +131,24 @@ class XGBoostResult:
         print(f"  Accuracy : {acc*100:.1f}%")
         print(f"  Log-loss : {ll:.4f}")
         print(f"  Partidos test: {len(y)}")
+        return {"accuracy": float(acc), "log_loss": float(ll), "test_rows": int(len(y))}
 
     def save(self, path: str = MODEL_PATH):
+        """Guarda el modelo. Con extensión .ubj usa el formato compacto nativo;
+        cualquier otra ruta usa el pickle de joblib (formato original).
+        """
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        joblib.dump({"clf": self.clf, "calibrators": self._calibrators}, path)
+        if path.endswith(NATIVE_EXT):
+            booster = self._booster or self.clf.get_booster()
+            booster.save_model(path)
+            calib = None if self._calibrators is None else [
+                {"x": xs.tolist(), "y": ys.tolist()} for xs, ys in self._calibrators
+            ]
+            with open(path + CALIBRATION_SUFFIX, "w") as f:
+                json.dump({"calibrators": calib}, f)
+        else:
+            import joblib
+            joblib.dump({"clf": self.clf, "calibrators": self._calibrators}, path)
         print(f"✅ Modelo guardado en '{path}'")
 
     def load(self, path: str = MODEL_PATH) -> "XGBoostResult":
@@ -102,12 +156,39 @@ class XGBoostResult:
             raise RuntimeError(
                 f"Modelo no encontrado en '{path}'. Ejecuta: uv run python train_xgboost.py"
             )
+        if path.endswith(NATIVE_EXT):
+            return self._load_native(path)
+
+        import joblib
         data = joblib.load(path)
         # Compatibilidad con modelo guardado antes de la calibración
         if isinstance(data, dict):
             self.clf = data["clf"]
-            self._calibrators = data.get("calibrators")
+            self._calibrators = _as_thresholds(data.get("calibrators"))
         else:
             self.clf = data
             self._calibrators = None
+        self._booster = None
         return self
+
+    def _load_native(self, path: str) -> "XGBoostResult":
+        from xgboost import Booster
+
+        self._booster = Booster(model_file=path)
+        with open(path + CALIBRATION_SUFFIX) as f:
+            calib = json.load(f)["calibrators"]
+        self._calibrators = None if calib is None else [
+            (np.asarray(c["x"], dtype=float), np.asarray(c["y"], dtype=float)) for c in calib
+        ]
+        return self
+
+
+def _as_thresholds(calibrators) -> list[tuple[np.ndarray, np.ndarray]] | None:
+    """IsotonicRegression ajustadas (o pickles antiguos) → [(x_thresholds, y_thresholds)]."""
+    if calibrators is None:
+        return None
+    return [
+        c if isinstance(c, tuple) else
+        (np.asarray(c.X_thresholds_, dtype=float), np.asarray(c.y_thresholds_, dtype=float))
+        for c in calibrators
+    ]
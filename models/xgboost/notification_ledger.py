@@ -0,0 +1,124 @@
+"""
+Dedup de notificaciones del predictor.
+
+Cada pick notificado se identifica por (event_id, market, pick) y cuenta como
+enviado durante un TTL. La fuente de verdad es la tabla notification_ledger
+(sobrevive a reinicios y se comparte entre workers); delante hay una caché en
+memoria cuyos vencimientos se ordenan en un heap, así purgar es sacar del tope
+del heap en vez de recorrer todas las claves.
+
+claim() solo reserva el pick por LEASE; la cola de salida llama a settle()
+cuando termina el envío: si se entregó se extiende al TTL, si no se libera.
+settle() recuerda el expires_at de cada reserva propia aunque haya vencido en
+la caché, así la tabla se actualiza igual.
+Si el proceso muere con picks en cola, la reserva vence sola y otra corrida
+los vuelve a notificar.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from infrastructure.persistence.notification_ledger_repository import LedgerKey, NotificationLedgerRepository
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 3600  # s entre purgas de filas vencidas en la tabla
+LEASE = timedelta(minutes=15)  # reserva de un pick mientras espera en la cola de salida
+
+
+class NotificationLedger:
+    def __init__(self, ttl: timedelta, repo: NotificationLedgerRepository | None = None):
+        self.ttl = ttl
+        self.repo = repo or NotificationLedgerRepository()
+        self._expires: dict[LedgerKey, datetime] = {}
+        self._heap: list[tuple[datetime, LedgerKey]] = []
+        # Reservas propias pendientes de settle(); no se purgan al vencer en la caché
+        self._leases: dict[LedgerKey, datetime] = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _remember(self, key: LedgerKey, expires: datetime) -> None:
+        self._expires[key] = expires
+        heapq.heappush(self._heap, (expires, key))
+
+    def _evict_expired(self, now: datetime) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            expires, key = heapq.heappop(self._heap)
+            # Una clave renovada deja su entrada vieja en el heap: solo se borra la vigente
+            if self._expires.get(key) == expires:
+                del self._expires[key]
+
+    def claim(self, keys: list[LedgerKey]) -> list[LedgerKey]:
+        """Reserva (por LEASE) los picks no notificados dentro del TTL; retorna los reservados.
+
+        Si PostgreSQL no responde se decide solo con la caché en memoria. El
+        lock solo cubre la caché: las consultas corren fuera de él.
+        """
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._evict_expired(now)
+            candidates = [k for k in dict.fromkeys(keys) if k not in self._expires]
+        if not candidates:
+            return []
+
+        try:
+            claimed = self.repo.claim_many(candidates, LEASE)
+        except Exception as e:
+            logger.warning("notification_ledger no disponible — dedup solo en memoria: %s", e)
+            claimed, others = None, {}
+        else:
+            # claim_many ya hizo commit: si falla esta lectura, los no reclamados
+            # siguen siendo de otro worker y solo se dejan de cachear
+            try:
+                others = self.repo.expiries([k for k in candidates if k not in claimed])
+            except Exception as e:
+                logger.warning("No se pudo leer el vencimiento de picks ya notificados: %s", e)
+                others = {}
+
+        with self._lock:
+            if claimed is None:
+                # Sin tabla la caché es el único árbitro: otro hilo pudo reservar mientras tanto
+                claimed = {k: now + LEASE for k in candidates if k not in self._expires}
+            for key, expires in {**others, **claimed}.items():
+                self._remember(key, expires)
+            self._leases.update(claimed)
+            purge = time.monotonic() - self._last_purge >= PURGE_INTERVAL
+            if purge:
+                self._last_purge = time.monotonic()
+        if purge:
+            self._purge()
+        return [k for k in candidates if k in claimed]
+
+    def settle(self, keys: list[LedgerKey], delivered: bool) -> None:
+        """Cierra la reserva de `keys`: la extiende al TTL si se entregaron, si no la libera.
+
+        La tabla se actualiza siempre para todas las `keys`, aunque la reserva ya
+        haya vencido en memoria; solo la caché depende de `_expires`.
+        """
+        with self._lock:
+            claims = {k: self._leases.pop(k, None) for k in dict.fromkeys(keys)}
+            if delivered:
+                expires = datetime.now(timezone.utc) + self.ttl
+                for key in claims:
+                    if key in self._expires:
+                        self._remember(key, expires)
+            else:
+                for key in claims:
+                    self._expires.pop(key, None)
+        try:
+            if delivered:
+                self.repo.confirm_many(claims, self.ttl)
+            else:
+                self.repo.release_many(claims)
+        except Exception as e:
+            # La reserva vence sola tras LEASE: en el peor caso se repite o se demora un aviso
+            logger.warning("No se pudo %s la reserva en notification_ledger: %s",
+                           "confirmar" if delivered else "liberar", e)
+
+    def _purge(self) -> None:
+        try:
+            self.repo.purge_expired()
+        except Exception as e:
+            logger.warning("No se pudo purgar notification_ledger: %s", e)
@@ -0,0 +1,302 @@
+"""
+Plugins de notificación del predictor: explicación (Groq), card (matplotlib)
+y envío por Telegram.
+
+enqueue no envía nada: encola el render del card y deja la explicación y el
+envío a la cola de salida (notification_queue), así el job del predictor
+termina en cuanto sus picks están en cola.
+
+Todo se importa de forma perezosa: el predictor solo carga este módulo cuando
+hay un value bet que notificar, así una corrida sin notificaciones (o el
+arranque de main.py) no paga el import de matplotlib, groq ni del cliente de
+Telegram.
+"""
+import html
+import logging
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+RESULT_KEYS = ["home_win", "draw", "away_win"]
+
+DAYS_ES = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+MONTHS_ES = ["", "Ene", "Feb", "Mar", "Abr", "May", "Jun",
+             "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+COL_OFFSET = timedelta(hours=-5)
+
+
+def _format_date(iso_date: str) -> str:
+    try:
+        dt = datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
+        dt = dt + COL_OFFSET
+        day = DAYS_ES[dt.weekday()]
+        month = MONTHS_ES[dt.month]
+        return f"{day} {dt.day} {month} · {dt.strftime('%H:%M')} Col"
+    except Exception:
+        return iso_date
+
+
+def outbox():
+    from infrastructure.telegram.notification_queue import get_queue
+
+    return get_queue()
+
+
+def explain_many(picks: list[tuple]) -> list:
+    """Explicaciones diferidas de los picks de una ronda [(home, away, winner_key, X, h2h_doc)]:
+    primero Groq y, si no responde, reglas sobre las features.
+
+    Retorna una función sin argumentos por pick. La primera que se evalúe pide
+    a Groq (caché + una petición en lote) las explicaciones de toda la ronda;
+    las demás solo leen el resultado.
+    """
+    results: list[str] | None = None
+    lock = threading.Lock()
+
+    def _resolve() -> list[str]:
+        nonlocal results
+        with lock:
+            if results is None:
+                from infrastructure.groq.groq_client import generate_match_explanations
+
+                results = generate_match_explanations([
+                    {
+                        "home": home, "away": away, "winner_key": winner_key,
+                        "stats": {col: X[col].iloc[0] for col in X.columns},
+                        "h2h_summary": h2h_doc.get("summary") if h2h_doc else None,
+                    }
+                    for home, away, winner_key, X, h2h_doc in picks
+                ])
+            return results
+
+    def _explanation(i: int):
+        def _get() -> str:
+            try:
+                text = _resolve()[i]
+            except Exception as e:
+                logger.warning("Explicaciones Groq no disponibles: %s", e)
+                text = ""
+            return text or _rule_based_explanation(*picks[i])
+        return _get
+
+    return [_explanation(i) for i in range(len(picks))]
+
+
+def _rule_based_explanation(home: str, away: str, winner_key: str, X, h2h_doc: dict | None) -> str:
+    reasons = []
+
+    home_pts = X["home_pts5"].iloc[0]
+    away_pts = X["away_pts5"].iloc[0]
+    home_gf  = X["home_gf5"].iloc[0]
+    away_gf  = X["away_gf5"].iloc[0]
+    home_ga  = X["home_ga5"].iloc[0]
+    away_ga  = X["away_ga5"].iloc[0]
+
+    home_role_pts = X["home_role_pts5"].iloc[0]
+    away_role_pts = X["away_role_pts5"].iloc[0]
+    home_role_gf  = X["home_role_gf5"].iloc[0]
+    away_role_gf  = X["away_role_gf5"].iloc[0]
+    home_role_ga  = X["home_role_ga5"].iloc[0]
+    away_role_ga  = X["away_role_ga5"].iloc[0]
+
+    if winner_key == "home_win":
+        if home_role_pts > away_role_pts + 0.3:
+            reasons.append(
+                f"{home} suma {home_role_pts:.1f} pts/partido como local, "
+                f"frente a {away_role_pts:.1f} de {away} como visitante"
+            )
+        elif home_pts > away_pts + 0.3:
+            reasons.append(
+                f"{home} llega con mejor forma general "
+                f"({home_pts:.1f} pts/partido vs {away_pts:.1f} de {away})"
+            )
+        if home_role_gf > away_role_ga + 0.2:
+            reasons.append(
+                f"su ataque en casa ({home_role_gf:.1f} goles/partido) "
+                f"supera la defensa de {away} fuera ({away_role_ga:.1f} concedidos)"
+            )
+        elif home_gf > away_ga + 0.2:
+            reasons.append(
+                f"su ataque ({home_gf:.1f} goles/partido) "
+                f"supera la defensa visitante ({away_ga:.1f} concedidos)"
+            )
+
+    elif winner_key == "away_win":
+        if away_role_pts > home_role_pts + 0.3:
+            reasons.append(
+                f"{away} suma {away_role_pts:.1f} pts/partido como visitante, "
+                f"frente a {home_role_pts:.1f} de {home} como local"
+            )
+        elif away_pts > home_pts + 0.3:
+            reasons.append(
+                f"{away} llega con mejor forma general "
+                f"({away_pts:.1f} pts/partido vs {home_pts:.1f} de {home})"
+            )
+        if away_role_gf > home_role_ga + 0.2:
+            reasons.append(
+                f"su ataque fuera ({away_role_gf:.1f} goles/partido) "
+                f"supera la defensa de {home} en casa ({home_role_ga:.1f} concedidos)"
+            )
+        elif away_gf > home_ga + 0.2:
+            reasons.append(
+                f"su ataque ({away_gf:.1f} goles/partido) "
+                f"supera la defensa local ({home_ga:.1f} concedidos)"
+            )
+
+    else:  # draw
+        if abs(home_role_pts - away_role_pts) <= 0.4:
+            reasons.append(
+                f"ambos equipos muestran una forma muy pareja en su rol "
+                f"({home_role_pts:.1f} vs {away_role_pts:.1f} pts/partido)"
+            )
+        elif abs(home_pts - away_pts) <= 0.4:
+            reasons.append(
+                f"ambos equipos presentan una forma muy similar "
+                f"({home_pts:.1f} vs {away_pts:.1f} pts/partido)"
+            )
+        avg_role_gf = (home_role_gf + away_role_gf) / 2
+        if avg_role_gf < 1.4:
+            reasons.append("sus encuentros en estos roles suelen ser disputados y de pocos goles")
+        elif (home_gf + away_gf) / 2 < 1.4:
+            reasons.append("sus encuentros suelen ser disputados y de pocos goles")
+
+    if h2h_doc and h2h_doc.get("matches"):
+        summary = h2h_doc.get("summary", {})
+        total   = summary.get("total", 0)
+        if total >= 3:
+            if winner_key == "home_win":
+                wins = summary.get("home_team_wins", 0)
+                if wins / total >= 0.4:
+                    reasons.append(f"historial favorable: ganó {wins} de {total} enfrentamientos directos")
+            elif winner_key == "away_win":
+                wins = summary.get("away_team_wins", 0)
+                if wins / total >= 0.4:
+                    reasons.append(f"historial favorable: ganó {wins} de {total} enfrentamientos directos")
+            else:
+                draws = summary.get("draws", 0)
+                if draws / total >= 0.33:
+                    reasons.append(f"{int(draws * 100 / total)}% de sus encuentros previos terminaron en empate")
+
+    if not reasons:
+        reasons.append("el modelo detecta ventaja combinando forma reciente, H2H y cuotas de mercado")
+
+    return " · ".join(reasons)
+
+
+_GRADIENT = ["🟥", "🟧", "🟨", "🟨", "🟩", "🟩", "🟦", "🟦"]
+
+
+def _bar(prob: float, width: int = 8, is_value: bool = False, market: bool = False) -> str:
+    filled = round(prob * width)
+    if market:
+        blocks = ["⬛"] * filled
+    elif is_value:
+        blocks = ["🟩"] * filled
+    else:
+        blocks = [_GRADIENT[i] for i in range(min(filled, width))]
+    return "".join(blocks) + "⬜" * (width - filled)
+
+
+def render_card(partido: str, fecha: str, liga: str, pred: dict, labels: dict,
+                odds: dict, fair: dict, value_bets: list = None,
+                league_logo_url: str | None = None):
+    """Encola el render del card en el hilo de card_generator; retorna un Future."""
+    from infrastructure.telegram.card_generator import submit_match_card
+
+    return submit_match_card(
+        partido, _format_date(fecha), liga,
+        pred, labels, odds, fair, value_bets, league_logo_url,
+    )
+
+
+def _message_text(partido: str, fecha: str, liga: str, pred: dict, labels: dict,
+                  odds: dict, fair: dict, value_bets: list = None) -> str:
+    """Mensaje HTML completo, usado cuando no se puede generar el card."""
+    SEP  = "━━━━━━━━━━━━━━━━━━━━━━━━━"
+    SEP2 = "┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄"
+    is_value = bool(value_bets)
+
+    EMOJIS = {"home_win": "🏠", "draw": "🤝", "away_win": "✈️"}
+    vb_set = {label for label, *_ in (value_bets or [])}
+
+    def _fmt_odd(o):  return f"<code>{o:.2f}</code>" if o else "<code>—</code>"
+    def _fmt_fair(f): return f"{f*100:.0f}%" if f else "—"
+
+    header = "🔥 <b>VALUE BET DETECTADO</b>" if is_value else "📋 <b>Análisis de partido</b>"
+
+    lines = [
+        header,
+        SEP,
+        f"⚽ <b>{html.escape(partido)}</b>",
+        f"📅 {_format_date(fecha)}",
+        f"🏆 {html.escape(liga)}",
+        SEP,
+    ]
+
+    for key in RESULT_KEYS:
+        label   = labels[key]
+        model_p = pred[key]
+        fair_p  = fair[key]
+        odd     = odds[key]
+        is_vb   = label in vb_set and odd
+        bar     = _bar(model_p, is_value=is_vb)
+
+        bar_market = _bar(fair_p, market=True) if fair_p else "⬜" * 8
+
+        lines.append(f"{EMOJIS[key]} <b>{html.escape(label)}</b>")
+        lines.append(f"   {bar}  <b>{model_p*100:.0f}%</b>  modelo")
+        lines.append(f"   {bar_market}  <b>{_fmt_fair(fair_p)}</b>  betplay  {_fmt_odd(odd)}")
+        if is_vb:
+            edge = (model_p * odd - 1) * 100
+            lines.append(f"   ✅ <b>Edge: +{edge:.0f}%</b>")
+        lines.append("")
+
+    if value_bets:
+        lines += [SEP2, "💰 <b>Apuesta recomendada</b>"]
+        for label, prob, odd, _ in value_bets:
+            edge = (prob * odd - 1) * 100
+            lines.append(
+                f"   🎯 <b>{html.escape(label)}</b>  ·  @<b>{odd:.2f}</b>"
+                f"  ·  modelo <b>{prob*100:.0f}%</b>  ·  edge <b>+{edge:.0f}%</b>"
+            )
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def _caption_html(explanation: str) -> str:
+    """Caption HTML de la explicación.
+
+    Se recorta el texto plano al límite de Telegram (que cuenta el texto
+    visible, sin etiquetas) y después se escapa y se envuelve en <i>, así
+    ni el corte ni el contenido del LLM pueden romper el HTML del álbum.
+    """
+    from infrastructure.telegram.telegram_notifier import CAPTION_LIMIT
+
+    prefix = "💡 "
+    room = CAPTION_LIMIT - len(prefix) - 1
+    if len(explanation) > room:
+        explanation = explanation[:room - 1].rstrip() + "…"
+    return f"{prefix}<i>{html.escape(explanation, quote=False)}</i>"
+
+
+def enqueue(queue, partido: str, fecha: str, liga: str, pred: dict, labels: dict,
+            odds: dict, fair: dict, value_bets: list = None,
+            league_logo_url: str | None = None, explanation=None, on_done=None) -> None:
+    """Encola card + explicación en la cola de salida; `explanation` es una
+    función sin argumentos que se evalúa en el worker de la cola y `on_done`
+    recibe si la notificación se entregó."""
+    from infrastructure.telegram.notification_queue import Notification
+
+    if not queue.enabled:
+        return
+    queue.put(Notification(
+        label=partido,
+        text=_message_text(partido, fecha, liga, pred, labels, odds, fair, value_bets),
+        card=render_card(partido, fecha, liga, pred, labels, odds, fair, value_bets, league_logo_url),
+        caption=(lambda: _caption_html(explanation())) if explanation else None,
+        on_done=on_done,
+    ))
+    logger.debug("Notificación encolada para '%s'", partido)
@@ -1,4 +1,5 @@
 VALUE_THRESHOLD = 0.05  # diferencia mínima para considerar value bet
+MIN_ODD = 1.6           # cuota mínima (exclusiva) para recomendar la apuesta
 
 
 def implied_prob(odd: float) -> float | None:
@@ -23,3 +24,13 @@ def detect_value(model_prob: float, odd: float) -> bool:
     """Retorna True si la probabilidad del modelo supera la implícita en al menos VALUE_THRESHOLD."""
     impl = implied_prob(odd)
     return impl is not None and model_prob - impl >= VALUE_THRESHOLD
+
+
+def is_value_bet(model_prob: float, fair_prob: float | None, odd: float | None) -> bool:
+    """Regla de value bet del predictor: ventaja sobre la probabilidad justa (sin
+    margen) de al menos VALUE_THRESHOLD y cuota mayor que MIN_ODD."""
+    return (
+        fair_prob is not None
+        and model_prob - fair_prob >= VALUE_THRESHOLD
+        and bool(odd) and odd > MIN_ODD
+    )
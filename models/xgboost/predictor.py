@@ -1,15 +1,12 @@
 import logging
 from datetime import datetime, timezone, timedelta
+from functools import partial
 
-import pandas as pd
-
-from models.xgboost.data_loader import load_historical_matches, load_matches
-from models.xgboost.odds_utils import devig, VALUE_THRESHOLD
-from models.xgboost.feature_engineer import build_match_features
-from models.xgboost.model import XGBoostResult
-from infrastructure.telegram.telegram_notifier import TelegramNotifier
-from infrastructure.telegram.card_generator import generate_match_card
-from infrastructure.groq.groq_client import generate_match_explanation
+from models.xgboost import form_snapshot, registry
+from models.xgboost.notification_ledger import NotificationLedger
+from models.xgboost.data_loader import load_matches
+from models.xgboost.odds_utils import devig, is_value_bet
+from models.xgboost.feature_engineer import build_fixtures_features
 from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
 from application.football_data_org.h2h_service import H2HService
 
@@ -17,25 +14,10 @@ logger = logging.getLogger(__name__)
 
 RESULT_KEYS = ["home_win", "draw", "away_win"]
 
+# Un pick ya notificado no se repite en 12 h (también tras reinicios: ver NotificationLedger)
 _NOTIFICATION_INTERVAL = timedelta(hours=12)
-_last_notified: dict[str, datetime] = {}
-
-DAYS_ES = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
-MONTHS_ES = ["", "Ene", "Feb", "Mar", "Abr", "May", "Jun",
-             "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-
-COL_OFFSET = timedelta(hours=-5)
-
-
-def _format_date(iso_date: str) -> str:
-    try:
-        dt = datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
-        dt = dt + COL_OFFSET
-        day = DAYS_ES[dt.weekday()]
-        month = MONTHS_ES[dt.month]
-        return f"{day} {dt.day} {month} · {dt.strftime('%H:%M')} Col"
-    except Exception:
-        return iso_date
+_MARKET = "1X2"
+_ledger = NotificationLedger(_NOTIFICATION_INTERVAL)
 
 
 def _minutes_until(fecha: str) -> float | None:
@@ -51,13 +33,13 @@ def run(db_name: str):
     logger.info("=== Predictor XGBoost — %s ===", db_name)
 
     try:
-        df_history = load_historical_matches(db_name)
+        snapshot = form_snapshot.load(db_name)
     except RuntimeError as e:
         logger.error("XGBoost no disponible — sin datos históricos: %s", e)
         return
 
     try:
-        model = XGBoostResult().load()
+        model = registry.load(db_name)
     except RuntimeError as e:
         logger.error("No se pudo cargar el modelo: %s", e)
         return
@@ -72,16 +54,18 @@ def run(db_name: str):
 
     logger.info("Partidos a evaluar: %d", len(df_matches))
 
-    # Precalcular future_date una sola vez para todos los partidos del loop
-    future_date = df_history["Date"].max() + pd.Timedelta(days=1)
-
-    notifier = TelegramNotifier()
     h2h_service = H2HService(db_name)
     league_logo_url = LeaguesConfigRepository().get_logo_url(db_name)
 
-    value_bets_total = 0
-
-    for _, match in df_matches.iterrows():
+    # ── Fase 1: features de todos los partidos ────────────────────────────
+    matches  = df_matches.to_dict("records")
+    # Sin esperar al warm-up de H2H en segundo plano: lo que aún no esté en
+    # caché entra sin H2H y se usa en el siguiente ciclo
+    h2h_docs = h2h_service.get_h2h_many(
+        [(int(m["id"]), m["home_team"], m["away_team"]) for m in matches], wait=False,
+    )
+    fixtures = []
+    for match in matches:
         home = match["home_team"]
         away = match["away_team"]
 
@@ -93,9 +77,27 @@ def run(db_name: str):
                      home, away,
                      odd_1 or 0, odd_x or 0, odd_2 or 0)
 
-        h2h_doc = h2h_service.get_h2h(int(match["id"]), home, away)
-        X = build_match_features(home, away, odd_1, odd_x, odd_2, df_history, h2h_doc, future_date)
-        pred = model.predict(X)
+        fixtures.append({
+            "home": home, "away": away,
+            "odd_h": odd_1, "odd_d": odd_x, "odd_a": odd_2,
+            "h2h_doc": h2h_docs[int(match["id"])],
+        })
+    X_all = build_fixtures_features(fixtures, snapshot)
+
+    # ── Fase 2: una sola inferencia para toda la matriz ───────────────────
+    preds = model.predict_batch(X_all)
+
+    # ── Fase 3: value bets y notificaciones ───────────────────────────────
+    value_bets_total = 0
+    pending = []  # value bets candidatos a notificar, en orden
+
+    for i, (match, fixture, pred) in enumerate(zip(matches, fixtures, preds)):
+        home    = fixture["home"]
+        away    = fixture["away"]
+        odd_1   = fixture["odd_h"]
+        odd_x   = fixture["odd_d"]
+        odd_2   = fixture["odd_a"]
+        h2h_doc = fixture["h2h_doc"]
 
         labels = {"home_win": home, "draw": "Empate", "away_win": away}
         odds   = {"home_win": odd_1, "draw": odd_x, "away_win": odd_2}
@@ -113,224 +115,66 @@ def run(db_name: str):
         )
 
         value_bets = []
+        picks = []
         for key in RESULT_KEYS:
             prob     = pred[key]
             fair_p   = fair[key]
             odd      = odds[key]
-            is_value = fair_p is not None and prob - fair_p >= VALUE_THRESHOLD
-            if is_value and odd and odd > 1.6:
+            if is_value_bet(prob, fair_p, odd):
                 edge = (prob * odd - 1) * 100
                 logger.info("VALUE BET detectado — %s [%s]: modelo=%.1f%% fair=%.1f%% cuota=%.2f edge=+%.0f%%",
                             match["partido"], labels[key],
                             prob * 100, fair_p * 100, odd, edge)
                 value_bets.append((labels[key], prob, odd, fair_p))
+                picks.append((int(match["id"]), _MARKET, key))
                 value_bets_total += 1
 
         if not value_bets:
             continue
 
-        partido_key = match["partido"]
-        now = datetime.now(timezone.utc)
-        last = _last_notified.get(partido_key)
-        if last and now - last < _NOTIFICATION_INTERVAL:
-            logger.debug("Notificación omitida para '%s' (dentro del intervalo de %s)", partido_key, _NOTIFICATION_INTERVAL)
-            continue
+        pending.append((i, match, pred, labels, odds, fair, value_bets, h2h_doc, picks))
 
-        winner_key = max(pred, key=pred.get)
-        stats = {col: X[col].iloc[0] for col in X.columns}
-        h2h_summary = h2h_doc.get("summary") if h2h_doc else None
-        explanation = generate_match_explanation(home, away, winner_key, stats, h2h_summary)
-        if not explanation:
-            explanation = _generate_explanation(home, away, winner_key, X, h2h_doc)
-        _notify(notifier, match["partido"], match.get("fecha_evento", ""), match.get("liga", ""),
-                pred, labels, explanation, odds, fair, value_bets, league_logo_url)
-        _last_notified[partido_key] = now
-        # Purgar entradas expiradas para evitar crecimiento ilimitado
-        for k in [k for k, v in _last_notified.items() if now - v >= _NOTIFICATION_INTERVAL]:
-            del _last_notified[k]
+    if pending:
+        # Plugins de notificación: solo se importan si hay algo que enviar.
+        # Render, explicación y envío corren fuera de este hilo (cola de salida)
+        from models.xgboost import notifications
+        outbox = notifications.outbox()
+        if outbox.enabled:
+            _notify(notifications, outbox, pending, X_all, league_logo_url)
+        else:
+            # Sin Telegram no se reclama nada: el pick no debe contar como notificado
+            logger.debug("Telegram deshabilitado — %d notificaciones omitidas", len(pending))
 
     logger.info("Predictor finalizado — %d value bets detectados en %d partidos",
                 value_bets_total, len(df_matches))
 
 
-def _generate_explanation(home: str, away: str, winner_key: str, X, h2h_doc: dict | None) -> str:
-    reasons = []
-
-    home_pts = X["home_pts5"].iloc[0]
-    away_pts = X["away_pts5"].iloc[0]
-    home_gf  = X["home_gf5"].iloc[0]
-    away_gf  = X["away_gf5"].iloc[0]
-    home_ga  = X["home_ga5"].iloc[0]
-    away_ga  = X["away_ga5"].iloc[0]
-
-    home_role_pts = X["home_role_pts5"].iloc[0]
-    away_role_pts = X["away_role_pts5"].iloc[0]
-    home_role_gf  = X["home_role_gf5"].iloc[0]
-    away_role_gf  = X["away_role_gf5"].iloc[0]
-    home_role_ga  = X["home_role_ga5"].iloc[0]
-    away_role_ga  = X["away_role_ga5"].iloc[0]
-
-    if winner_key == "home_win":
-        if home_role_pts > away_role_pts + 0.3:
-            reasons.append(
-                f"{home} suma {home_role_pts:.1f} pts/partido como local, "
-                f"frente a {away_role_pts:.1f} de {away} como visitante"
-            )
-        elif home_pts > away_pts + 0.3:
-            reasons.append(
-                f"{home} llega con mejor forma general "
-                f"({home_pts:.1f} pts/partido vs {away_pts:.1f} de {away})"
-            )
-        if home_role_gf > away_role_ga + 0.2:
-            reasons.append(
-                f"su ataque en casa ({home_role_gf:.1f} goles/partido) "
-                f"supera la defensa de {away} fuera ({away_role_ga:.1f} concedidos)"
-            )
-        elif home_gf > away_ga + 0.2:
-            reasons.append(
-                f"su ataque ({home_gf:.1f} goles/partido) "
-                f"supera la defensa visitante ({away_ga:.1f} concedidos)"
-            )
-
-    elif winner_key == "away_win":
-        if away_role_pts > home_role_pts + 0.3:
-            reasons.append(
-                f"{away} suma {away_role_pts:.1f} pts/partido como visitante, "
-                f"frente a {home_role_pts:.1f} de {home} como local"
-            )
-        elif away_pts > home_pts + 0.3:
-            reasons.append(
-                f"{away} llega con mejor forma general "
-                f"({away_pts:.1f} pts/partido vs {home_pts:.1f} de {home})"
-            )
-        if away_role_gf > home_role_ga + 0.2:
-            reasons.append(
-                f"su ataque fuera ({away_role_gf:.1f} goles/partido) "
-                f"supera la defensa de {home} en casa ({home_role_ga:.1f} concedidos)"
-            )
-        elif away_gf > home_ga + 0.2:
-            reasons.append(
-                f"su ataque ({away_gf:.1f} goles/partido) "
-                f"supera la defensa local ({home_ga:.1f} concedidos)"
-            )
-
-    else:  # draw
-        if abs(home_role_pts - away_role_pts) <= 0.4:
-            reasons.append(
-                f"ambos equipos muestran una forma muy pareja en su rol "
-                f"({home_role_pts:.1f} vs {away_role_pts:.1f} pts/partido)"
-            )
-        elif abs(home_pts - away_pts) <= 0.4:
-            reasons.append(
-                f"ambos equipos presentan una forma muy similar "
-                f"({home_pts:.1f} vs {away_pts:.1f} pts/partido)"
-            )
-        avg_role_gf = (home_role_gf + away_role_gf) / 2
-        if avg_role_gf < 1.4:
-            reasons.append("sus encuentros en estos roles suelen ser disputados y de pocos goles")
-        elif (home_gf + away_gf) / 2 < 1.4:
-            reasons.append("sus encuentros suelen ser disputados y de pocos goles")
-
-    if h2h_doc and h2h_doc.get("matches"):
-        summary = h2h_doc.get("summary", {})
-        total   = summary.get("total", 0)
-        if total >= 3:
-            if winner_key == "home_win":
-                wins = summary.get("home_team_wins", 0)
-                if wins / total >= 0.4:
-                    reasons.append(f"historial favorable: ganó {wins} de {total} enfrentamientos directos")
-            elif winner_key == "away_win":
-                wins = summary.get("away_team_wins", 0)
-                if wins / total >= 0.4:
-                    reasons.append(f"historial favorable: ganó {wins} de {total} enfrentamientos directos")
-            else:
-                draws = summary.get("draws", 0)
-                if draws / total >= 0.33:
-                    reasons.append(f"{int(draws * 100 / total)}% de sus encuentros previos terminaron en empate")
-
-    if not reasons:
-        reasons.append("el modelo detecta ventaja combinando forma reciente, H2H y cuotas de mercado")
-
-    return " · ".join(reasons)
-
-
-_GRADIENT = ["🟥", "🟧", "🟨", "🟨", "🟩", "🟩", "🟦", "🟦"]
-
-
-def _bar(prob: float, width: int = 8, is_value: bool = False, market: bool = False) -> str:
-    filled = round(prob * width)
-    if market:
-        blocks = ["⬛"] * filled
-    elif is_value:
-        blocks = ["🟩"] * filled
-    else:
-        blocks = [_GRADIENT[i] for i in range(min(filled, width))]
-    return "".join(blocks) + "⬜" * (width - filled)
-
-
-def _notify(notifier: TelegramNotifier, partido: str, fecha: str, liga: str, pred: dict,
-            labels: dict, explanation: str, odds: dict, fair: dict,
-            value_bets: list = None, league_logo_url: str | None = None):
-    SEP  = "━━━━━━━━━━━━━━━━━━━━━━━━━"
-    SEP2 = "┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄"
-    is_value = bool(value_bets)
-
-    EMOJIS = {"home_win": "🏠", "draw": "🤝", "away_win": "✈️"}
-    vb_set = {label for label, *_ in (value_bets or [])}
-
-    def _fmt_odd(o):  return f"<code>{o:.2f}</code>" if o else "<code>—</code>"
-    def _fmt_fair(f): return f"{f*100:.0f}%" if f else "—"
-
-    header = "🔥 <b>VALUE BET DETECTADO</b>" if is_value else "📋 <b>Análisis de partido</b>"
-
-    lines = [
-        header,
-        SEP,
-        f"⚽ <b>{partido}</b>",
-        f"📅 {_format_date(fecha)}",
-        f"🏆 {liga}",
-        SEP,
-    ]
-
-    for key in RESULT_KEYS:
-        label   = labels[key]
-        model_p = pred[key]
-        fair_p  = fair[key]
-        odd     = odds[key]
-        is_vb   = label in vb_set and odd
-        bar     = _bar(model_p, is_value=is_vb)
-
-        bar_market = _bar(fair_p, market=True) if fair_p else "⬜" * 8
-
-        lines.append(f"{EMOJIS[key]} <b>{label}</b>")
-        lines.append(f"   {bar}  <b>{model_p*100:.0f}%</b>  modelo")
-        lines.append(f"   {bar_market}  <b>{_fmt_fair(fair_p)}</b>  betplay  {_fmt_odd(odd)}")
-        if is_vb:
-            edge = (model_p * odd - 1) * 100
-            lines.append(f"   ✅ <b>Edge: +{edge:.0f}%</b>")
-        lines.append("")
-
-    if value_bets:
-        lines += [SEP2, "💰 <b>Apuesta recomendada</b>"]
-        for label, prob, odd, _ in value_bets:
-            edge = (prob * odd - 1) * 100
-            lines.append(
-                f"   🎯 <b>{label}</b>  ·  @<b>{odd:.2f}</b>"
-                f"  ·  modelo <b>{prob*100:.0f}%</b>  ·  edge <b>+{edge:.0f}%</b>"
-            )
-        lines.append("")
+def _notify(notifications, outbox, pending: list, X_all, league_logo_url: str | None) -> None:
+    """Reclama en el ledger los picks de `pending` y encola los partidos reclamados.
 
-    try:
-        card_bytes = generate_match_card(
-            partido, _format_date(fecha), liga,
-            pred, labels, odds, fair, value_bets, league_logo_url,
-        )
-        notifier.send_photo_bytes(card_bytes)
-    except Exception as e:
-        logger.warning("No se pudo generar el card — usando texto: %s", e)
-        notifier.send("\n".join(lines))
+    Se notifica si algún pick del partido no se notificó dentro del intervalo.
+    La reserva se confirma o se libera cuando la cola termina el envío.
+    """
+    claimed = []
+    for i, match, pred, labels, odds, fair, value_bets, h2h_doc, picks in pending:
+        keys = _ledger.claim(picks)
+        if not keys:
+            logger.debug("Notificación omitida para '%s' (dentro del intervalo de %s)",
+                         match["partido"], _NOTIFICATION_INTERVAL)
+            continue
+        claimed.append((i, match, pred, labels, odds, fair, value_bets, h2h_doc, keys))
+    if not claimed:
         return
 
-    # Explicación como mensaje de texto independiente
-    notifier.send(f"💡 <i>{explanation}</i>")
-    logger.debug("Notificación enviada para '%s'", partido)
+    # Una sola petición a Groq (en lote, con caché) para toda la ronda
+    explanations = notifications.explain_many([
+        (labels["home_win"], labels["away_win"], max(pred, key=pred.get), X_all.iloc[[i]], h2h_doc)
+        for i, _, pred, labels, _, _, _, h2h_doc, _ in claimed
+    ])
+    for (i, match, pred, labels, odds, fair, value_bets, h2h_doc, keys), explanation in zip(claimed, explanations):
+        notifications.enqueue(
+            outbox, match["partido"], match.get("fecha_evento", ""), match.get("liga", ""),
+            pred, labels, odds, fair, value_bets, league_logo_url,
+            explanation=explanation, on_done=partial(_ledger.settle, keys),
+        )
+    logger.info("%d notificaciones encoladas", len(claimed))
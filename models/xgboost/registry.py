@@ -0,0 +1,169 @@
+"""
+Registro de modelos XGBoost por liga.
+
+Estructura en disco:
+  REGISTRY_DIR/<league_db>/<version>/model.ubj   booster nativo + model.ubj.calib.json
+                                                 (versiones antiguas: model.pkl)
+  REGISTRY_DIR/<league_db>/<version>/meta.json   métricas, features, filas de entrenamiento
+  REGISTRY_DIR/<league_db>/LATEST                versión publicada
+  REGISTRY_DIR/<league_db>/FAILED                error del último reentrenamiento
+                                                 (se borra al publicar)
+
+La publicación es atómica: la versión se escribe en un directorio temporal,
+se renombra y solo al final se reemplaza LATEST con os.replace. Los modelos
+cargados se guardan en una caché LRU del proceso; como la clave incluye la
+versión, publicar una nueva (aunque sea desde otro proceso) la invalida.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from models.xgboost.model import MODEL_PATH, XGBoostResult
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models/xgboost/saved")
+MODEL_FILE = "model.ubj"
+LEGACY_MODEL_FILE = "model.pkl"
+META_FILE = "meta.json"
+LATEST_FILE = "LATEST"
+FAILED_FILE = "FAILED"
+
+# Versiones que se conservan por liga (las más antiguas se eliminan al publicar)
+KEEP_VERSIONS = 3
+# Modelos cargados que se mantienen en memoria
+CACHE_SIZE = 8
+
+_cache: "OrderedDict[tuple[str, str], XGBoostResult]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _league_dir(league_db: str) -> str:
+    return os.path.join(REGISTRY_DIR, league_db)
+
+
+def latest_version(league_db: str) -> str | None:
+    """Versión publicada de la liga, o None si nunca se ha publicado."""
+    try:
+        with open(os.path.join(_league_dir(league_db), LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def mark_failed(league_db: str, error: str) -> None:
+    """Registra que el último reentrenamiento de la liga falló."""
+    root = _league_dir(league_db)
+    try:
+        os.makedirs(root, exist_ok=True)
+        with open(os.path.join(root, FAILED_FILE), "w") as f:
+            f.write(f"{datetime.now().isoformat()} {error}")
+    except OSError as e:
+        logger.warning("No se pudo registrar el fallo de entrenamiento de %s: %s", league_db, e)
+
+
+def last_training_failed(league_db: str) -> bool:
+    """True si el último reentrenamiento falló y no se ha publicado una versión después."""
+    return os.path.exists(os.path.join(_league_dir(league_db), FAILED_FILE))
+
+
+def list_versions(league_db: str) -> list[str]:
+    """Versiones completas en disco, de la más antigua a la más reciente."""
+    root = _league_dir(league_db)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        v for v in os.listdir(root)
+        if os.path.isfile(os.path.join(root, v, META_FILE))
+    )
+
+
+def metadata(league_db: str, version: str | None = None) -> dict:
+    """Metadatos (meta.json) de una versión; por defecto la publicada."""
+    version = version or latest_version(league_db)
+    if version is None:
+        return {}
+    with open(os.path.join(_league_dir(league_db), version, META_FILE)) as f:
+        return json.load(f)
+
+
+def publish(league_db: str, model: XGBoostResult, meta: dict) -> str:
+    """Guarda una nueva versión del modelo de la liga y la marca como publicada."""
+    version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    root = _league_dir(league_db)
+    os.makedirs(root, exist_ok=True)
+
+    tmp_dir = os.path.join(root, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    try:
+        model.save(os.path.join(tmp_dir, MODEL_FILE))
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump({"league_db": league_db, "version": version, **meta}, f, indent=2, default=str)
+        os.replace(tmp_dir, os.path.join(root, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    latest_tmp = os.path.join(root, f".{LATEST_FILE}.tmp")
+    with open(latest_tmp, "w") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    try:
+        os.remove(os.path.join(root, FAILED_FILE))
+    except FileNotFoundError:
+        pass
+
+    _invalidate(league_db)
+    _prune(league_db, keep=version)
+    logger.info("Modelo publicado — %s versión %s", league_db, version)
+    return version
+
+
+def load(league_db: str, version: str | None = None) -> XGBoostResult:
+    """Retorna el modelo de la liga (por defecto la versión publicada) desde la caché LRU.
+
+    Si la liga no tiene versiones en el registro se usa el modelo legado
+    MODEL_PATH. Lanza RuntimeError si tampoco existe.
+    """
+    version = version or latest_version(league_db)
+    if version is None:
+        logger.warning("Sin modelo registrado para %s — usando modelo legado '%s'", league_db, MODEL_PATH)
+        key, path = (league_db, "legacy"), MODEL_PATH
+    else:
+        key, path = (league_db, version), _model_path(league_db, version)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    model = XGBoostResult().load(path)
+
+    with _cache_lock:
+        _cache[key] = model
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return model
+
+
+def _model_path(league_db: str, version: str) -> str:
+    version_dir = os.path.join(_league_dir(league_db), version)
+    native = os.path.join(version_dir, MODEL_FILE)
+    return native if os.path.exists(native) else os.path.join(version_dir, LEGACY_MODEL_FILE)
+
+
+def _invalidate(league_db: str) -> None:
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == league_db]:
+            del _cache[key]
+
+
+def _prune(league_db: str, keep: str) -> None:
+    for old in list_versions(league_db)[:-KEEP_VERSIONS]:
+        if old != keep:
+            shutil.rmtree(os.path.join(_league_dir(league_db), old), ignore_errors=True)
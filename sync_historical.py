@@ -9,6 +9,7 @@ import sys
 
 from application.football_data.football_data_service import FootballDataService
 from infrastructure.persistence.leagues_config_repository import LeaguesConfigRepository
+from models.xgboost import form_snapshot
 
 
 def main():
@@ -24,6 +25,9 @@ def main():
         else:
             service.sync()
 
+        snapshot = form_snapshot.refresh(league['league_db'])
+        print(f"  📈 Snapshot de forma: {len(snapshot)} equipos")
+
 
 if __name__ == "__main__":
     main()
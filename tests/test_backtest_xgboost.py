@@ -0,0 +1,67 @@
+"""Folds walk-forward y métricas del backtest."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_xgboost import evaluate_predictions, walk_forward_folds
+
+
+def test_walk_forward_folds_train_on_all_previous_seasons():
+    seasons = pd.Series(["2122", "2021", "2223", "2021", "2324", "2122", "2324"])
+
+    folds = walk_forward_folds(seasons, min_train=2)
+
+    assert [s for s, _, _ in folds] == ["2223", "2324"]
+    _, train, test = folds[0]
+    assert train.tolist() == [0, 1, 3, 5]
+    assert test.tolist() == [2]
+    _, train, test = folds[1]
+    assert train.tolist() == [0, 1, 2, 3, 5]
+    assert test.tolist() == [4, 6]
+
+
+def test_walk_forward_folds_need_enough_seasons():
+    assert walk_forward_folds(pd.Series(["2021", "2122", "2223"])) == []
+
+
+def _pred(h, d, a):
+    return {"home_win": h, "draw": d, "away_win": a}
+
+
+def test_evaluate_predictions_metrics_and_value_bets():
+    preds = [_pred(0.7, 0.2, 0.1), _pred(0.2, 0.3, 0.5), _pred(0.3, 0.4, 0.3)]
+    # Cuotas sin margen: la probabilidad justa es 1/cuota
+    X_test = pd.DataFrame({
+        "odd_h": [2.0, 4.0, 2.0],
+        "odd_d": [4.0, 4.0, 4.0],
+        "odd_a": [4.0, 2.0, 4.0],
+    })
+    y_test = pd.Series([0, 1, 2])
+
+    report = evaluate_predictions(preds, X_test, y_test)
+
+    assert report["matches"] == 3
+    assert report["accuracy"] == pytest.approx(1 / 3, abs=1e-4)
+    expected_ll = -np.mean(np.log([0.7, 0.3, 0.3]))
+    assert report["log_loss"] == pytest.approx(expected_ll, abs=1e-4)
+    expected_brier = np.mean([0.09 + 0.04 + 0.01, 0.04 + 0.49 + 0.25, 0.09 + 0.16 + 0.49])
+    assert report["brier"] == pytest.approx(expected_brier, abs=1e-4)
+
+    # Value bets: local 0.70 vs 0.50 @2.0 (gana), visitante 0.50 vs 0.50 no,
+    # empate 0.40 vs 0.25 @4.0 (pierde: ganó el visitante)
+    assert (report["bets"], report["hits"]) == (2, 1)
+    assert report["profit"] == pytest.approx(0.0)
+    assert report["roi"] == pytest.approx(0.0)
+    assert report["hit_rate"] == pytest.approx(0.5)
+    assert sum(b["count"] for b in report["reliability"]) == 9
+
+
+def test_evaluate_predictions_without_bets():
+    preds = [_pred(0.5, 0.25, 0.25)]
+    X_test = pd.DataFrame({"odd_h": [2.0], "odd_d": [4.0], "odd_a": [4.0]})
+
+    report = evaluate_predictions(preds, X_test, pd.Series([0]))
+
+    assert report["bets"] == 0
+    assert report["roi"] is None and report["hit_rate"] is None
+    assert report["profit"] == 0
@@ -0,0 +1,83 @@
+"""Matriz de features en disco: reutilización, extensión incremental y reconstrucción."""
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from models.xgboost import feature_cache
+from models.xgboost.feature_engineer import build_features
+from tests.test_feature_engineer import _history
+
+LEAGUE = "test_league"
+
+
+@pytest.fixture
+def builds(tmp_path, monkeypatch):
+    """CACHE_DIR temporal; registra con qué argumentos se llamó a build_features."""
+    monkeypatch.setattr(feature_cache, "CACHE_DIR", str(tmp_path))
+    calls = []
+
+    def counting_build(df, **kwargs):
+        calls.append(kwargs)
+        return build_features(df, **kwargs)
+    monkeypatch.setattr(feature_cache, "build_features", counting_build)
+    return calls
+
+
+def _rows(X, y, seasons) -> pd.DataFrame:
+    # El orden de los partidos de una misma fecha no está definido: se compara como conjunto
+    rows = X.assign(result=y.to_numpy(), season=seasons.astype(str).to_numpy())
+    return rows.sort_values(list(rows.columns)).reset_index(drop=True)
+
+
+def _assert_matches_full_build(df, X, y, seasons):
+    expected = _rows(*build_features(df, engine="stream"))
+    assert_frame_equal(_rows(X, y, seasons), expected, check_dtype=False)
+
+
+def test_unchanged_history_is_served_from_disk(builds):
+    df = _history()
+    X1, _, _ = feature_cache.load_or_build(LEAGUE, df)
+    # Otro orden de filas con la misma fecha no cambia la huella
+    X2, _, _ = feature_cache.load_or_build(LEAGUE, df.sample(frac=1, random_state=1))
+
+    assert len(builds) == 1
+    assert_frame_equal(X1, X2, check_dtype=False)
+
+
+def test_new_matches_are_appended_incrementally(builds):
+    full = _history(n_dates=40)
+    cutoff = pd.to_datetime(full["Date"], dayfirst=True) <= pd.Timestamp("2022-03-01")
+    feature_cache.load_or_build(LEAGUE, full[cutoff])
+
+    X, y, seasons = feature_cache.load_or_build(LEAGUE, full)
+
+    assert len(builds) == 2 and "after" in builds[1]
+    _assert_matches_full_build(full, X, y, seasons)
+    # La matriz extendida quedó guardada: una tercera llamada no calcula nada
+    feature_cache.load_or_build(LEAGUE, full)
+    assert len(builds) == 2
+
+
+def test_changed_history_forces_full_rebuild(builds):
+    df = _history()
+    feature_cache.load_or_build(LEAGUE, df)
+    edited = df.copy()
+    edited.loc[3, "FTHG"] += 1
+
+    X, y, seasons = feature_cache.load_or_build(LEAGUE, edited)
+
+    assert len(builds) == 2 and "after" not in builds[1]
+    _assert_matches_full_build(edited, X, y, seasons)
+
+
+def test_empty_stored_matrix_is_rebuilt_not_extended(builds):
+    # Con una sola fecha no hay partidos con historial previo: la matriz guardada queda vacía
+    full = _history(n_dates=30)
+    first = full[full["Date"] == full["Date"].iloc[0]]
+    X0, _, _ = feature_cache.load_or_build(LEAGUE, first)
+    assert X0.empty
+
+    X, y, seasons = feature_cache.load_or_build(LEAGUE, full)
+
+    assert "after" not in builds[-1]
+    _assert_matches_full_build(full, X, y, seasons)
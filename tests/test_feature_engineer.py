@@ -0,0 +1,94 @@
+"""Paridad de los engines de build_features contra la implementación original ("scan")."""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from models.xgboost.feature_engineer import build_features
+
+TEAMS = ["Arsenal", "Chelsea", "Everton", "Fulham", "Leeds", "Wolves"]
+
+
+def _history(n_dates: int = 40, seed: int = 7) -> pd.DataFrame:
+    """Historial sintético: varias jornadas por fecha (partidos el mismo día)
+    y parejas que se repiten muchas veces (H2H con más de H2H_WINDOW partidos)."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    start = pd.Timestamp("2021-08-01")
+    for d in range(n_dates):
+        date = start + pd.Timedelta(days=7 * d)
+        teams = list(rng.permutation(TEAMS))
+        for home, away in zip(teams[0::2], teams[1::2]):
+            fthg, ftag = rng.integers(0, 4, size=2)
+            rows.append({
+                "Date":     date.strftime("%d/%m/%Y"),
+                "HomeTeam": home,
+                "AwayTeam": away,
+                "FTHG":     int(fthg),
+                "FTAG":     int(ftag),
+                "FTR":      "H" if fthg > ftag else ("A" if fthg < ftag else "D"),
+                "B365H":    round(float(rng.uniform(1.3, 5.0)), 2),
+                "B365D":    round(float(rng.uniform(2.8, 4.5)), 2),
+                "B365A":    round(float(rng.uniform(1.3, 6.0)), 2),
+                "season":   "2122" if d < 20 else "2223",
+            })
+    return pd.DataFrame(rows)
+
+
+def _assert_same(engine: str, df: pd.DataFrame) -> None:
+    X_ref, y_ref, s_ref = build_features(df, engine="scan")
+    X, y, s = build_features(df, engine=engine)
+    assert len(X_ref) > 0
+    assert_frame_equal(X.reset_index(drop=True), X_ref.reset_index(drop=True), check_dtype=False)
+    assert_series_equal(y.reset_index(drop=True), y_ref.reset_index(drop=True), check_dtype=False)
+    assert_series_equal(s.reset_index(drop=True), s_ref.reset_index(drop=True), check_dtype=False)
+
+
+def test_stream_after_matches_tail_of_full_build():
+    df = _history()
+    X_full, y_full, _ = build_features(df, engine="stream")
+    cutoff = pd.Timestamp("2022-03-01")
+    X_new, y_new, _ = build_features(df, engine="stream", after=cutoff)
+
+    dates = pd.to_datetime(df["Date"], dayfirst=True)
+    assert 0 < len(X_new) < len(X_full)
+    assert len(X_new) <= (dates > cutoff).sum()
+    assert_frame_equal(X_new.reset_index(drop=True),
+                       X_full.tail(len(X_new)).reset_index(drop=True))
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        build_features(_history(5), engine="loop")
+
+
+def _history_with_edge_cases() -> pd.DataFrame:
+    """Goles NaN (marcador no registrado) y equipos con dos partidos en la misma
+    fecha, incluido el primer partido de un equipo recién llegado."""
+    df = _history()
+    df.loc[[9, 31, 58], ["FTHG", "FTAG"]] = np.nan
+    extra = []
+    for date, home, away, fthg, ftag in [
+        ("05/09/2021", "Arsenal", "Chelsea", 2, 1),   # fecha con partidos de los mismos equipos
+        ("05/09/2021", "Arsenal", "Everton", 0, 0),
+        ("12/12/2021", "Burnley", "Leeds", 1, 3),      # debut de Burnley: dos partidos el mismo día
+        ("12/12/2021", "Wolves", "Burnley", np.nan, 2),
+        ("19/12/2021", "Burnley", "Fulham", 1, 1),
+        ("26/12/2021", "Chelsea", "Burnley", 0, 2),
+    ]:
+        extra.append({
+            "Date": date, "HomeTeam": home, "AwayTeam": away, "FTHG": fthg, "FTAG": ftag,
+            "FTR": "D" if pd.isna(fthg) else ("H" if fthg > ftag else ("A" if fthg < ftag else "D")),
+            "B365H": 2.1, "B365D": 3.3, "B365A": 3.4, "season": "2122",
+        })
+    return pd.concat([df, pd.DataFrame(extra)], ignore_index=True)
+
+
+@pytest.mark.parametrize("engine", ["stream", "vectorized"])
+def test_engines_match_scan(engine):
+    _assert_same(engine, _history())
+
+
+@pytest.mark.parametrize("engine", ["stream", "vectorized"])
+def test_engines_match_scan_with_nan_goals_and_same_date_games(engine):
+    _assert_same(engine, _history_with_edge_cases())
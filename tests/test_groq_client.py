@@ -0,0 +1,75 @@
+"""Claves de caché y parseo de la respuesta en lote de Groq."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from infrastructure.groq import groq_client
+from infrastructure.groq.groq_client import _STAT_KEYS, _complete_batch, cache_key
+
+STATS = {k: 1.234 + i for i, k in enumerate(_STAT_KEYS)}
+
+
+class FakeGroq:
+    def __init__(self, content: str):
+        self.content = content
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture(autouse=True)
+def no_throttle(monkeypatch):
+    monkeypatch.setattr(groq_client, "_throttle", lambda: None)
+
+
+def _match(home, away, winner="home_win"):
+    return {"home": home, "away": away, "winner_key": winner, "stats": STATS, "h2h_summary": None}
+
+
+def test_cache_key_ignores_small_stat_changes():
+    nudged = {k: v + 0.01 for k, v in STATS.items()}
+    assert cache_key("Arsenal", "Chelsea", "home_win", STATS) == cache_key("Arsenal", "Chelsea", "home_win", nudged)
+
+    moved = {**STATS, "home_pts5": STATS["home_pts5"] + 0.5}
+    assert cache_key("Arsenal", "Chelsea", "home_win", STATS) != cache_key("Arsenal", "Chelsea", "home_win", moved)
+
+
+def test_cache_key_depends_on_teams_winner_and_h2h():
+    base = cache_key("Arsenal", "Chelsea", "home_win", STATS)
+    assert base != cache_key("Chelsea", "Arsenal", "home_win", STATS)
+    assert base != cache_key("Arsenal", "Chelsea", "draw", STATS)
+
+    h2h = {"total": 5, "home_team_wins": 3, "draws": 1, "away_team_wins": 1}
+    assert base != cache_key("Arsenal", "Chelsea", "home_win", STATS, h2h)
+    # Con menos de 3 partidos el H2H no entra en el prompt ni en la clave
+    assert base == cache_key("Arsenal", "Chelsea", "home_win", STATS, {**h2h, "total": 2})
+
+
+def test_complete_batch_maps_answers_by_match_number():
+    content = json.dumps({"explicaciones": [
+        {"partido": 2, "texto": "  Segundo.  "},
+        {"partido": "1", "texto": "Primero."},
+        {"partido": "x", "texto": "Ignorado."},
+    ]})
+    client = FakeGroq(content)
+
+    texts = _complete_batch(client, [_match("A", "B"), _match("C", "D"), _match("E", "F", "draw")])
+
+    assert texts == ["Primero.", "Segundo.", ""]
+    request = client.requests[0]
+    assert request["response_format"] == {"type": "json_object"}
+    assert "Partido 3: E vs F" in request["messages"][1]["content"]
+
+
+def test_complete_batch_without_explanations_returns_empty_texts():
+    assert _complete_batch(FakeGroq("{}"), [_match("A", "B"), _match("C", "D")]) == ["", ""]
+
+
+def test_complete_batch_invalid_json_raises():
+    with pytest.raises(json.JSONDecodeError):
+        _complete_batch(FakeGroq("no es json"), [_match("A", "B"), _match("C", "D")])
@@ -0,0 +1,140 @@
+"""Reserva y cierre de picks en NotificationLedger con un repositorio en memoria."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.xgboost import notification_ledger
+from models.xgboost.notification_ledger import LEASE, NotificationLedger
+
+TTL = timedelta(hours=12)
+K1, K2, K3 = (1, "1x2", "home_win"), (2, "1x2", "draw"), (3, "1x2", "away_win")
+
+
+class FakeRepo:
+    """Tabla notification_ledger en un dict; `down` simula PostgreSQL caído."""
+
+    def __init__(self):
+        self.rows: dict = {}
+        self.calls: list = []
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("sin conexión")
+
+    def claim_many(self, keys, ttl):
+        self._check()
+        now = datetime.now(timezone.utc)
+        claimed = {}
+        for key in keys:
+            if key not in self.rows or self.rows[key] <= now:
+                self.rows[key] = claimed[key] = now + ttl
+        return claimed
+
+    def expiries(self, keys):
+        self._check()
+        return {k: self.rows[k] for k in keys if k in self.rows}
+
+    def confirm_many(self, claims, ttl):
+        self._check()
+        self.calls.append(("confirm", dict(claims)))
+        for key, expires in claims.items():
+            if key in self.rows and expires in (None, self.rows[key]):
+                self.rows[key] = datetime.now(timezone.utc) + ttl
+
+    def release_many(self, claims):
+        self._check()
+        self.calls.append(("release", dict(claims)))
+        for key, expires in claims.items():
+            if key in self.rows and expires in (None, self.rows[key]):
+                del self.rows[key]
+
+    def purge_expired(self):
+        self.calls.append(("purge",))
+
+
+@pytest.fixture
+def repo():
+    return FakeRepo()
+
+
+def test_claim_reserves_each_pick_once(repo):
+    ledger = NotificationLedger(TTL, repo)
+
+    assert ledger.claim([K1, K2, K1]) == [K1, K2]
+    assert ledger.claim([K1, K2, K3]) == [K3]
+    # Otro worker (otra instancia) ve la reserva en la tabla
+    assert NotificationLedger(TTL, repo).claim([K1, K2]) == []
+
+
+def test_claim_lease_lasts_until_settled(repo):
+    before = datetime.now(timezone.utc)
+    NotificationLedger(TTL, repo).claim([K1])
+    assert before + LEASE <= repo.rows[K1] < before + TTL
+
+
+def test_delivered_settle_extends_to_ttl(repo):
+    ledger = NotificationLedger(TTL, repo)
+    ledger.claim([K1])
+    lease = repo.rows[K1]
+
+    ledger.settle([K1], delivered=True)
+
+    assert repo.calls[-1] == ("confirm", {K1: lease})
+    assert repo.rows[K1] > datetime.now(timezone.utc) + TTL - timedelta(minutes=1)
+    assert ledger.claim([K1]) == []
+
+
+def test_failed_settle_releases_the_pick(repo):
+    ledger = NotificationLedger(TTL, repo)
+    ledger.claim([K1])
+
+    ledger.settle([K1], delivered=False)
+
+    assert K1 not in repo.rows
+    assert ledger.claim([K1]) == [K1]
+
+
+def test_settle_after_lease_expired_in_memory_still_updates_table(repo):
+    ledger = NotificationLedger(TTL, repo)
+    ledger.claim([K1])
+    lease = repo.rows[K1]
+    # La reserva vence en la caché antes de que la cola termine el envío
+    ledger._evict_expired(lease + timedelta(seconds=1))
+    assert K1 not in ledger._expires
+
+    ledger.settle([K1], delivered=True)
+
+    assert repo.calls[-1] == ("confirm", {K1: lease})
+    assert repo.rows[K1] > lease
+
+
+def test_settle_of_unknown_key_is_passed_through(repo):
+    NotificationLedger(TTL, repo).settle([K2], delivered=False)
+    assert repo.calls[-1] == ("release", {K2: None})
+
+
+def test_expired_row_can_be_claimed_again(repo):
+    repo.rows[K1] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert NotificationLedger(TTL, repo).claim([K1]) == [K1]
+
+
+def test_database_down_falls_back_to_memory(repo):
+    repo.down = True
+    ledger = NotificationLedger(TTL, repo)
+
+    assert ledger.claim([K1]) == [K1]
+    assert ledger.claim([K1]) == []
+    ledger.settle([K1], delivered=False)   # no propaga el error
+    assert ledger.claim([K1]) == [K1]
+
+
+def test_purge_runs_at_most_once_per_interval(repo, monkeypatch):
+    ledger = NotificationLedger(TTL, repo)
+    ledger.claim([K1])
+    ledger.claim([K2])
+    assert repo.calls.count(("purge",)) == 1
+
+    monkeypatch.setattr(notification_ledger, "PURGE_INTERVAL", 0)
+    ledger.claim([K3])
+    assert repo.calls.count(("purge",)) == 2
@@ -0,0 +1,146 @@
+"""SQL de carga de historical_matches (COPY + staging) contra una conexión falsa."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from infrastructure.persistence import postgres_repository
+from infrastructure.persistence.postgres_config import PostgresConfig
+from infrastructure.persistence.postgres_repository import PostgresRepository
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.fail_on and self.conn.fail_on in sql:
+            raise RuntimeError("violación de clave única")
+        self.conn.statements.append((" ".join(sql.split()), params))
+        self.rowcount = self.conn.rowcount
+
+    def copy_expert(self, sql, buf):
+        self.conn.copies.append((" ".join(sql.split()), buf.read()))
+
+
+class FakeConnection:
+    def __init__(self, rowcount=0, fail_on=None):
+        self.rowcount = rowcount
+        self.fail_on = fail_on
+        self.statements = []
+        self.copies = []
+        self.committed = self.rolled_back = self.returned = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection(rowcount=3)
+    monkeypatch.setattr(PostgresConfig, "get_league_id", classmethod(lambda cls, db: 7))
+    monkeypatch.setattr(PostgresConfig, "get_connection", classmethod(lambda cls: conn))
+
+    def put(cls, c):
+        c.returned = True
+    monkeypatch.setattr(PostgresConfig, "put_connection", classmethod(put))
+    return conn
+
+
+def _matches() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Date":     ["12/08/23", "12/08/2023", "19/08/2023"],
+        "HomeTeam": ["Arsenal", "Arsenal", "Chelsea"],
+        "AwayTeam": ["Everton", "Everton", "Fulham"],
+        "FTHG":     [1.0, 2.0, np.nan],
+        "FTAG":     [0, 0, 1],
+        "FTR":      ["H", "H", None],
+        "B365H":    [1.5, 1.6, 2.1],
+        "B365D":    [4.0, 4.1, 3.3],
+        "B365A":    [6.0, 6.5, 3.6],
+        "season":   ["2324", "2324", "2324"],
+        "Referee":  ["x", "y", "z"],   # columna sin mapeo: se descarta
+    })
+
+
+def _copied(conn) -> pd.DataFrame:
+    (sql, data), = conn.copies
+    columns = sql[sql.index("(") + 1:sql.index(")")].split(", ")
+    return pd.read_csv(io.StringIO(data), names=columns, header=None, na_values=["\\N"], keep_default_na=False)
+
+
+def test_historical_frame_normalizes_dates_and_drops_duplicates(conn):
+    df = PostgresRepository("premier_league")._historical_frame(_matches())
+
+    assert list(df.columns) == ["league_id", *postgres_repository._HISTORICAL_COL_MAP.values()]
+    assert df["date"].tolist() == ["12/08/2023", "19/08/2023"]
+    # El partido repetido (dd/mm/yy y dd/mm/yyyy) queda una vez, con la última fila
+    assert df["fthg"].tolist()[0] == 2
+    assert df["fthg"].dtype == "Int64"
+    assert (df["league_id"] == 7).all()
+
+
+def test_full_load_copies_into_stage_and_skips_conflicts(conn):
+    ok, count = PostgresRepository("premier_league").save_dataframe_to_collection("historical_matches", _matches())
+
+    assert (ok, count) == (True, 3)
+    delete, create, insert = (sql for sql, _ in conn.statements)
+    assert delete.startswith("DELETE FROM historical_matches WHERE league_id = %s")
+    assert conn.statements[0][1] == (7,)
+    assert "CREATE TEMP TABLE historical_matches_stage ON COMMIT DROP" in create
+    assert insert.startswith("INSERT INTO historical_matches (league_id, date, home_team")
+    assert insert.endswith("ON CONFLICT (league_id, date, home_team, away_team) DO NOTHING")
+    assert conn.committed and conn.returned
+
+    sql, data = conn.copies[0]
+    assert sql.startswith("COPY historical_matches_stage (league_id, date")
+    # Enteros sin ".0" y NaN como marcador NULL de COPY
+    assert "7,12/08/2023,Arsenal,Everton,2,0,H,\\N,\\N,1.6," in data
+    copied = _copied(conn)
+    assert len(copied) == 2
+    assert not copied.duplicated(subset=["date", "home_team", "away_team"]).any()
+
+
+def test_full_load_without_clear_keeps_existing_rows(conn):
+    PostgresRepository("premier_league").save_dataframe_to_collection(
+        "historical_matches", _matches(), clear_collection=False,
+    )
+    assert not any(sql.startswith("DELETE") for sql, _ in conn.statements)
+
+
+def test_upsert_updates_only_changed_rows(conn):
+    changed = PostgresRepository("premier_league").upsert_historical_matches(_matches())
+
+    assert changed == 3
+    insert = conn.statements[-1][0]
+    assert "ON CONFLICT (league_id, date, home_team, away_team) DO UPDATE" in insert
+    assert "SET date" not in insert and "league_id = EXCLUDED.league_id" not in insert
+    assert "IS DISTINCT FROM" in insert
+    assert len(_copied(conn)) == 2
+
+
+def test_upsert_of_empty_frame_does_not_touch_the_database(conn):
+    assert PostgresRepository("premier_league").upsert_historical_matches(pd.DataFrame()) == 0
+    assert conn.statements == [] and not conn.committed
+
+
+def test_failed_load_rolls_back_and_reports_error(conn):
+    conn.fail_on = "INSERT INTO historical_matches"
+    ok, count = PostgresRepository("premier_league").save_dataframe_to_collection("historical_matches", _matches())
+
+    assert (ok, count) == (False, 0)
+    assert conn.rolled_back and not conn.committed and conn.returned
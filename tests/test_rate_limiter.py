@@ -0,0 +1,88 @@
+"""TokenBucket: ráfaga, recarga, reserva de turno y degradación a memoria."""
+import pytest
+
+from infrastructure import rate_limiter
+from infrastructure.persistence.postgres_config import PostgresConfig
+from infrastructure.rate_limiter import TokenBucket, get_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado: time.monotonic avanza solo con clock.advance o time.sleep."""
+    class Clock:
+        def __init__(self):
+            self.now = 1000.0
+            self.sleeps: list[float] = []
+
+        def advance(self, seconds: float) -> None:
+            self.now += seconds
+
+    c = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: c.now)
+
+    def sleep(seconds):
+        c.sleeps.append(seconds)
+        c.advance(seconds)
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleep)
+    return c
+
+
+def test_burst_up_to_capacity_then_denied(clock):
+    bucket = TokenBucket("test", rate=1.0, capacity=3)
+
+    assert all(bucket.acquire(block=False) for _ in range(3))
+    assert bucket.acquire(block=False) is False
+    assert clock.sleeps == []
+
+
+def test_refill_follows_rate_and_caps_at_capacity(clock):
+    bucket = TokenBucket("test", rate=0.5, capacity=2)
+    bucket.acquire(2, block=False)
+
+    clock.advance(2)
+    assert bucket.acquire(block=False)
+    assert not bucket.acquire(block=False)
+
+    clock.advance(3600)
+    assert bucket.acquire(2, block=False)
+    assert not bucket.acquire(block=False)
+
+
+def test_blocking_acquire_reserves_turns_in_order(clock):
+    bucket = TokenBucket("test", rate=2.0, capacity=1)
+
+    assert bucket.acquire()
+    assert bucket.acquire()
+    assert bucket.acquire()
+    # Cada llamada espera su turno: 0.5 s por token a 2 tokens/s
+    assert clock.sleeps == pytest.approx([0.5, 0.5])
+
+
+def test_denied_acquire_does_not_consume(clock):
+    bucket = TokenBucket("test", rate=1.0, capacity=1)
+    bucket.acquire()
+    assert not bucket.acquire(block=False)
+
+    clock.advance(1)
+    assert bucket.acquire(block=False)
+
+
+def test_postgres_backend_falls_back_to_memory(clock, monkeypatch):
+    def down(cls):
+        raise ConnectionError("sin conexión")
+    monkeypatch.setattr(PostgresConfig, "get_connection", classmethod(down))
+    bucket = TokenBucket("test", rate=1.0, capacity=2, backend="postgres")
+
+    assert bucket.acquire(block=False)
+    assert bucket.acquire(block=False)
+    assert not bucket.acquire(block=False)
+
+
+def test_get_limiter_shares_buckets_per_name_and_key(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+
+    assert get_limiter("telegram") is get_limiter("telegram")
+    chat_a, chat_b = get_limiter("telegram", key="a"), get_limiter("telegram", key="b")
+    assert chat_a is not chat_b
+    assert (chat_a.rate, chat_a.capacity) == rate_limiter.LIMITS["telegram"]
+    assert get_limiter("api_football").backend == "postgres"
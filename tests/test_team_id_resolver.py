@@ -0,0 +1,158 @@
+"""Orden de resolución de TeamIdResolver: tabla, listado, similitud, búsqueda y fallos."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from application.football_data_org import team_id_resolver
+from application.football_data_org.team_id_resolver import TeamIdResolver, name_key
+
+PL_TEAMS = [
+    {"id": 57, "name": "Arsenal FC", "shortName": "Arsenal"},
+    {"id": 61, "name": "Chelsea FC", "shortName": "Chelsea"},
+    {"id": 351, "name": "Nottingham Forest FC", "shortName": "Nottingham"},
+]
+
+
+class FakeRepo:
+    def __init__(self, rows=None, misses=None):
+        self.rows = dict(rows or {})
+        self.listed: set[str] = set()
+        self.misses = dict(misses or {})
+        self.saved: list = []
+        self.down = False
+
+    def load(self):
+        if self.down:
+            raise ConnectionError("sin conexión")
+        return dict(self.rows)
+
+    def listed_competitions(self):
+        return set(self.listed)
+
+    def load_misses(self, ttl):
+        return dict(self.misses)
+
+    def upsert_many(self, rows, source):
+        self.saved.append((source, rows))
+        for key, team_id, name, comp in rows:
+            self.rows[key] = (team_id, name, comp)
+
+    def save_miss(self, key, competition):
+        self.misses[key] = datetime.now()
+
+
+class FakeClient:
+    def __init__(self, found=None, fail=False):
+        self.found = found or {}
+        self.fail = fail
+        self.calls: list = []
+
+    def get_competition_teams(self, competition):
+        self.calls.append(("competition", competition))
+        return PL_TEAMS
+
+    def find_teams(self, name):
+        self.calls.append(("search", name))
+        if self.fail:
+            raise ConnectionError("timeout")
+        return self.found.get(name, [])
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    repo = FakeRepo()
+    monkeypatch.setattr(team_id_resolver, "TeamIdRepository", lambda: repo)
+    # El mapeo es por proceso (atributos de clase): cada test parte de cero
+    monkeypatch.setattr(TeamIdResolver, "_mapping", None)
+    monkeypatch.setattr(TeamIdResolver, "_listed", None)
+    monkeypatch.setattr(TeamIdResolver, "_misses", None)
+    return repo
+
+
+def test_name_key_normalizes_accents_punctuation_and_suffixes():
+    assert name_key("Atlético de Madrid") == "atletico de madrid"
+    assert name_key("Brighton & Hove Albion FC") == "brighton hove albion"
+    assert name_key("A.F.C. Bournemouth") == name_key("a f c bournemouth")
+
+
+def test_exact_match_in_table_needs_no_api_call(repo):
+    repo.rows = {"arsenal": (57, "Arsenal FC", "PL")}
+    client = FakeClient()
+
+    assert TeamIdResolver("PL", client).resolve("Arsenal") == 57
+    assert client.calls == []
+
+
+def test_competition_listing_is_loaded_once(repo):
+    client = FakeClient()
+
+    assert TeamIdResolver("PL", client).resolve("Chelsea") == 61
+    assert TeamIdResolver("PL", client).resolve("Arsenal FC") == 57
+    assert client.calls == [("competition", "PL")]
+    assert repo.saved[0][0] == "listing"
+
+
+def test_fuzzy_match_is_remembered_as_alias(repo):
+    repo.listed = {"PL"}
+    repo.rows = {"nottingham forest": (351, "Nottingham Forest FC", "PL")}
+    client = FakeClient()
+
+    assert TeamIdResolver("PL", client).resolve("Nottingham Forrest") == 351
+    assert client.calls == []
+    assert repo.saved == [("fuzzy", [("nottingham forrest", 351, "Nottingham Forest FC", "PL")])]
+
+
+def test_fuzzy_match_only_within_competition(repo):
+    repo.listed = {"PL", "PD"}
+    repo.rows = {"nottingham forest": (351, "Nottingham Forest FC", "PL")}
+    client = FakeClient()
+
+    assert TeamIdResolver("PD", client).resolve("Nottingham Forrest") is None
+    assert client.calls == [("search", "Nottingham Forrest")]
+
+
+def test_search_is_last_resort_and_saved(repo):
+    client = FakeClient(found={"Luton Town": [{"id": 389, "name": "Luton Town FC"}]})
+
+    assert TeamIdResolver("PL", client).resolve("Luton Town") == 389
+    assert TeamIdResolver("PL", client).resolve("Luton Town") == 389
+    assert client.calls == [("competition", "PL"), ("search", "Luton Town")]
+    assert repo.saved[-1][0] == "search"
+
+
+def test_not_found_is_not_searched_again_within_ttl(repo):
+    client = FakeClient()
+
+    assert TeamIdResolver("PL", client).resolve("Equipo Inexistente") is None
+    assert TeamIdResolver("PL", client).resolve("Equipo Inexistente") is None
+    assert client.calls.count(("search", "Equipo Inexistente")) == 1
+    assert "equipo inexistente" in repo.misses
+
+
+def test_stale_miss_is_searched_again(repo):
+    repo.listed = {"PL"}
+    repo.misses = {"luton town": datetime.now() - team_id_resolver.MISS_TTL - timedelta(hours=1)}
+    client = FakeClient(found={"Luton Town": [{"id": 389, "name": "Luton Town FC"}]})
+
+    assert TeamIdResolver("PL", client).resolve("Luton Town") == 389
+
+
+def test_api_error_is_not_recorded_as_miss(repo):
+    repo.listed = {"PL"}
+    client = FakeClient(fail=True)
+
+    assert TeamIdResolver("PL", client).resolve("Luton Town") is None
+    assert repo.misses == {}
+    client.fail = False
+    TeamIdResolver("PL", client).resolve("Luton Town")
+    assert client.calls.count(("search", "Luton Town")) == 2
+
+
+def test_database_error_leaves_team_unresolved(repo):
+    repo.down = True
+
+    assert TeamIdResolver("PL", FakeClient()).resolve("Arsenal") is None
+    # El próximo resolve vuelve a intentar la carga
+    repo.down = False
+    repo.rows = {"arsenal": (57, "Arsenal FC", "PL")}
+    assert TeamIdResolver("PL", FakeClient()).resolve("Arsenal") == 57
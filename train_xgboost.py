@@ -1,12 +1,18 @@
+import itertools
 import logging
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
 import numpy as np
 import pandas as pd
 
 from infrastructure.football_data.football_data_client import SEASONS
 from models.xgboost.data_loader import load_historical_matches
-from models.xgboost.feature_engineer import build_features
-from models.xgboost.model import XGBoostResult
+from models.xgboost import feature_cache, registry
+from models.xgboost.model import DEFAULT_PARAMS, XGBoostResult
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +22,19 @@ SEASON_DECAY = 0.8
 TRAIN_RATIO = 0.70
 CAL_RATIO   = 0.10
 
+# Búsqueda de hiperparámetros (--tune): muestreo aleatorio del grid con
+# validación cruzada temporal sobre train+cal (el test queda fuera)
+TUNE_GRID = {
+    "n_estimators":     [200, 300, 500],
+    "max_depth":        [3, 4, 5, 6],
+    "learning_rate":    [0.03, 0.05, 0.1],
+    "min_child_weight": [1, 3, 5],
+    "subsample":        [0.7, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+}
+TUNE_TRIALS = 20
+TUNE_SPLITS = 5
+
 
 def compute_weights(seasons: "pd.Series") -> np.ndarray:
     season_order = {s: i for i, s in enumerate(SEASONS)}
@@ -23,13 +42,72 @@ def compute_weights(seasons: "pd.Series") -> np.ndarray:
     return seasons.map(lambda s: SEASON_DECAY ** (max_idx - season_order.get(s, 0))).values
 
 
-def run(db_name: str):
+def _tune_candidates(n_trials: int = TUNE_TRIALS, seed: int = 42) -> list[dict]:
+    grid = [dict(zip(TUNE_GRID, values)) for values in itertools.product(*TUNE_GRID.values())]
+    candidates = random.Random(seed).sample(grid, min(n_trials, len(grid)))
+    # La configuración actual siempre compite
+    default = {k: DEFAULT_PARAMS.get(k, v[0]) for k, v in TUNE_GRID.items()}
+    return [default] + [c for c in candidates if c != default]
+
+
+def _cv_log_loss(params: dict, X: pd.DataFrame, y: pd.Series, weights: np.ndarray,
+                 splits: list[tuple[np.ndarray, np.ndarray]]) -> float:
+    """Log-loss medio (sin calibrar) de una configuración sobre los folds temporales."""
+    from sklearn.metrics import log_loss
+
+    losses = []
+    for train_idx, val_idx in splits:
+        model = XGBoostResult({**params, "tree_method": "hist"})
+        model.clf.set_params(n_jobs=1)  # el paralelismo lo da el pool de procesos
+        model.clf.fit(X.iloc[train_idx], y.iloc[train_idx], sample_weight=weights[train_idx])
+        losses.append(log_loss(y.iloc[val_idx], model.clf.predict_proba(X.iloc[val_idx]), labels=[0, 1, 2]))
+    return float(np.mean(losses))
+
+
+def tune(X: pd.DataFrame, y: pd.Series, weights: np.ndarray, workers: int | None = None) -> dict:
+    """Busca hiperparámetros con TimeSeriesSplit; retorna la mejor configuración y el ranking."""
+    from sklearn.model_selection import TimeSeriesSplit
+
+    splits = list(TimeSeriesSplit(n_splits=TUNE_SPLITS).split(X))
+    candidates = _tune_candidates()
+    workers = workers or os.cpu_count() or 1
+    logger.info("Tuning: %d configuraciones x %d folds en %d procesos (tree_method=hist)",
+                len(candidates), len(splits), workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        scores = list(executor.map(
+            _cv_log_loss, candidates,
+            itertools.repeat(X), itertools.repeat(y), itertools.repeat(weights), itertools.repeat(splits),
+        ))
+
+    trials = sorted(
+        ({"params": c, "cv_log_loss": round(sc, 5)} for c, sc in zip(candidates, scores)),
+        key=lambda t: t["cv_log_loss"],
+    )
+    best = trials[0]
+    logger.info("Mejor configuración: %s (log-loss CV %.4f; actual %.4f)",
+                best["params"], best["cv_log_loss"], scores[0])
+    return {
+        "best_params": {**best["params"], "tree_method": "hist"},
+        "cv_log_loss": best["cv_log_loss"],
+        "cv_splits":   TUNE_SPLITS,
+        "trials":      trials,
+        "tuned_at":    datetime.now().isoformat(),
+    }
+
+
+def run(db_name: str, engine: str = "stream", tune_params: bool = False):
+    """Entrena y publica el modelo de la liga.
+
+    Usa los hiperparámetros guardados en el registro por el último --tune; con
+    tune_params=True vuelve a buscarlos antes de entrenar.
+    """
     logger.info("Cargando datos históricos (%s)...", db_name)
     df = load_historical_matches(db_name)
     logger.info("%d partidos disponibles", len(df))
 
-    logger.info("Construyendo features...")
-    X, y, seasons = build_features(df)
+    logger.info("Construyendo features (engine=%s)...", engine)
+    X, y, seasons = feature_cache.load_or_build(db_name, df, engine=engine)
     logger.info("%d partidos con features completas  |  H=%d  D=%d  A=%d",
                 len(X), (y == 0).sum(), (y == 1).sum(), (y == 2).sum())
 
@@ -48,19 +126,37 @@ def run(db_name: str):
     logger.info("Peso temporada más antigua (%s): %.3f  |  actual (%s): 1.000",
                 SEASONS[0], SEASON_DECAY ** (len(SEASONS) - 1), SEASONS[-1])
 
+    previous = registry.metadata(db_name)
+    tuning = previous.get("tuning")
+    if tune_params:
+        tuning = tune(X.iloc[:n_cal], y.iloc[:n_cal], weights[:n_cal])
+    params = tuning["best_params"] if tuning else previous.get("params")
+
     logger.info("Entrenando XGBoost...")
-    model = XGBoostResult()
+    model = XGBoostResult(params)
     model.fit(X_train, y_train, sample_weight=w_train, X_cal=X_cal, y_cal=y_cal)
 
     logger.info("Evaluando en test (%d partidos)...", len(X_test))
-    model.evaluate(X_test, y_test)
-
-    model.save()
-    logger.info("Modelo guardado correctamente")
+    metrics = model.evaluate(X_test, y_test)
+
+    version = registry.publish(db_name, model, {
+        "trained_at": datetime.now().isoformat(),
+        "engine":     engine,
+        "metrics":    metrics,
+        "features":   list(X.columns),
+        "train_rows": len(X_train),
+        "cal_rows":   len(X_cal),
+        "test_rows":  len(X_test),
+        "params":     {**DEFAULT_PARAMS, **(params or {})},
+        "tuning":     tuning,
+    })
+    logger.info("Modelo publicado en el registro (%s, versión %s)", db_name, version)
 
 
 def main():
-    run(DB_NAME)
+    # Uso: python train_xgboost.py [--engine=stream|vectorized|scan] [--tune]
+    engine = next((a.split("=", 1)[1] for a in sys.argv[1:] if a.startswith("--engine=")), "stream")
+    run(DB_NAME, engine=engine, tune_params="--tune" in sys.argv)
 
 
 if __name__ == "__main__":